@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import MetricsRegistry
+
+
+class ActionExecutor:
+    """Runs editor/document actions one at a time, in submission order, on a worker thread.
+
+    The listening loop only submits actions, so a slow editor start or save never stops audio
+    from being captured and recognized.
+    """
+
+    def __init__(self, logger=None, on_done=None, metrics=None):
+        self.logger = logger or print
+        self.metrics = metrics or MetricsRegistry()
+        self.on_done = on_done  # on_done(name) after every action, from the worker thread
+        self._queue = queue.Queue()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """Actions queued or running."""
+        return self._pending
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); returns a Future with its result."""
+        future = Future()
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="action-executor", daemon=True)
+                self._thread.start()
+        self._queue.put((name, fn, args, kwargs, future, time.perf_counter()))
+        return future
+
+    def wait_idle(self, timeout=None):
+        """Block until every submitted action has finished."""
+        return self._idle.wait(timeout)
+
+    def stop(self, timeout=1.0):
+        """Run what is queued, then end the worker thread; returns False if it is still busy after timeout."""
+        self._queue.put(None)
+        stopped = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            stopped = not self._thread.is_alive()
+            self._thread = None
+        return stopped
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            name, fn, args, kwargs, future, queued = item
+            self.metrics.observe("action.queue_wait", time.perf_counter() - queued)
+            try:
+                if future.set_running_or_notify_cancel():
+                    with self.metrics.span(f"action.{name}"):
+                        result = fn(*args, **kwargs)
+                    future.set_result(result)
+            except Exception as e:
+                self.logger(f"Error running '{name}': {e}")
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    if not self._pending:
+                        self._idle.set()
+            if self.on_done:
+                try:
+                    self.on_done(name)
+                except Exception as e:
+                    self.logger(f"Error after '{name}': {e}")
+
+
+class DialogState:
+    """What the next utterance means: a normal command/dictation, or the answer to a prompt.
+
+    Follow-up questions (e.g. "Say the Notepad name...") are states here instead of a nested,
+    blocking listen, so the listening loop keeps running while the user answers.
+    """
+    IDLE = "idle"
+    AWAITING_FILENAME = "awaiting_filename"
+    AWAITING_CHOICE = "awaiting_choice"  # context["choices"]: file paths offered by number
+
+    def __init__(self, timeout=30.0):
+        self.timeout = timeout
+        self.reset()
+
+    @property
+    def active(self):
+        if self.state != self.IDLE and time.monotonic() > self.expires_at:
+            self.reset()
+        return self.state != self.IDLE
+
+    def expect(self, state, action, **context):
+        self.state = state
+        self.action = action
+        self.context = context
+        self.expires_at = time.monotonic() + self.timeout
+
+    def reset(self):
+        self.state = self.IDLE
+        self.action = None
+        self.context = {}
+        self.expires_at = 0.0
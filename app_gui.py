@@ -1,8 +1,36 @@
-import customtkinter as ctk
+from startup import StartupReport
+startup_report = StartupReport()  # Cold-start timeline, started before the heavier imports below
+with startup_report.imports_of("customtkinter"):
+    import customtkinter as ctk
 import threading
 import os
-import json
-from hcidublicate import NotepadController
+from tkinter import messagebox
+from ui_pump import UiUpdatePump, LogRingBuffer
+from config_service import ConfigService
+
+# Settings screen label -> document backend name
+DOCUMENT_CHOICES = {"Typing into Notepad": "notepad", "Writing the file directly": "file"}
+DOCUMENT_CHOICES_BY_NAME = {name: label for label, name in DOCUMENT_CHOICES.items()}
+HOME_LOG_LINES = 200  # Lines kept in the small log box on the home screen
+DEFAULT_SETTINGS = {
+    "energy_threshold": 150,
+    "vad": "auto",
+    "keyword_spotting": True,
+    "notes_folder": os.getcwd(),
+    "dark_mode": False,
+    "autostart": False,
+    "recognizer": "google",
+    "recognizer_options": {},
+    "streaming": False,
+    "document_backend": "notepad",
+    "document_options": {},
+    "open_viewer": True,
+    "editor_command": None,
+    "editor_pool": 1,
+    "editor_handoff": "auto",
+    "log_file": None,
+    "journal": True,
+}
 
 class SettingsDialog(ctk.CTkToplevel):
     def __init__(self, master, controller):
@@ -14,7 +42,7 @@ class SettingsDialog(ctk.CTkToplevel):
         # Voice Sensitivity
         ctk.CTkLabel(self, text="Voice Sensitivity:").pack(pady=(20, 0))
         self.sensitivity_slider = ctk.CTkSlider(self, from_=50, to=400, number_of_steps=70)
-        self.sensitivity_slider.set(self.controller.recognizer.energy_threshold)
+        self.sensitivity_slider.set(self.controller.energy_threshold)
         self.sensitivity_slider.pack(pady=10)
         self.sensitivity_slider.bind("<ButtonRelease-1>", self.update_sensitivity)
 
@@ -37,7 +65,7 @@ class SettingsDialog(ctk.CTkToplevel):
 
     def update_sensitivity(self, event=None):
         value = int(self.sensitivity_slider.get())
-        self.controller.recognizer.energy_threshold = value
+        self.controller.set_energy_threshold(value)
 
     def browse_folder(self):
         import tkinter.filedialog as fd
@@ -51,14 +79,99 @@ class SettingsDialog(ctk.CTkToplevel):
         ctk.set_appearance_mode("dark" if self.dark_mode_var.get() else "light")
 
 class LogsDialog(ctk.CTkToplevel):
-    def __init__(self, master, logs):
+    """Log viewer that only renders the lines currently in view."""
+
+    def __init__(self, master, logs, rows=24):
         super().__init__(master)
         self.title("Logs")
         self.geometry("400x400")
-        log_box = ctk.CTkTextbox(self, state="normal")
-        log_box.pack(expand=True, fill="both", padx=10, pady=10)
-        log_box.insert("end", "\n".join(logs))
-        log_box.configure(state="disabled")
+        self.logs = logs
+        self.rows = rows
+        self.offset = max(0, len(logs) - rows)
+        self.follow = True  # Stick to the newest lines until the user scrolls up
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 10), pady=10)
+        self.log_box = ctk.CTkTextbox(self, state="disabled", wrap="none", activate_scrollbars=False)
+        self.log_box.pack(expand=True, fill="both", padx=(10, 0), pady=10)
+        self.log_box.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1))
+        self.log_box.bind("<Button-4>", lambda e: self.scroll_by(-1))
+        self.log_box.bind("<Button-5>", lambda e: self.scroll_by(1))
+        self.render()
+        self.after(500, self.refresh)
+
+    def on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.offset = int(float(value) * len(self.logs))
+        else:
+            self.offset += int(value) * (self.rows if unit == "pages" else 1)
+        self.clamp_and_render()
+
+    def scroll_by(self, lines):
+        self.offset += lines * 3
+        self.clamp_and_render()
+        return "break"
+
+    def clamp_and_render(self):
+        last = max(0, len(self.logs) - self.rows)
+        self.offset = min(max(0, self.offset), last)
+        self.follow = self.offset >= last
+        self.render()
+
+    def render(self):
+        total = len(self.logs)
+        lines = self.logs.lines(self.offset, self.offset + self.rows)
+        self.log_box.configure(state="normal")
+        self.log_box.delete("1.0", "end")
+        self.log_box.insert("end", "\n".join(lines))
+        self.log_box.configure(state="disabled")
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        if self.follow:
+            self.offset = max(0, len(self.logs) - self.rows)
+            self.render()
+        self.after(500, self.refresh)
+
+class MetricsDialog(ctk.CTkToplevel):
+    """Live p50/p95/p99 latency per stage, with JSON / Prometheus export."""
+
+    def __init__(self, master, controller):
+        super().__init__(master)
+        self.title("Latency Metrics")
+        self.geometry("520x360")
+        self.controller = controller
+        self.table = ctk.CTkTextbox(self, font=("Courier New", 12), state="disabled", wrap="none")
+        self.table.pack(expand=True, fill="both", padx=10, pady=(10, 5))
+        buttons = ctk.CTkFrame(self, fg_color="transparent")
+        buttons.pack(pady=(0, 10))
+        ctk.CTkButton(buttons, text="Export JSON", command=lambda: self.export(".json")).pack(side="left", padx=5)
+        ctk.CTkButton(buttons, text="Export Prometheus", command=lambda: self.export(".prom")).pack(side="left", padx=5)
+        ctk.CTkButton(buttons, text="Reset", command=self.reset).pack(side="left", padx=5)
+        self.refresh()
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        self.table.configure(state="normal")
+        self.table.delete("1.0", "end")
+        self.table.insert("end", "Latency in ms\n\n" + self.controller.metrics.format_table()
+                          + "\n\n" + startup_report.format_table())
+        self.table.configure(state="disabled")
+        self.after(1000, self.refresh)
+
+    def export(self, extension):
+        import tkinter.filedialog as fd
+        path = fd.asksaveasfilename(defaultextension=extension, initialfile=f"voice_notepad_metrics{extension}")
+        if path:
+            self.controller.export_metrics(path)
+
+    def reset(self):
+        self.controller.metrics.reset()
 
 class VoiceNotepadApp(ctk.CTk):
     def __init__(self):
@@ -67,19 +180,94 @@ class VoiceNotepadApp(ctk.CTk):
         self.geometry("420x650")
         ctk.set_appearance_mode("system")
 
-        # Controller
-        self.controller = NotepadController(logger=self.log)
+        # Logs are kept in a bounded ring; widget updates from other threads go through the pump
+        self.logs = LogRingBuffer(capacity=5000)
+        self._log_rendered = 0
+        self.ui = UiUpdatePump(self)
+        self.ui.start()
+
+        # Controller: built on a background thread once the window is up (see init_controller)
+        self.controller = None
         self.listening = False
+        self.listen_when_ready = False
+        self.capture_live = False  # Microphone open and capture running
+        self.startup_reported = False
         self.listen_thread = None
-        self.stop_event = threading.Event()
-        self.logs = []
+        self.listen_token = None  # Cancel token of the current listening session (see controller.stop_listening)
 
-        self.load_settings()  # <-- Load settings before building UI
+        # settings.json / commands.json: cached, saved atomically in the background, hot-reloaded
+        self.config = ConfigService(os.getcwd(), logger=self.log, settings_defaults=DEFAULT_SETTINGS)
+        self.config.settings.subscribe(self.on_settings_changed)
+        self.config.start()
+        self.apply_appearance(self.config.settings.data)  # <-- Theme before building UI
 
         # Main content frame (for swapping screens)
         self.content_frame = ctk.CTkFrame(self)
         self.content_frame.pack(fill="both", expand=True)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.show_home()
+        self.after(0, self.on_first_frame)
+
+    def on_first_frame(self):
+        self.update_idletasks()
+        startup_report.mark("first_frame")
+        threading.Thread(target=self.init_controller, name="controller-init", daemon=True).start()
+
+    def init_controller(self):
+        # Heavy imports, the recognizer (e.g. a Vosk model) and the document backend load here,
+        # off the Tk thread, so the window stays responsive while they do
+        try:
+            with startup_report.imports_of("hcidublicate"):
+                from hcidublicate import NotepadController
+            journal = None
+            if self.config.settings.data.get("journal", True):
+                from journal import Journal
+                journal = Journal(self.config.folder, logger=self.log)
+            controller = NotepadController(logger=self.log, config=self.config, journal=journal)
+            controller.on_partial = self.show_partial
+            controller.on_action_done = self.show_action_done
+            self.apply_settings(controller, self.config.settings.data)
+            unsaved = controller.unsaved_work()  # Dictation the last run left unsaved when it crashed
+            controller.notes.refresh()  # Index the notes folder before the first "open ..."
+            # Modules the first listen/command would otherwise import on the spot
+            startup_report.preload("speech_recognition", "pyaudio")
+            if controller.document_name == "notepad":
+                startup_report.preload("pyautogui", "pyperclip")
+        except Exception as e:
+            self.log(f"Startup failed: {e}")
+            return
+        startup_report.mark("controller_ready")
+        self.ui.post(self.controller_ready, controller)
+        if unsaved is not None:
+            self.ui.post(self.offer_recovery, controller, unsaved)
+        threading.Thread(target=self.sync_search_index, args=(controller,), name="search-index", daemon=True).start()
+
+    def sync_search_index(self, controller):
+        # Re-reads only notes changed since the last run; the first run indexes the whole folder
+        try:
+            updated, removed = controller.search_index.sync()
+        except Exception as e:
+            self.log(f"Search index unavailable: {e}")
+            return
+        if updated or removed:
+            self.log(f"Search index: {updated} notes indexed, {removed} removed.")
+
+    def controller_ready(self, controller):
+        self.controller = controller
+        if self.listen_when_ready:
+            self.start_listening()
+        self.refresh_status()
+
+    def offer_recovery(self, controller, unsaved):
+        path, _, _, pending = unsaved
+        target = "typed into Notepad" if controller.document_name == "notepad" else "written to the file"
+        if messagebox.askyesno(
+                "Recover unsaved dictation",
+                f"Voice Notepad did not exit cleanly. {len(pending)} unsaved entries of "
+                f"'{os.path.basename(path)}' can be reopened and {target} now. Recover them?", parent=self):
+            controller.submit("recover", controller.recover_unsaved)
+        else:
+            self.log("Unsaved dictation from the last run was not recovered.")
 
     def show_home(self):
         for widget in self.content_frame.winfo_children():
@@ -92,6 +280,8 @@ class VoiceNotepadApp(ctk.CTk):
         self.status_frame.pack(padx=20, pady=10, fill="x")
         self.status_label = ctk.CTkLabel(self.status_frame, text="Status: Idle", font=("Arial", 14))
         self.status_label.pack(anchor="w", padx=10, pady=(10, 0))
+        self.status_color = self.status_label.cget("text_color")
+        self.refresh_status()
         self.last_command_label = ctk.CTkLabel(self.status_frame, text="Last command: None", font=("Arial", 12))
         self.last_command_label.pack(anchor="w", padx=10)
         self.current_file_label = ctk.CTkLabel(self.status_frame, text="Current file: None", font=("Arial", 12))
@@ -107,11 +297,14 @@ class VoiceNotepadApp(ctk.CTk):
         self.settings_btn.pack(pady=5, fill="x", padx=60)
         self.controls_btn = ctk.CTkButton(self.content_frame, text="Controls", command=self.show_controls)
         self.controls_btn.pack(pady=5, fill="x", padx=60)
+        self.metrics_btn = ctk.CTkButton(self.content_frame, text="Metrics", command=self.view_metrics)
+        self.metrics_btn.pack(pady=5, fill="x", padx=60)
         # Logs/History
         self.log_box = ctk.CTkTextbox(self.content_frame, height=100, state="disabled")
         self.log_box.pack(padx=20, pady=10, fill="both", expand=False)
+        self._log_rendered = max(0, self.logs.total - HOME_LOG_LINES)
+        self.flush_log_box()
         # Footer
-        self.autostart_var = ctk.BooleanVar(value=False)
         self.autostart_check = ctk.CTkCheckBox(
             self.content_frame, text="Start automatically on system boot", variable=self.autostart_var
         )
@@ -122,11 +315,11 @@ class VoiceNotepadApp(ctk.CTk):
         self.start_listening()
 
     def show_settings(self):
+        if not self.require_controller():
+            return
         for widget in self.content_frame.winfo_children():
             widget.destroy()
-        # Always reload settings from file before showing
-        self.load_settings()
-        
+
         # Back button at top left with arrow
         back_btn = ctk.CTkButton(
             self.content_frame, text="← Back", width=80, command=self.show_home
@@ -138,7 +331,7 @@ class VoiceNotepadApp(ctk.CTk):
         # Voice Sensitivity
         ctk.CTkLabel(self.content_frame, text="Voice Sensitivity:").pack(pady=(20, 0))
         self.sensitivity_slider = ctk.CTkSlider(self.content_frame, from_=50, to=400, number_of_steps=70)
-        self.sensitivity_slider.set(self.controller.recognizer.energy_threshold)
+        self.sensitivity_slider.set(self.controller.energy_threshold)
         self.sensitivity_slider.pack(pady=10)
         self.sensitivity_slider.bind("<ButtonRelease-1>", self.update_sensitivity)
 
@@ -161,6 +354,21 @@ class VoiceNotepadApp(ctk.CTk):
         )
         self.dark_mode_check.pack(pady=10)
 
+        # Streaming dictation toggle
+        self.streaming_var = ctk.BooleanVar(value=self.controller.streaming)
+        ctk.CTkCheckBox(
+            self.content_frame, text="Live dictation (type while speaking)", variable=self.streaming_var
+        ).pack(pady=5)
+
+        # How text reaches the note
+        ctk.CTkLabel(self.content_frame, text="Write Text By:").pack(pady=(10, 0))
+        self.document_var = ctk.StringVar(value=DOCUMENT_CHOICES_BY_NAME[self.controller.document_name])
+        ctk.CTkOptionMenu(self.content_frame, values=list(DOCUMENT_CHOICES), variable=self.document_var).pack(pady=5)
+        self.open_viewer_var = ctk.BooleanVar(value=self.controller.open_viewer)
+        ctk.CTkCheckBox(
+            self.content_frame, text="Show note in Notepad when writing to file", variable=self.open_viewer_var
+        ).pack(pady=5)
+
         # Reset Settings Button
         ctk.CTkButton(self.content_frame, text="Reset Settings to Default", command=self.reset_settings).pack(pady=5)
         # Reset Commands Button
@@ -180,7 +388,7 @@ class VoiceNotepadApp(ctk.CTk):
 
     def update_sensitivity(self, event=None):
         value = int(self.sensitivity_slider.get())
-        self.controller.recognizer.energy_threshold = value
+        self.controller.set_energy_threshold(value)
 
     def browse_folder(self):
         import tkinter.filedialog as fd
@@ -195,7 +403,7 @@ class VoiceNotepadApp(ctk.CTk):
 
     def reset_settings(self):
         # Reset sensitivity and folder to defaults
-        self.controller.recognizer.energy_threshold = 150
+        self.controller.set_energy_threshold(150)
         self.sensitivity_slider.set(150)
         default_folder = os.getcwd()
         self.controller.script_directory = default_folder
@@ -206,12 +414,12 @@ class VoiceNotepadApp(ctk.CTk):
 
     def reset_commands(self):
         # Reset commands to default and save
-        self.controller.commands = {
+        self.controller.commands.update({
             "create": "create a new notepad",
             "open": "open",
             "save": "save the notepad",
             "close": "close notepad"
-        }
+        })
         self.controller.save_commands()
         ctk.CTkLabel(self.content_frame, text="Voice commands reset to default!", text_color="green").pack()
 
@@ -220,35 +428,65 @@ class VoiceNotepadApp(ctk.CTk):
             "energy_threshold": int(self.sensitivity_slider.get()),
             "notes_folder": self.folder_entry.get(),
             "dark_mode": self.dark_mode_var.get(),
-            "autostart": self.autostart_var.get()
+            "autostart": self.autostart_var.get(),
+            "streaming": self.streaming_var.get(),
+            "document_backend": DOCUMENT_CHOICES[self.document_var.get()],
+            "open_viewer": self.open_viewer_var.get(),
         }
-        with open(self.get_settings_path(), "w", encoding="utf-8") as f:
-            json.dump(settings, f, indent=2)
-        self.controller.recognizer.energy_threshold = settings["energy_threshold"]
-        self.controller.script_directory = settings["notes_folder"]
-        ctk.set_appearance_mode("dark" if settings["dark_mode"] else "light")
-        ctk.CTkLabel(self.content_frame, text="Settings saved!", text_color="green").pack()
-
-    def load_settings(self):
+        # Only what was changed on this screen: every key saved is also re-applied to the controller
+        current = self.config.settings
+        changes = {key: value for key, value in settings.items() if current.get(key) != value}
+        self.config.settings.update(changes)  # Applied through on_settings_changed, written in the background
+        ctk.CTkLabel(self.content_frame, text="Settings saved!" if changes else "No changes to save.",
+                     text_color="green").pack()
+
+    def on_settings_changed(self, changes):
+        # Called on save (Tk thread) and when settings.json is edited outside the app (config writer
+        # thread). Applying can restart recognition or flush the note, so it runs on the action thread
+        if self.controller is not None:
+            self.controller.submit("settings", self.apply_settings, self.controller, changes)
+        if changes.keys() & {"dark_mode", "autostart", "log_file"}:
+            self.ui.post(self.apply_appearance, self.config.settings.data)
+
+    def apply_settings(self, controller, settings):
+        # Controller side only, so it can run off the Tk thread; applies just the keys given
+        current = self.config.settings
         try:
-            with open(self.get_settings_path(), "r", encoding="utf-8") as f:
-                settings = json.load(f)
-            self.controller.recognizer.energy_threshold = settings.get("energy_threshold", 150)
-            self.controller.script_directory = settings.get("notes_folder", os.getcwd())
-            if settings.get("dark_mode", False):
-                ctk.set_appearance_mode("dark")
-            else:
-                ctk.set_appearance_mode("light")
+            if "energy_threshold" in settings:
+                controller.set_energy_threshold(settings["energy_threshold"])
+            if "keyword_spotting" in settings:
+                controller.set_keyword_spotting(bool(settings["keyword_spotting"]))
+            if "vad" in settings:
+                controller.set_vad(settings["vad"] or "auto")
+            if "notes_folder" in settings:
+                controller.script_directory = settings["notes_folder"] or os.getcwd()
+            if settings.keys() & {"recognizer", "recognizer_options"}:
+                controller.configure_backend(current.get("recognizer"), **(current.get("recognizer_options") or {}))
+            if "streaming" in settings:
+                controller.set_streaming(bool(settings["streaming"]))
+            if settings.keys() & {"document_backend", "document_options"}:
+                controller.set_document_backend(current.get("document_backend"),
+                                                **(current.get("document_options") or {}))
+            if "open_viewer" in settings:
+                controller.open_viewer = bool(settings["open_viewer"])
+            if settings.get("editor_command"):
+                controller.set_editor_command(settings["editor_command"])
+            if settings.keys() & {"editor_pool", "editor_handoff"}:
+                controller.set_editor_pool(int(current.get("editor_pool", 1)), current.get("editor_handoff") or "auto")
+        except Exception as e:
+            self.log(f"Failed to apply settings: {e}")
+
+    def apply_appearance(self, settings):
+        ctk.set_appearance_mode("dark" if settings.get("dark_mode", False) else "light")
+        if hasattr(self, "autostart_var"):
+            self.autostart_var.set(settings.get("autostart", False))
+        else:
             self.autostart_var = ctk.BooleanVar(value=settings.get("autostart", False))
-        except Exception:
-            self.controller.recognizer.energy_threshold = 150
-            self.controller.script_directory = os.getcwd()
-            self.autostart_var = ctk.BooleanVar(value=False)
-
-    def get_settings_path(self):
-        return os.path.join(os.getcwd(), "settings.json")
+        self.logs.spill_path = settings.get("log_file")  # Older log lines spill here when set
 
     def show_controls(self):
+        if not self.require_controller():
+            return
         for widget in self.content_frame.winfo_children():
             widget.destroy()
 
@@ -275,6 +513,58 @@ class VoiceNotepadApp(ctk.CTk):
 
         ctk.CTkButton(self.content_frame, text="Save", command=self.save_commands).pack(pady=15)
 
+        # Enrolled samples let these four commands fire locally, without waiting for the recognizer
+        ctk.CTkLabel(self.content_frame, text="Instant Commands", font=("Arial", 16, "bold")).pack(pady=(10, 0))
+        ctk.CTkLabel(self.content_frame, text="Record each command 3-5 times in your own voice.").pack()
+        self.keyword_rows = {}
+        for key, label in [("create", "Create"), ("open", "Open"), ("save", "Save"), ("close", "Close")]:
+            row = ctk.CTkFrame(self.content_frame, fg_color="transparent")
+            row.pack(pady=2)
+            count = ctk.CTkLabel(row, text="", width=170, anchor="w")
+            count.pack(side="left", padx=5)
+            ctk.CTkButton(row, text="Record", width=70, command=lambda k=key: self.record_keyword(k)).pack(side="left", padx=2)
+            ctk.CTkButton(row, text="Clear", width=60, command=lambda k=key: self.clear_keyword(k)).pack(side="left", padx=2)
+            self.keyword_rows[key] = (label, count)
+        self.keyword_status = ctk.CTkLabel(self.content_frame, text="")
+        self.keyword_status.pack(pady=5)
+        self.refresh_keyword_counts()
+
+    def refresh_keyword_counts(self):
+        spotter = self.controller.keyword_spotter
+        if spotter is None:
+            self.keyword_status.configure(text="Needs numpy (pip install numpy).")
+            return
+        counts = spotter.counts()
+        for key, (label, count) in self.keyword_rows.items():
+            if count.winfo_exists():
+                count.configure(text=f"{label}: {counts[key]} sample(s)")
+
+    def record_keyword(self, key):
+        phrase = self.controller.commands[key]
+        self.keyword_status.configure(text=f"Say \"{phrase}\" now...", text_color=self.status_color)
+        threading.Thread(target=self._record_keyword, args=(key,), name="keyword-enroll", daemon=True).start()
+
+    def _record_keyword(self, key):
+        path = self.controller.record_keyword_sample(key)
+        self.ui.post(self.keyword_recorded, key, path)
+
+    def keyword_recorded(self, key, path):
+        if not (hasattr(self, "keyword_status") and self.keyword_status.winfo_exists()):
+            return
+        if path is None:
+            self.keyword_status.configure(text="Nothing heard; try again.", text_color="red")
+        else:
+            self.keyword_status.configure(text="Sample saved.", text_color="green")
+            self.log(f"Recorded a '{key}' sample: {os.path.basename(path)}")
+        self.refresh_keyword_counts()
+
+    def clear_keyword(self, key):
+        spotter = self.controller.keyword_spotter
+        if spotter is not None:
+            spotter.clear(key)
+            self.keyword_status.configure(text=f"'{key}' samples removed.", text_color=self.status_color)
+            self.refresh_keyword_counts()
+
     def save_commands(self):
         for key, var in self.command_vars.items():
             self.controller.commands[key] = var.get().strip()
@@ -283,66 +573,149 @@ class VoiceNotepadApp(ctk.CTk):
         ctk.CTkLabel(self.content_frame, text="Commands saved!", text_color="green").pack()
 
     def start_listening(self):
+        if self.controller is None:
+            self.listen_when_ready = True  # Starts as soon as the controller is built
+            self.refresh_status()
+            return
         if not self.listening:
             self.listening = True
-            self.stop_event.clear()
-            self.status_label.configure(text="Status: Listening")
-            self.listen_thread = threading.Thread(target=self.listen_loop, daemon=True)
+            self.listen_token = self.controller.start_listening()
+            if self.controller.pipeline is not None:
+                self.controller.pipeline.discard_pending()  # Drop speech heard while stopped
+            self.refresh_status()
+            self.listen_thread = threading.Thread(target=self.listen_loop, args=(self.listen_token,),
+                                                  name="listen-loop", daemon=True)
             self.listen_thread.start()
             self.log("Listening started.")
 
     def stop_listening(self):
+        self.listen_when_ready = False
         self.listening = False
-        self.stop_event.set()
-        self.status_label.configure(text="Status: Idle")
+        self.capture_live = False
+        if self.controller is not None:
+            self.controller.stop_listening()  # The listen loop returns within milliseconds
+        self.refresh_status()
         self.log("Listening stopped.")
         print("Listening stopped.")
 
-    def listen_loop(self):
-        while self.listening and not self.stop_event.is_set():
-            text = self.controller.continuous_listen(stop_event=self.stop_event)
-            if not self.listening or self.stop_event.is_set():
+    def refresh_status(self):
+        # Doubles as the ready indicator: green once the microphone is actually capturing
+        if not (hasattr(self, "status_label") and self.status_label.winfo_exists()):
+            return
+        if self.controller is None:
+            text, color = "Status: Starting...", self.status_color
+        elif self.listening and self.capture_live:
+            text, color = "Status: Listening ●", "green"
+        elif self.listening:
+            text, color = "Status: Opening microphone...", self.status_color
+        else:
+            text, color = "Status: Idle", self.status_color
+        self.status_label.configure(text=text, text_color=color)
+
+    def capture_started(self):
+        self.capture_live = self.listening
+        self.refresh_status()
+        if not self.startup_reported:
+            self.startup_reported = True
+            seconds = startup_report.marks["listening"]
+            self.log(f"Ready in {seconds:.2f}s (window shown after {startup_report.marks['first_frame']:.2f}s).")
+            path = os.environ.get("VOICE_NOTEPAD_STARTUP_REPORT")
+            if path:
+                startup_report.save(path)
+
+    def listen_loop(self, token):
+        try:
+            # Opens the microphone on the first start; nothing is opened if Stop was already pressed
+            if self.controller.start_capture(token) is None:
+                return
+        except Exception as e:
+            self.log(f"Could not start listening: {e}")
+            self.listening = False
+            self.ui.post(self.refresh_status)
+            return
+        startup_report.mark("listening")  # First time only
+        self.ui.post(self.capture_started)
+        while not token.cancelled:
+            text = self.controller.continuous_listen(stop_event=token)
+            if token.cancelled:
                 break
             if text:
                 text = text.strip().lower()
-                cmds = self.controller.commands
-                if text == cmds["create"]:
-                    self.controller.create_notepad()  # prompts for filename
-                elif text == cmds["open"]:
-                    self.controller.open_notepad()    # prompts for filename
-                elif cmds["save"] in text:
-                    self.controller.save_notepad()
-                elif cmds["close"] in text:
-                    self.controller.close_notepad()
-                else:
-                    self.controller.write_text(text)
-                # Update GUI labels if needed
-                if hasattr(self, "current_file_label"):
-                    if self.controller.current_file_path:
-                        self.current_file_label.configure(
-                            text=f"Current file: {os.path.basename(self.controller.current_file_path)}"
-                        )
-                    else:
-                        self.current_file_label.configure(text="Current file: None")
-                self.last_command_label.configure(text=f"Last command: {text}")
+                self.controller.dispatch(text)  # Timed as "dispatch" in the controller's metrics
+                self.ui.post_latest("last_command", self.set_last_command, f"Last command: {text}")
         print("Listen loop exited.")
 
+    def show_action_done(self, action):
+        # Called on the controller's action thread; the label is updated on the Tk thread
+        self.ui.post_latest("current_file", self.update_current_file_label)
+
+    def update_current_file_label(self):
+        if hasattr(self, "current_file_label") and self.current_file_label.winfo_exists():
+            if self.controller.current_file_path:
+                self.current_file_label.configure(
+                    text=f"Current file: {os.path.basename(self.controller.current_file_path)}"
+                )
+            else:
+                self.current_file_label.configure(text="Current file: None")
+
+    def show_partial(self, text):
+        self.ui.post_latest("last_command", self.set_last_command, f"Hearing: {text}")
+
+    def set_last_command(self, text):
+        if hasattr(self, "last_command_label") and self.last_command_label.winfo_exists():
+            self.last_command_label.configure(text=text)
+
+    def on_close(self):
+        self.stop_listening()
+        if self.controller is not None:
+            self.controller.shutdown()  # Cancels every wait, releases the microphone, ends worker threads
+        self.config.stop()  # Writes any settings/commands still waiting to be saved
+        self.ui.stop()
+        self.logs.close()
+        self.destroy()
+
+    def require_controller(self):
+        if self.controller is None:
+            self.log("Still starting up, please wait...")
+            return False
+        return True
+
     def open_folder(self):
+        if not self.require_controller():
+            return
         folder = self.controller.script_directory
         os.startfile(folder)
 
+    def view_metrics(self):
+        if not self.require_controller():
+            return
+        MetricsDialog(self, self.controller)
+
     def view_logs(self):
         LogsDialog(self, self.logs)
 
     def log(self, message):
-        # Only log if log_box exists and is visible
-        if hasattr(self, "log_box") and self.log_box.winfo_exists():
-            self.log_box.configure(state="normal")
-            self.log_box.insert("end", message + "\n")
-            self.log_box.configure(state="disabled")
-            self.log_box.see("end")
+        # May be called from any thread; the log box is refreshed in batches on the Tk thread
         self.logs.append(message)
+        if hasattr(self, "ui"):
+            self.ui.post_latest("log_box", self.flush_log_box)
+
+    def flush_log_box(self):
+        # Only log if log_box exists and is visible
+        if not (hasattr(self, "log_box") and self.log_box.winfo_exists()):
+            return
+        lines = self.logs.since(self._log_rendered)
+        self._log_rendered = self.logs.total
+        if not lines:
+            return
+        self.log_box.configure(state="normal")
+        self.log_box.insert("end", "\n".join(lines) + "\n")
+        line_count = int(self.log_box.index("end-1c").split(".")[0])
+        if line_count > HOME_LOG_LINES:
+            self.log_box.delete("1.0", f"{line_count - HOME_LOG_LINES}.0")
+        self.log_box.configure(state="disabled")
+        self.log_box.see("end")
 
 if __name__ == "__main__":
     app = VoiceNotepadApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
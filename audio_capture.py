@@ -0,0 +1,467 @@
+import threading
+import queue
+import time
+import wave
+from array import array
+
+
+class AudioSource:
+    """Base class for anything the capture stage can pull PCM chunks from."""
+    sample_rate = 16000
+    sample_width = 2
+    chunk_size = 1024
+    realtime = False
+
+    def open(self):
+        pass
+
+    def read(self):
+        """Return the next chunk of raw PCM, or b"" once the source is exhausted."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    @property
+    def seconds_per_chunk(self):
+        return self.chunk_size / self.sample_rate
+
+    def _pace(self, data):
+        """Sleep for the duration of data when replaying in real time (realtime may be a speed-up factor)."""
+        if data and self.realtime:
+            speed = 1.0 if self.realtime is True else float(self.realtime)
+            time.sleep(len(data) / self.sample_width / self.sample_rate / speed)
+
+
+class MicrophoneSource(AudioSource):
+    """Live microphone input through speech_recognition / PyAudio."""
+
+    def __init__(self, device_index=None, sample_rate=None, chunk_size=1024):
+        self.device_index = device_index
+        self.requested_rate = sample_rate
+        self.chunk_size = chunk_size
+        self._mic = None
+
+    def open(self):
+        import speech_recognition as sr
+        self._mic = sr.Microphone(device_index=self.device_index, sample_rate=self.requested_rate,
+                                  chunk_size=self.chunk_size)
+        self._mic.__enter__()
+        self.sample_rate = self._mic.SAMPLE_RATE
+        self.sample_width = self._mic.SAMPLE_WIDTH
+        self.chunk_size = self._mic.CHUNK
+
+    def read(self):
+        return self._mic.stream.read(self.chunk_size)
+
+    def close(self):
+        if self._mic is not None:
+            self._mic.__exit__(None, None, None)
+            self._mic = None
+
+
+class WavFileSource(AudioSource):
+    """Replay a WAV file as if it were a microphone."""
+
+    def __init__(self, path, chunk_size=1024, realtime=False):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self._wav = None
+
+    def open(self):
+        self._wav = wave.open(self.path, "rb")
+        if self._wav.getnchannels() != 1:
+            raise ValueError(f"{self.path}: only mono WAV files are supported")
+        self.sample_rate = self._wav.getframerate()
+        self.sample_width = self._wav.getsampwidth()
+
+    def read(self):
+        data = self._wav.readframes(self.chunk_size)
+        self._pace(data)
+        return data
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+class BufferSource(AudioSource):
+    """Serve PCM from an in-memory bytes object."""
+
+    def __init__(self, pcm, sample_rate=16000, sample_width=2, chunk_size=1024, realtime=False):
+        self.pcm = bytes(pcm)
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self._pos = 0
+
+    def open(self):
+        self._pos = 0
+
+    def read(self):
+        step = self.chunk_size * self.sample_width
+        data = self.pcm[self._pos:self._pos + step]
+        self._pos += len(data)
+        self._pace(data)
+        return data
+
+
+class RingBuffer:
+    """Fixed-size PCM ring addressed by absolute byte offsets since capture started."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def written(self):
+        return self._written
+
+    def write(self, data):
+        with self._lock:
+            if len(data) >= self.capacity:
+                self._written += len(data) - self.capacity
+                data = data[-self.capacity:]
+            start = self._written % self.capacity
+            first = min(len(data), self.capacity - start)
+            self._buf[start:start + first] = data[:first]
+            self._buf[:len(data) - first] = data[first:]
+            self._written += len(data)
+
+    def read(self, start, end):
+        """Return bytes in [start, end); anything already overwritten is clipped off the front."""
+        with self._lock:
+            start = max(start, self._written - self.capacity, 0)
+            end = min(end, self._written)
+            if end <= start:
+                return b""
+            a, b = start % self.capacity, end % self.capacity
+            if a < b:
+                return bytes(self._buf[a:b])
+            return bytes(self._buf[a:]) + bytes(self._buf[:b])
+
+
+class Utterance:
+    """One segment of speech cut out of the capture stream."""
+
+    def __init__(self, pcm, sample_rate, sample_width, seq=0, start_time=None, end_time=None):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.seq = seq
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @property
+    def duration(self):
+        return len(self.pcm) / (self.sample_rate * self.sample_width)
+
+    def to_audio_data(self):
+        import speech_recognition as sr
+        return sr.AudioData(self.pcm, self.sample_rate, self.sample_width)
+
+
+_TYPECODES = {1: "b", 2: "h", 4: "i"}
+
+
+def rms(chunk, sample_width):
+    """Root-mean-square energy of a PCM chunk (same scale as audioop.rms)."""
+    if not chunk:
+        return 0
+    samples = array(_TYPECODES[sample_width])
+    samples.frombytes(chunk[:len(chunk) - len(chunk) % sample_width])
+    if not samples:
+        return 0
+    return int((sum(s * s for s in samples) / len(samples)) ** 0.5)
+
+
+class UtteranceSegmenter:
+    """Energy-based endpointing over a chunk stream, mirroring sr.Recognizer.listen's rules.
+
+    Every chunk is written into a fixed-size RingBuffer and utterances are sliced back out of it,
+    so the segmenter never holds more than ring_seconds of audio.
+    """
+
+    def __init__(self, sample_rate, sample_width, chunk_size, energy_threshold=150,
+                 dynamic_energy_threshold=True, pause_threshold=0.8, phrase_threshold=0.3,
+                 non_speaking_duration=0.5, phrase_time_limit=15, calibration_duration=0.5,
+                 ring_seconds=30):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.chunk_size = chunk_size
+        self.energy_threshold = energy_threshold
+        self.dynamic_energy_threshold = dynamic_energy_threshold
+        self.dynamic_energy_adjustment_damping = 0.15
+        self.dynamic_energy_ratio = 1.5
+        self.pause_threshold = pause_threshold
+        self.phrase_threshold = phrase_threshold
+        self.non_speaking_duration = non_speaking_duration
+        self.phrase_time_limit = min(phrase_time_limit, ring_seconds - non_speaking_duration)
+        self.seconds_per_chunk = chunk_size / sample_rate
+        self.ring = RingBuffer(int(ring_seconds * sample_rate) * sample_width)
+        self._calibration_chunks = int(calibration_duration / self.seconds_per_chunk)
+        self._preroll_bytes = int(non_speaking_duration * sample_rate) * sample_width
+        self._seen = 0
+        self._start = None
+        self._chunks = 0
+        self._silent_chunks = 0
+        self._silent_bytes = 0
+        self._seq = 0
+
+    @property
+    def in_speech(self):
+        return self._start is not None
+
+    @property
+    def next_seq(self):
+        """Sequence number the utterance currently being spoken will get."""
+        return self._seq + 1
+
+    def pending_audio(self):
+        """PCM of the utterance in progress so far (including pre-roll)."""
+        if self._start is None:
+            return b""
+        return self.ring.read(self._start, self.ring.written)
+
+    def feed(self, chunk):
+        """Consume one chunk; return a finished Utterance or None."""
+        chunk_start = self.ring.written
+        self.ring.write(chunk)
+        speech = self._classify(chunk)
+        if speech is None:
+            return None
+
+        if self._start is None:
+            if speech:
+                self._start = max(chunk_start - self._preroll_bytes, 0)
+                self._chunks = 1
+                self._silent_chunks = 0
+                self._silent_bytes = 0
+            return None
+
+        self._chunks += 1
+        if speech:
+            self._silent_chunks = 0
+            self._silent_bytes = 0
+        else:
+            self._silent_chunks += 1
+            self._silent_bytes += len(chunk)
+        if self._silent_chunks * self.seconds_per_chunk > self.pause_threshold:
+            return self._finish()
+        if self._chunks * self.seconds_per_chunk >= self.phrase_time_limit:
+            return self._finish()
+        return None
+
+    def flush(self):
+        """Emit whatever speech is still pending (e.g. at end of stream)."""
+        if self._start is None:
+            return None
+        return self._finish()
+
+    def _classify(self, chunk):
+        """True if chunk is speech, False if not, None while calibrating."""
+        energy = rms(chunk, self.sample_width)
+        self._seen += 1
+        if self._seen <= self._calibration_chunks:
+            self._adjust(energy, self.seconds_per_chunk)
+            return None
+        speech = energy > self.energy_threshold
+        if not speech and self._start is None and self.dynamic_energy_threshold:
+            self._adjust(energy, self.seconds_per_chunk)
+        return speech
+
+    def _trim(self, pcm):
+        """Hook for cutting silence off a finished utterance; the energy segmenter keeps it."""
+        return pcm
+
+    def _adjust(self, energy, seconds):
+        damping = self.dynamic_energy_adjustment_damping ** seconds
+        target = energy * self.dynamic_energy_ratio
+        self.energy_threshold = self.energy_threshold * damping + target * (1 - damping)
+
+    def _finish(self):
+        start, spoken = self._start, self._chunks - self._silent_chunks
+        # Keep non_speaking_duration of trailing silence, like sr.Recognizer.listen
+        end = self.ring.written - max(0, self._silent_bytes - self._preroll_bytes)
+        self._start = None
+        self._chunks = self._silent_chunks = self._silent_bytes = 0
+        if spoken * self.seconds_per_chunk < self.phrase_threshold:
+            return None
+        self._seq += 1
+        return Utterance(self._trim(self.ring.read(start, end)), self.sample_rate, self.sample_width, seq=self._seq)
+
+
+SEGMENTERS = ("auto", "numpy", "energy")
+
+
+def create_segmenter(sample_rate, sample_width, chunk_size, vad="auto", logger=None, **options):
+    """Endpointing by settings name: "numpy" (vad.VadSegmenter), "energy" (UtteranceSegmenter),
+    or "auto" for the NumPy one when numpy is installed."""
+    if vad not in SEGMENTERS:
+        raise ValueError(f"Unknown voice activity detector: {vad}")
+    if vad != "energy":
+        try:
+            from vad import VadSegmenter
+        except ImportError as e:
+            if vad == "numpy":
+                (logger or print)(f"NumPy voice activity detection is unavailable, using energy endpointing: {e}")
+        else:
+            return VadSegmenter(sample_rate, sample_width, chunk_size, **options)
+    return UtteranceSegmenter(sample_rate, sample_width, chunk_size, **options)
+
+
+class CaptureStage:
+    """Long-lived capture thread: fills a PCM ring buffer and queues utterance segments."""
+
+    def __init__(self, source=None, energy_threshold=150, dynamic_energy_threshold=True,
+                 ring_seconds=30, max_pending=8, logger=None, vad="auto"):
+        self.source = source or MicrophoneSource()
+        self.logger = logger or print
+        self.ring_seconds = ring_seconds
+        self.vad = vad
+        self.energy_threshold = energy_threshold
+        self.dynamic_energy_threshold = dynamic_energy_threshold
+        self.utterances = queue.Queue(maxsize=max_pending)
+        self.queue_utterances = True
+        self.segmenter = None
+        self.finished = threading.Event()
+        self.dropped = 0
+        self._consumers = []
+        self._stream_consumers = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_consumer(self, callback):
+        """Call callback(utterance) on the capture thread for every segment, in addition to queueing it.
+
+        A callback returning True claims the utterance: it is not queued for recognition.
+        """
+        self._consumers.append(callback)
+
+    def remove_consumer(self, callback):
+        if callback in self._consumers:
+            self._consumers.remove(callback)
+
+    def add_stream_consumer(self, callback):
+        """Call callback(event, seq, data) on the capture thread while speech is in progress.
+
+        event is "start" (data = pre-roll + first chunk), "audio" (data = next chunk),
+        "end" (data = the finished Utterance) or "cancel" (segment was too short to keep).
+        """
+        self._stream_consumers.append(callback)
+
+    def remove_stream_consumer(self, callback):
+        if callback in self._stream_consumers:
+            self._stream_consumers.remove(callback)
+
+    def set_energy_threshold(self, value):
+        self.energy_threshold = value
+        if self.segmenter is not None:
+            self.segmenter.energy_threshold = value
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self.finished.clear()
+        self.source.open()
+        self.segmenter = create_segmenter(
+            self.source.sample_rate, self.source.sample_width, self.source.chunk_size,
+            vad=self.vad, logger=self.logger,
+            energy_threshold=self.energy_threshold,
+            dynamic_energy_threshold=self.dynamic_energy_threshold,
+            ring_seconds=self.ring_seconds,
+        )
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop capturing; the thread finishes its current chunk and closes the source (releasing
+        the microphone). Returns False if it had not ended within timeout."""
+        self._stop.set()
+        stopped = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            stopped = not self._thread.is_alive()
+            self._thread = None
+        return stopped
+
+    def get_utterance(self, timeout=None):
+        """Next utterance, or None if nothing arrived within timeout."""
+        try:
+            return self.utterances.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def discard_pending(self):
+        while True:
+            try:
+                self.utterances.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self.source.read()
+                if not chunk:
+                    break
+                seq, was_speaking = self.segmenter.next_seq, self.segmenter.in_speech
+                utterance = self.segmenter.feed(chunk)
+                if self._stream_consumers:
+                    self._stream_chunk(seq, was_speaking, chunk, utterance)
+                if utterance is not None:
+                    self._emit(utterance)
+            seq, was_speaking = self.segmenter.next_seq, self.segmenter.in_speech
+            utterance = self.segmenter.flush()
+            if was_speaking and self._stream_consumers:
+                self._stream("end" if utterance else "cancel", seq, utterance)
+            if utterance is not None:
+                self._emit(utterance)
+        except Exception as e:
+            self.logger(f"Audio capture stopped: {e}")
+        finally:
+            self.source.close()
+            self.finished.set()
+
+    def _stream_chunk(self, seq, was_speaking, chunk, utterance):
+        if not was_speaking and self.segmenter.in_speech:
+            self._stream("start", seq, self.segmenter.pending_audio())
+        elif was_speaking:
+            self._stream("audio", seq, chunk)
+            if utterance is not None:
+                self._stream("end", seq, utterance)
+            elif not self.segmenter.in_speech:
+                self._stream("cancel", seq, None)
+
+    def _stream(self, event, seq, data):
+        for callback in self._stream_consumers:
+            callback(event, seq, data)
+
+    def _emit(self, utterance):
+        utterance.end_time = time.monotonic()
+        utterance.start_time = utterance.end_time - utterance.duration
+        claimed = False
+        for callback in list(self._consumers):
+            claimed = callback(utterance) is True or claimed
+        if claimed or not self.queue_utterances:
+            return
+        try:
+            self.utterances.put_nowait(utterance)
+        except queue.Full:
+            try:
+                self.utterances.get_nowait()
+            except queue.Empty:
+                pass
+            self.utterances.put_nowait(utterance)
+            self.dropped += 1
+            self.logger("Dropped an unprocessed utterance (capture queue full).")
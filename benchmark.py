@@ -0,0 +1,314 @@
+"""Offline replay benchmark for the voice -> document pipeline.
+
+Feeds WAV recordings through NotepadController with a scripted FakeRecognizer, a stub editor
+process and a headless document backend, then reports latency, throughput, dropped utterances
+and command-dispatch accuracy. Runs on Linux without a microphone, display or network.
+
+    python benchmark.py                              # synthetic corpus, print report
+    python benchmark.py --corpus my_corpus           # corpus.json + WAV files
+    python benchmark.py --baseline base.json         # fail (exit 1) on a regression
+    python benchmark.py --baseline base.json --update-baseline
+    python benchmark.py --editor-startup 1.5 --editor-pool 0   # cold editor starts (stub_editor.py)
+    python benchmark.py --editor-startup 1.5                   # the same with a warm editor pool
+
+corpus.json:
+    {"commands": {...optional commands.json override...},
+     "recordings": [{"wav": "session1.wav",
+                     "utterances": [{"text": "create a notepad called shopping", "action": "create_named"},
+                                    {"text": "buy milk", "action": "write"}],
+                     "files": {"shopping.txt": "buy milk\\n"}}]}
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+from audio_capture import WavFileSource
+from document_backends import FileDocumentBackend, NotepadAutomationBackend, RecordingAutomation
+from hcidublicate import NotepadController
+from metrics import Histogram, MetricsRegistry
+from recognizers import FakeRecognizer
+
+DEFAULT_COMMANDS = {
+    "create": "create a notepad",
+    "open": "open the notepad",
+    "save": "save the notepad",
+    "close": "close the notepad",
+    "open_named": "open note <name>",
+    "create_named": "create a notepad called <name>",
+}
+
+SYNTHETIC_SCRIPT = [
+    ("create a notepad called shopping", "create_named"),
+    ("buy milk", "write"),
+    ("and eggs", "write"),
+    ("save the notepad", "save"),
+    ("close the notepad", "close"),
+    ("open the notepad", "open"),
+    ("shopping", "open"),
+    ("also bread", "write"),
+    ("save the notepad", "save"),
+]
+
+STUB_EDITOR = [sys.executable, "-c", "import time; time.sleep(3600)", "{path}"]
+STUB_EDITOR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_editor.py")
+
+# metric -> True if bigger is better
+BASELINE_METRICS = {
+    "e2e_p50": False,
+    "e2e_p95": False,
+    "utterances_per_second": True,
+    "dispatch_accuracy": True,
+    "dropped_rate": False,
+}
+
+
+def synth_wav(path, words_per_utterance, sample_rate=16000, pause=1.0):
+    """Write tone bursts (about 0.25 s per word) separated by silence."""
+    frames = bytearray(struct.pack("<h", 0) * int(0.6 * sample_rate))
+    for words in words_per_utterance:
+        duration = 0.3 + 0.25 * words
+        for i in range(int(duration * sample_rate)):
+            envelope = min(1.0, i / 400, (duration * sample_rate - i) / 400)
+            frames += struct.pack("<h", int(3000 * envelope * math.sin(2 * math.pi * 220 * i / sample_rate)))
+        frames += struct.pack("<h", 0) * int(pause * sample_rate)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+
+
+def generate_corpus(directory, recordings=3):
+    """Create a synthetic corpus.json + WAV files in directory."""
+    os.makedirs(directory, exist_ok=True)
+    corpus = {"commands": DEFAULT_COMMANDS, "recordings": []}
+    for n in range(recordings):
+        name = f"synthetic_{n + 1}.wav"
+        synth_wav(os.path.join(directory, name), [len(text.split()) for text, _ in SYNTHETIC_SCRIPT])
+        corpus["recordings"].append({
+            "wav": name,
+            "utterances": [{"text": text, "action": action} for text, action in SYNTHETIC_SCRIPT],
+            "files": {"shopping.txt": "buy milk\nand eggs\nalso bread\n"},
+        })
+    with open(os.path.join(directory, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(corpus, f, indent=2)
+    return directory
+
+
+def run_recording(corpus_dir, recording, commands, args):
+    """Replay one recording; returns per-utterance results and the controller's metrics."""
+    notes_dir = tempfile.mkdtemp(prefix="voice_notepad_bench_")
+    metrics = MetricsRegistry()
+    texts = [u["text"] for u in recording["utterances"]]
+    if args.document == "file":
+        document = FileDocumentBackend(flush_policy="save", fsync=False, metrics=metrics)
+    else:
+        document = NotepadAutomationBackend(automation=RecordingAutomation(), save_delay=0, metrics=metrics)
+    controller = NotepadController(
+        logger=(print if args.verbose else lambda message: None),
+        audio_source=WavFileSource(os.path.join(corpus_dir, recording["wav"]), realtime=args.speed or False),
+        backend=FakeRecognizer(texts, latency=args.recognizer_latency),
+        document=document,
+        metrics=metrics,
+    )
+    controller.script_directory = notes_dir
+    controller.set_commands(commands)
+    if args.editor_startup is not None:
+        # An editor that takes editor_startup seconds to start, handed its files over stdin
+        controller.set_editor_command([sys.executable, STUB_EDITOR_SCRIPT, "--startup-delay", str(args.editor_startup)])
+        controller.set_editor_pool(args.editor_pool, "stdin")
+    else:
+        controller.set_editor_command(STUB_EDITOR)
+
+    results = []
+    controller.start_listening()  # As the app does; also starts filling the editor pool
+    started = time.perf_counter()
+    try:
+        while True:
+            text = controller.continuous_listen()
+            if text is None and controller.capture_finished:
+                break
+            if not text:
+                continue
+            utterance = controller.last_utterance
+            dispatched = time.perf_counter()
+            action = controller.dispatch(text.strip().lower())
+            controller.executor.wait_idle()
+            done = time.monotonic()
+            results.append({
+                "text": text,
+                "action": action,
+                "command_latency": time.perf_counter() - dispatched,
+                "e2e_latency": done - utterance.end_time if utterance and utterance.end_time else None,
+            })
+        wall = time.perf_counter() - started
+        dropped = controller.capture.dropped if controller.capture else 0
+        files_ok = check_files(notes_dir, recording.get("files", {}), controller)
+    finally:
+        controller.stop_capture()
+        controller.close_all_notepads()
+        if controller.editor_pool is not None:
+            controller.editor_pool.close()
+        controller.executor.stop()
+        shutil.rmtree(notes_dir, ignore_errors=True)
+    return results, wall, dropped, files_ok, metrics
+
+
+def check_files(notes_dir, expected, controller):
+    if controller.document_name == "file" and controller.notepad_open:
+        controller.document.save()
+    ok = True
+    for name, content in expected.items():
+        path = os.path.join(notes_dir, name)
+        actual = open(path, encoding="utf-8").read() if os.path.exists(path) else None
+        if controller.document_name == "file" and actual != content:
+            print(f"  document mismatch in {name}: expected {content!r}, got {actual!r}")
+            ok = False
+    return ok
+
+
+def run(args):
+    corpus_dir = args.corpus
+    if corpus_dir is None:
+        corpus_dir = generate_corpus(tempfile.mkdtemp(prefix="voice_notepad_corpus_"))
+    with open(os.path.join(corpus_dir, "corpus.json"), encoding="utf-8") as f:
+        corpus = json.load(f)
+    commands = corpus.get("commands", DEFAULT_COMMANDS)
+
+    e2e, per_command = Histogram(), {}
+    expected_total = correct = dispatched = dropped = 0
+    wall_total = 0.0
+    documents_ok = True
+    stage_metrics = {}
+    for recording in corpus["recordings"]:
+        results, wall, dropped_here, files_ok, metrics = run_recording(corpus_dir, recording, commands, args)
+        expected = [u.get("action", "write") for u in recording["utterances"]]
+        actual = [r["action"] for r in results]
+        expected_total += len(expected)
+        dispatched += len(results)
+        correct += sum(1 for e, a in zip(expected, actual) if e == a)
+        dropped += dropped_here
+        wall_total += wall
+        documents_ok = documents_ok and files_ok
+        for r in results:
+            if r["e2e_latency"] is not None:
+                e2e.observe(r["e2e_latency"])
+            per_command.setdefault(r["action"], Histogram()).observe(r["command_latency"])
+        for name, summary in metrics.snapshot().items():
+            stage_metrics.setdefault(name, []).append(summary["p95"])
+        print(f"{recording['wav']}: {len(results)}/{len(expected)} utterances, "
+              f"{sum(1 for e, a in zip(expected, actual) if e == a)} correct actions, {wall:.2f}s")
+
+    report = {
+        "recordings": len(corpus["recordings"]),
+        "utterances_expected": expected_total,
+        "utterances_dispatched": dispatched,
+        "dropped_rate": max(0.0, 1 - dispatched / expected_total) if expected_total else 0.0,
+        "capture_queue_drops": dropped,
+        "dispatch_accuracy": correct / expected_total if expected_total else 1.0,
+        "utterances_per_second": dispatched / wall_total if wall_total else 0.0,
+        "e2e_p50": e2e.percentile(50),
+        "e2e_p95": e2e.percentile(95),
+        "e2e_p99": e2e.percentile(99),
+        "per_command_p50": {name: h.percentile(50) for name, h in sorted(per_command.items())},
+        "per_command_p95": {name: h.percentile(95) for name, h in sorted(per_command.items())},
+        "stage_p95": {name: max(values) for name, values in sorted(stage_metrics.items())},
+        "documents_ok": documents_ok,
+    }
+    return report
+
+
+def print_report(report):
+    print()
+    print(f"utterances:        {report['utterances_dispatched']}/{report['utterances_expected']} "
+          f"(dropped rate {report['dropped_rate']:.1%}, capture queue drops {report['capture_queue_drops']})")
+    print(f"dispatch accuracy: {report['dispatch_accuracy']:.1%}")
+    print(f"throughput:        {report['utterances_per_second']:.2f} utterances/s")
+    print(f"end-to-end:        p50 {report['e2e_p50'] * 1000:.1f} ms, p95 {report['e2e_p95'] * 1000:.1f} ms, "
+          f"p99 {report['e2e_p99'] * 1000:.1f} ms")
+    for name, p50 in report["per_command_p50"].items():
+        print(f"  {name:<14} p50 {p50 * 1000:8.1f} ms   p95 {report['per_command_p95'][name] * 1000:8.1f} ms")
+    if "editor.open" in report["stage_p95"]:
+        print(f"editor open:       p95 {report['stage_p95']['editor.open'] * 1000:.1f} ms")
+    print(f"documents:         {'ok' if report['documents_ok'] else 'MISMATCH'}")
+
+
+def compare(report, baseline, tolerance, slack):
+    """List of regression messages (empty if the run is at least as good as the baseline)."""
+    failures = []
+    for metric, higher_is_better in BASELINE_METRICS.items():
+        if metric not in baseline:
+            continue
+        old, new = baseline[metric], report[metric]
+        if higher_is_better:
+            limit = old * (1 - tolerance)
+            if new < limit:
+                failures.append(f"{metric} dropped: {new:.4f} < {limit:.4f} (baseline {old:.4f})")
+        else:
+            limit = old * (1 + tolerance) + (slack if metric.startswith("e2e") else 0.0)
+            if new > limit:
+                failures.append(f"{metric} regressed: {new:.4f} > {limit:.4f} (baseline {old:.4f})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for Voice Notepad.")
+    parser.add_argument("--corpus", help="directory with corpus.json and WAV files (default: synthetic)")
+    parser.add_argument("--generate", metavar="DIR", help="write a synthetic corpus to DIR and exit")
+    parser.add_argument("--document", choices=("file", "notepad"), default="file",
+                        help="document backend: direct file writes or recorded Notepad automation")
+    parser.add_argument("--speed", type=float, default=4.0,
+                        help="replay speed-up over real time (0 = as fast as possible)")
+    parser.add_argument("--recognizer-latency", type=float, default=0.05,
+                        help="simulated recognition time per utterance, seconds")
+    parser.add_argument("--editor-startup", type=float,
+                        help="use stub_editor.py with this start-up delay, seconds (default: a plain stub process)")
+    parser.add_argument("--editor-pool", type=int, default=1,
+                        help="idle stub editors kept ready with --editor-startup (0 = cold start every time)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--slack", type=float, default=0.005, help="allowed absolute latency regression, seconds")
+    parser.add_argument("--min-accuracy", type=float, default=1.0, help="fail below this dispatch accuracy")
+    parser.add_argument("--report", help="write the full report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show controller log output")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        generate_corpus(args.generate)
+        print(f"Synthetic corpus written to {args.generate}")
+        return 0
+
+    report = run(args)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if report["dispatch_accuracy"] < args.min_accuracy:
+        failures.append(f"dispatch accuracy {report['dispatch_accuracy']:.1%} below {args.min_accuracy:.1%}")
+    if not report["documents_ok"]:
+        failures.append("document contents did not match the corpus")
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({metric: report[metric] for metric in BASELINE_METRICS}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures += compare(report, json.load(f), args.tolerance, args.slack)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class CancelToken:
+    """One-shot cancellation shared by the blocking stages of a session (capture, recognition,
+    filename prompts, editor waits).
+
+    Waiters either poll cancelled / wait() in short slices or register an on_cancel callback that
+    unblocks them at once (e.g. puts a wake-up sentinel into the queue they are reading). Callbacks
+    run on the thread calling cancel() and must not block. A token made with a parent is
+    cancelled together with it; once cancelled it unhooks itself from the parent, so short-lived
+    children of a long-lived token don't pile up in its callbacks. is_set()/set()/wait() mirror
+    threading.Event, so a token can be passed wherever a stop_event is expected.
+    """
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+        self.cancelled_at = None  # time.monotonic() of cancel(), for measuring how long stopping took
+        self._parent, self._from_parent = parent, None
+        if parent is not None:
+            self._from_parent = parent.on_cancel(lambda: self.cancel(parent.reason))
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason=None):
+        """Cancel and run the wake-up callbacks; returns False if it was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self.cancelled_at = time.monotonic()
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        if self._parent is not None:
+            self._parent.remove(self._from_parent)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+        return True
+
+    def on_cancel(self, callback):
+        """Call callback() on cancel (right away if already cancelled); returns it for remove()."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return callback
+        callback()
+        return callback
+
+    def remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout=None):
+        """Sleep up to timeout seconds; True as soon as the token is cancelled."""
+        return self._event.wait(timeout)
+
+    def elapsed(self):
+        """Seconds since cancel() (0.0 if not cancelled)."""
+        return time.monotonic() - self.cancelled_at if self.cancelled_at is not None else 0.0
+
+    # threading.Event compatibility
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        self.cancel()
@@ -0,0 +1,175 @@
+import re
+
+_SLOT = re.compile(r"^<(\w+)>$")
+_WORD = re.compile(r"[a-z0-9']+")
+FILLER_WORDS = frozenset(["please", "now", "okay", "ok", "hey"])
+
+
+def tokenize(text):
+    return _WORD.findall(text.lower())
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def word_tolerance(word):
+    """How many character edits a single spoken word may be off by."""
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+class CommandMatch:
+    """A transcript that matched a command phrase."""
+
+    def __init__(self, action, phrase, slots=None, cost=0, data=None):
+        self.action = action
+        self.phrase = phrase
+        self.slots = slots or {}
+        self.cost = cost
+        self.data = data
+
+    def __repr__(self):
+        return f"CommandMatch({self.action!r}, slots={self.slots!r}, cost={self.cost})"
+
+
+class _Node:
+    __slots__ = ("children", "slot", "slot_name", "terminals")
+
+    def __init__(self):
+        self.children = {}
+        self.slot = None
+        self.slot_name = None
+        self.terminals = []
+
+
+class CommandGrammar:
+    """Word-level trie over all command phrases, matched against whole utterances.
+
+    Phrases are plain words plus optional slots such as "open note <name>", where a slot takes one or
+    more spoken words. Matching is anchored to the whole transcript (apart from filler words like
+    "please"), so a command phrase inside ordinary dictation does not fire. Each word may be off
+    by a small edit distance, with at most max_edits edits per phrase.
+    """
+
+    def __init__(self, max_edits=2):
+        self.max_edits = max_edits
+        self.root = _Node()
+        self.size = 0
+
+    @classmethod
+    def from_commands(cls, commands, **options):
+        """Compile a commands.json-style dict.
+
+        Values may be a phrase, a list of alternative phrases, or (for the "snippets" key) a
+        {phrase: text} mapping whose phrases insert the text.
+        """
+        grammar = cls(**options)
+        for action, value in commands.items():
+            if action == "snippets" and isinstance(value, dict):
+                for phrase, text in value.items():
+                    grammar.add(phrase, "snippet", data=text)
+            elif isinstance(value, (list, tuple)):
+                for phrase in value:
+                    grammar.add(phrase, action)
+            elif isinstance(value, str):
+                grammar.add(value, action)
+        return grammar
+
+    def add(self, phrase, action, data=None):
+        tokens = phrase.lower().split()
+        if not tokens:
+            return
+        node = self.root
+        for token in tokens:
+            slot = _SLOT.match(token)
+            if slot:
+                if node.slot is None:
+                    node.slot = _Node()
+                    node.slot_name = slot.group(1)
+                node = node.slot
+            else:
+                for word in tokenize(token):
+                    node = node.children.setdefault(word, _Node())
+        node.terminals.append((action, phrase, data))
+        self.size += 1
+
+    def match(self, text):
+        """Best CommandMatch for the whole transcript, or None if it is ordinary dictation."""
+        words = tokenize(text)
+        start, end = 0, len(words)
+        while start < end and words[start] in FILLER_WORDS:
+            start += 1
+        while end > start and words[end - 1] in FILLER_WORDS:
+            end -= 1
+        words = words[start:end]
+        if not words:
+            return None
+        best = None
+        for cost, slot_words, node, slots in self._walk(self.root, words, 0, 0, 0, {}):
+            if not node.terminals or (cost and len(words) == 1):
+                continue  # A one-word command must be heard exactly: "oven" or "opens" is dictation, not "open"
+            key = (cost, slot_words)
+            if best is None or key < best[0]:
+                best = (key, node, slots)
+        if best is None:
+            return None
+        (cost, _), node, slots = best
+        action, phrase, data = node.terminals[0]
+        return CommandMatch(action, phrase, slots=slots, cost=cost, data=data)
+
+    def is_prefix(self, words):
+        """True if words could still grow into a command phrase (used to hold back dictation)."""
+        words = list(words)
+        while words and words[0] in FILLER_WORDS:
+            words.pop(0)
+        states = {(id(self.root), False): self.root}
+        for word in words:
+            next_states = {}
+            for (_, in_slot), node in states.items():
+                if in_slot:
+                    next_states[(id(node), True)] = node  # a slot can keep taking words
+                child = node.children.get(word)
+                if child is not None:
+                    next_states[(id(child), False)] = child
+                if node.slot is not None:
+                    next_states[(id(node.slot), True)] = node.slot
+            if not next_states:
+                return False
+            states = next_states
+        return True
+
+    def _walk(self, node, words, i, cost, slot_words, slots):
+        """Yield (cost, slot_words, end_node, slots) for every way to consume words[i:] from node."""
+        if i == len(words):
+            yield cost, slot_words, node, slots
+            return
+        word = words[i]
+        child = node.children.get(word)
+        if child is not None:
+            yield from self._walk(child, words, i + 1, cost, slot_words, slots)
+        budget = min(self.max_edits - cost, word_tolerance(word))
+        if budget > 0:
+            for literal, child in node.children.items():
+                if literal == word:
+                    continue
+                distance = edit_distance(word, literal, budget)
+                if distance <= budget:
+                    yield from self._walk(child, words, i + 1, cost + distance, slot_words, slots)
+        if node.slot is not None:
+            for j in range(i + 1, len(words) + 1):
+                filled = dict(slots)
+                filled[node.slot_name] = " ".join(words[i:j])
+                yield from self._walk(node.slot, words, j, cost, slot_words + j - i, filled)
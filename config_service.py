@@ -0,0 +1,250 @@
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+
+
+def atomic_write_json(path, data):
+    """Write data as JSON to a temp file in the same folder, fsync it, then rename it over path.
+
+    The file keeps its permissions; a new one gets the same as open(path, "w") would give it.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, _file_mode(path))  # mkstemp creates it readable by the owner only
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _file_mode(path):
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)  # Reading the umask means setting it
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+class ConfigFile:
+    """One JSON object file kept in memory.
+
+    Reads come from the cache, which is reloaded when the file's mtime changes (e.g. edited by
+    hand). update() changes the cache at once, tells subscribers, and leaves writing to the
+    owning ConfigService's background writer.
+    """
+
+    def __init__(self, path, defaults=None, logger=None, on_dirty=None):
+        self.path = path
+        self.defaults = dict(defaults or {})
+        self.logger = logger or print
+        self.on_dirty = on_dirty  # Called after an in-memory change that still has to be written
+        self.dirty = False
+        self._data = {}
+        self._stamp = None  # (mtime_ns, size) of the file as last read or written
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self.reload()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, self.defaults.get(key, default))
+
+    @property
+    def data(self):
+        """Copy of the defaults overlaid with the stored values."""
+        with self._lock:
+            return {**self.defaults, **self._data}
+
+    def subscribe(self, callback, keys=None):
+        """callback(changes) with {key: new value} whenever any of keys (default: any key) change."""
+        self._subscribers.append((callback, set(keys) if keys else None))
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, keys) for cb, keys in self._subscribers if cb is not callback]
+
+    def update(self, changes=None, **kwargs):
+        """Change values in memory and schedule a save; returns {key: new value} for real changes."""
+        return self._change(dict(changes or {}, **kwargs))
+
+    def replace(self, data):
+        """Make the stored values exactly data (keys missing from it go back to their defaults)."""
+        with self._lock:
+            removed = [key for key in self._data if key not in data]
+        return self._change(data, removed)
+
+    def _change(self, changes, removed=()):
+        with self._lock:
+            changed = {key: value for key, value in changes.items() if self._data.get(key) != value}
+            self._data.update(changed)
+            for key in removed:
+                if self._data.pop(key, None) is not None:
+                    changed[key] = self.defaults.get(key)
+            if changed:
+                self.dirty = True
+        if changed:
+            self._notify(changed)
+            if self.on_dirty:
+                self.on_dirty()
+        return changed
+
+    def changed_on_disk(self):
+        return self._file_stamp() != self._stamp
+
+    def reload(self, notify=False):
+        """Re-read the file (missing or unreadable means empty); returns the keys that changed."""
+        stamp = self._file_stamp()
+        data = {}
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+            except (OSError, ValueError) as e:
+                self.logger(f"Failed to load {os.path.basename(self.path)}: {e}")
+                data = {}
+        with self._lock:
+            if notify and self.dirty:
+                return {}  # A hot reload never drops changes that are still waiting to be written
+            changed = {key: data.get(key, self.defaults.get(key))
+                       for key in set(data) | set(self._data) if data.get(key) != self._data.get(key)}
+            self._data = data
+            self._stamp = stamp
+            self.dirty = False
+        if changed and notify:
+            self._notify(changed)
+        return changed
+
+    def save(self):
+        """Write the cache now if it has unsaved changes."""
+        with self._lock:
+            if not self.dirty:
+                return False
+            data = dict(self._data)
+            self.dirty = False
+            try:
+                atomic_write_json(self.path, data)
+            except OSError as e:
+                self.dirty = True
+                self.logger(f"Failed to save {os.path.basename(self.path)}: {e}")
+                return False
+            self._stamp = self._file_stamp()
+        return True
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _notify(self, changed):
+        for callback, keys in list(self._subscribers):
+            if keys is None or keys & changed.keys():
+                try:
+                    callback(changed if keys is None else {k: v for k, v in changed.items() if k in keys})
+                except Exception as e:
+                    self.logger(f"Config subscriber failed: {e}")
+
+
+class ConfigService:
+    """settings.json and commands.json from one folder, cached in memory.
+
+    Saves are debounced (save_delay after the last change) and written atomically by a background
+    thread, which also polls the files every poll_interval and pushes outside edits to
+    subscribers (hot reload). flush() writes pending changes at once, e.g. on exit.
+    """
+
+    def __init__(self, folder=None, save_delay=0.5, poll_interval=1.0, logger=None,
+                 settings_defaults=None, commands_defaults=None):
+        self.folder = folder or os.getcwd()
+        self.save_delay = save_delay
+        self.poll_interval = poll_interval
+        self.logger = logger or print
+        self.settings = ConfigFile(os.path.join(self.folder, "settings.json"), settings_defaults,
+                                   self.logger, self._schedule_save)
+        self.commands = ConfigFile(os.path.join(self.folder, "commands.json"), commands_defaults,
+                                   self.logger, self._schedule_save)
+        self.files = (self.settings, self.commands)
+        self._save_at = None
+        self._watching = False
+        self._wake = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def start(self, watch=True):
+        """Start the background writer (and, with watch, hot reload of outside edits)."""
+        with self._wake:
+            self._watching = self._watching or watch
+            self._stopped = False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def stop(self, timeout=2.0):
+        """Write pending changes and stop the background thread."""
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        with self._wake:
+            self._save_at = None
+        for config in self.files:
+            config.save()
+
+    def check_for_changes(self):
+        """Reload files edited outside the app (unsaved in-memory changes win)."""
+        for config in self.files:
+            if not config.dirty and config.changed_on_disk():
+                changed = config.reload(notify=True)
+                if changed:
+                    self.logger(f"Reloaded {os.path.basename(config.path)}: {', '.join(sorted(changed))}")
+
+    def _schedule_save(self):
+        with self._wake:
+            self._save_at = time.monotonic() + self.save_delay
+            self._wake.notify()
+        if self._thread is None:
+            self.start(watch=False)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    if self._save_at is not None and now >= self._save_at:
+                        break
+                    timeout = self.poll_interval if self._watching else None
+                    if self._save_at is not None:
+                        timeout = min(timeout or self.save_delay, self._save_at - now)
+                    if not self._wake.wait(timeout) and self._watching and self._save_at is None:
+                        break  # Poll interval elapsed
+                save = self._save_at is not None and time.monotonic() >= self._save_at
+                if save:
+                    self._save_at = None
+            if save:
+                for config in self.files:
+                    config.save()
+            if self._watching:
+                self.check_for_changes()
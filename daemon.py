@@ -0,0 +1,344 @@
+"""Headless recognition host: many thin clients stream PCM over a local socket.
+
+    python daemon.py --port 8765                      # TCP on 127.0.0.1
+    python daemon.py --unix /tmp/voice_notepad.sock   # Unix socket (not on Windows)
+    python daemon.py --recognizer fake                # no network/model, for load tests
+
+Protocol (one connection = one session):
+    client -> server  one JSON header line, e.g.
+                      {"session": "kiosk-3", "sample_rate": 16000, "sample_width": 2, "document": "notes"}
+                      then frames of 1 type byte + 4-byte big-endian length + payload:
+                      b"A" raw PCM (mono), b"E" end of stream (empty payload)
+    server -> client  JSON lines: {"event": "ready"}, {"event": "result", "seq", "text", "action",
+                      "end_offset"}, {"event": "unrecognized", "seq"}, {"event": "error", "error"},
+                      {"event": "closed", "utterances"}
+
+Every session gets its own NotepadController (commands, dialog state, notes folder under
+--notes-root and an open document), its own endpointing, and at most --max-pending utterances
+waiting for recognition. When that limit is reached the server stops reading the session's
+socket, so a client that streams faster than it can be served is slowed down by TCP itself.
+Recognition runs on a shared pool of --workers threads.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_capture import SEGMENTERS, create_segmenter
+from config_service import ConfigService
+from document_backends import FileDocumentBackend
+from hcidublicate import NotepadController
+from metrics import MetricsRegistry
+from recognizers import FakeRecognizer, RecognitionError, UnknownSpeech, create_backend
+
+FRAME_HEADER = struct.Struct(">cI")
+MAX_FRAME = 1 << 20
+
+
+def fake_script(utterance):
+    """Default transcript for --recognizer fake: one dictated line per utterance."""
+    return f"line {utterance.seq}"
+
+
+class DaemonSession:
+    """One client connection: endpointing, ordered recognition and its own controller."""
+
+    def __init__(self, server, session_id, header, reader, writer):
+        self.server = server
+        self.id = session_id
+        self.reader = reader
+        self.writer = writer
+        self.name = _safe_name(header.get("session")) or f"session-{session_id}"
+        if any(other.name == self.name for other in server.sessions.values()):
+            # Two controllers over one folder would overwrite each other's notes
+            raise ValueError(f"session {self.name!r} is already connected")
+        self.sample_rate = int(header.get("sample_rate", 16000))
+        self.sample_width = int(header.get("sample_width", 2))
+        if self.sample_rate <= 0:
+            raise ValueError(f"sample_rate must be positive, got {self.sample_rate}")
+        if self.sample_width not in (1, 2, 4):
+            raise ValueError(f"sample_width must be 1, 2 or 4 bytes, got {self.sample_width}")
+        self.chunk_bytes = server.chunk_size * self.sample_width
+        self.segmenter = create_segmenter(self.sample_rate, self.sample_width, server.chunk_size, vad=server.vad,
+                                          logger=self.log, energy_threshold=int(header.get("energy_threshold", 150)))
+        self.utterances = asyncio.Queue(maxsize=server.max_pending)
+        self.received = 0  # PCM bytes received
+        self.results = 0
+        folder = _inside(server.notes_root, self.name)
+        self.document = None
+        if header.get("document"):
+            self.document = _safe_name(header["document"])
+            if not self.document:
+                raise ValueError(f"bad document name {header['document']!r}")
+            _inside(folder, f"{self.document}.txt")
+        commands = header.get("commands") or {}
+        if not isinstance(commands, dict):
+            raise ValueError("commands must be a JSON object")
+        os.makedirs(folder, exist_ok=True)
+        self.controller = NotepadController(
+            logger=self.log,
+            document=FileDocumentBackend(fsync=False, metrics=server.metrics),
+            config=ConfigService(folder, logger=self.log),
+            metrics=server.metrics,
+        )
+        self.controller.script_directory = folder
+        self.controller.open_viewer = False
+        if commands:
+            self.controller.set_commands({**self.controller.commands, **commands})
+
+    def log(self, message):
+        self.server.log(f"[{self.name}] {message}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        if self.document:
+            await loop.run_in_executor(self.server.pool, self._open_document, self.document)
+        await self.send({"event": "ready", "session": self.name})
+        consumer = asyncio.create_task(self._recognize_loop())
+        try:
+            await self._read_loop()
+            utterance = self.segmenter.flush()
+            if utterance is not None:
+                await self.utterances.put((utterance, self.received))
+        finally:
+            await self.utterances.put(None)
+            await consumer
+            await loop.run_in_executor(self.server.pool, self._finish)
+        await self.send({"event": "closed", "utterances": self.results})
+
+    async def send(self, event):
+        try:
+            self.writer.write((json.dumps(event) + "\n").encode("utf-8"))
+            await self.writer.drain()
+        except (ConnectionError, RuntimeError):
+            pass  # Client went away; the session still finishes its queued work
+
+    async def _read_loop(self):
+        pending = bytearray()
+        limit = self.server.max_session_seconds * self.sample_rate * self.sample_width
+        while True:
+            try:
+                head = await asyncio.wait_for(self.reader.readexactly(FRAME_HEADER.size), self.server.idle_timeout)
+                kind, length = FRAME_HEADER.unpack(head)
+                if length > MAX_FRAME:
+                    raise ValueError(f"frame of {length} bytes is too large")
+                payload = await self.reader.readexactly(length) if length else b""
+            except asyncio.IncompleteReadError:
+                return  # Client closed without an end frame
+            except asyncio.TimeoutError:
+                await self.send({"event": "error", "error": "idle timeout"})
+                return
+            if kind == b"E":
+                return
+            if kind != b"A":
+                raise ValueError(f"unknown frame type {kind!r}")
+            self.received += len(payload)
+            if self.received > limit:
+                await self.send({"event": "error", "error": "session audio limit reached"})
+                return
+            pending += payload
+            while len(pending) >= self.chunk_bytes:
+                chunk = bytes(pending[:self.chunk_bytes])
+                del pending[:self.chunk_bytes]
+                utterance = self.segmenter.feed(chunk)
+                if utterance is not None:
+                    utterance.end_time = time.monotonic()
+                    # Blocks (and so stops reading the socket) while max_pending utterances wait
+                    await self.utterances.put((utterance, self.received - len(pending)))
+
+    async def _recognize_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.utterances.get()
+            if item is None:
+                return
+            utterance, end_offset = item
+            queued = time.monotonic()
+            try:
+                text, action = await loop.run_in_executor(self.server.pool, self._recognize, utterance, queued)
+            except UnknownSpeech:
+                await self.send({"event": "unrecognized", "seq": utterance.seq})
+                continue
+            except RecognitionError as e:
+                await self.send({"event": "error", "seq": utterance.seq, "error": str(e)})
+                continue
+            self.results += 1
+            await self.send({"event": "result", "seq": utterance.seq, "text": text, "action": action,
+                             "end_offset": end_offset})
+
+    def _recognize(self, utterance, queued):
+        metrics = self.server.metrics
+        metrics.observe("daemon.queue_wait", time.monotonic() - queued)
+        with metrics.span(f"recognition.{self.server.backend.name}"):
+            text = self.server.backend.recognize(utterance)
+        action = self.controller.dispatch(text.strip().lower())
+        if utterance.end_time is not None:
+            metrics.observe("daemon.end_of_speech_to_dispatch", time.monotonic() - utterance.end_time)
+        return text, action
+
+    def _open_document(self, name):
+        self.controller.open_notepad_with_name(name)
+        if not self.controller.notepad_open:
+            self.controller.create_notepad_with_name(name)
+
+    def _finish(self):
+        controller = self.controller
+        controller.executor.wait_idle()
+        if controller.notepad_open:
+            controller.save_notepad()
+        controller.document.close()
+        controller.executor.stop()
+        controller.config.stop()
+
+
+def _safe_name(value):
+    """A file or folder name from client input: word characters, dots and dashes, no leading dot."""
+    return re.sub(r"[^\w.-]", "_", str(value or "")).lstrip(".")[:64]
+
+
+def _inside(root, name):
+    """root/name, or ValueError if that resolves (e.g. through a symlink) to somewhere outside root."""
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise ValueError(f"{name!r} is outside the notes folder")
+    return path
+
+
+class DaemonServer:
+    """Accepts client sessions (up to max_sessions at a time) and runs them on one event loop."""
+
+    def __init__(self, backend, notes_root, workers=4, max_sessions=256, max_pending=2, chunk_size=1024,
+                 idle_timeout=30.0, max_session_seconds=3600, vad="auto", verbose=False):
+        self.backend = backend
+        self.notes_root = notes_root
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.idle_timeout = idle_timeout
+        self.max_session_seconds = max_session_seconds
+        self.vad = vad
+        self.verbose = verbose
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recognize")
+        self.metrics = MetricsRegistry()
+        self.sessions = {}
+        self.completed = 0
+        self.rejected = 0
+        self._next_id = 0
+
+    def log(self, message):
+        if self.verbose:
+            print(message, flush=True)
+
+    async def handle(self, reader, writer):
+        self._next_id += 1
+        session_id = self._next_id
+        try:
+            if len(self.sessions) >= self.max_sessions:
+                self.rejected += 1
+                writer.write(b'{"event": "error", "error": "server busy"}\n')
+                await writer.drain()
+                return
+            try:
+                header = json.loads(await asyncio.wait_for(reader.readline(), self.idle_timeout))
+            except (ValueError, asyncio.TimeoutError):
+                header = None
+            if not isinstance(header, dict):
+                writer.write(b'{"event": "error", "error": "expected a JSON object header line"}\n')
+                await writer.drain()
+                return
+            try:
+                session = DaemonSession(self, session_id, header, reader, writer)
+            except (TypeError, ValueError) as e:
+                writer.write((json.dumps({"event": "error", "error": f"bad header: {e}"}) + "\n").encode("utf-8"))
+                await writer.drain()
+                return
+            self.sessions[session_id] = session
+            started = time.monotonic()
+            try:
+                await session.run()
+            except Exception as e:
+                self.log(f"[{session.name}] session failed: {e}")
+                await session.send({"event": "error", "error": str(e)})
+            finally:
+                del self.sessions[session_id]
+                self.completed += 1
+                self.metrics.observe("daemon.session", time.monotonic() - started)
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+            where = unix_path
+        else:
+            server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+            where = f"{host}:{server.sockets[0].getsockname()[1]}"
+        print(f"Voice Notepad daemon listening on {where} ({self.backend.name} recognizer)", flush=True)
+        try:  # Service managers stop with SIGTERM; shut down as cleanly as for Ctrl+C
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Voice Notepad recognition daemon.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--recognizer", default="google", help="google, vosk or fake")
+    parser.add_argument("--model-path", help="Vosk model directory")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="seconds per utterance for --recognizer fake")
+    parser.add_argument("--notes-root", default=os.path.join(os.getcwd(), "sessions"),
+                        help="each session's notes go in a sub-folder named after the session")
+    parser.add_argument("--workers", type=int, default=4, help="recognition threads shared by all sessions")
+    parser.add_argument("--max-sessions", type=int, default=256)
+    parser.add_argument("--max-pending", type=int, default=2, help="utterances a session may have waiting")
+    parser.add_argument("--idle-timeout", type=float, default=30.0)
+    parser.add_argument("--vad", choices=SEGMENTERS, default="auto", help="endpointing (see audio_capture.py)")
+    parser.add_argument("--metrics", help="write latency metrics here on exit (.json or .prom)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.recognizer == "fake":
+        backend = FakeRecognizer(fake_script, latency=args.fake_latency)
+    elif args.recognizer == "vosk":
+        backend = create_backend("vosk", model_path=args.model_path)
+    else:
+        backend = create_backend(args.recognizer)
+    if args.unix and not hasattr(asyncio, "start_unix_server"):
+        parser.error("Unix sockets are not available on this platform")
+    os.makedirs(args.notes_root, exist_ok=True)
+    server = DaemonServer(backend, args.notes_root, workers=args.workers, max_sessions=args.max_sessions,
+                          max_pending=args.max_pending, idle_timeout=args.idle_timeout, vad=args.vad,
+                          verbose=args.verbose)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.pool.shutdown(wait=False)
+        print(f"{server.completed} sessions served, {server.rejected} rejected")
+        print(server.metrics.format_table())
+        if args.metrics:
+            server.metrics.export(args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
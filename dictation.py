@@ -0,0 +1,77 @@
+class IncrementalCommitter:
+    """Commits the stable prefix of streaming hypotheses while the user is still speaking.
+
+    A word is stable once it has been the same in the last `stability` partial hypotheses.
+    Stable words are written straight away; the unstable tail only shows up as a live partial.
+    Words that could be the start of a voice command are held back until the final result,
+    so "save the notepad" is never typed into the document.
+    """
+
+    def __init__(self, write, erase, could_be_command=None, stability=2):
+        self.write = write                         # write(text, newline)
+        self.erase = erase                         # erase(n_chars)
+        self.could_be_command = could_be_command   # could_be_command(words) -> bool
+        self.stability = stability
+        self.reset()
+
+    def reset(self):
+        self.committed = []
+        self._history = []
+
+    def partial(self, text):
+        """Feed a partial hypothesis; commits whatever became stable."""
+        words = text.lower().split()
+        self._history = (self._history + [words])[-self.stability:]
+        if len(self._history) < self.stability:
+            return
+        stable = _common_prefix(self._history)
+        stable = stable[:self._hold_point(stable)]
+        if len(stable) <= len(self.committed) or stable[:len(self.committed)] != self.committed:
+            return
+        new = stable[len(self.committed):]
+        self.write(" ".join(new) + " ", False)
+        self.committed = stable
+
+    def final(self, text):
+        """Reconcile with the final transcript and return the part still to be dispatched.
+
+        Returns the whole text if nothing was committed (so commands still work), else "": once
+        part of the utterance has been typed it is dictation, so the held-back rest is written
+        too ("i need to save the notepad" is typed, not saved).
+        """
+        committed, self.committed, self._history = self.committed, [], []
+        if text is None:
+            # Recognition failed; keep what was already typed and end the line
+            if committed:
+                self.write("", True)
+            return ""
+        words = text.lower().split()
+        if not committed:
+            return " ".join(words)
+        keep = len(_common_prefix([committed, words]))
+        if keep < len(committed):
+            # The recognizer changed its mind about words we already typed: take them back
+            self.erase(len(" ".join(committed[keep:])) + 1)
+            if keep:
+                committed = committed[:keep]
+            else:
+                return " ".join(words)
+        self.write(" ".join(words[len(committed):]), True)
+        return ""
+
+    def _hold_point(self, words):
+        """Index of the first word of the earliest suffix that could still grow into a command."""
+        if self.could_be_command is not None:
+            for i in range(len(words)):
+                if self.could_be_command(words[i:]):
+                    return i
+        return len(words)
+
+
+def _common_prefix(sequences):
+    prefix = []
+    for items in zip(*sequences):
+        if any(item != items[0] for item in items[1:]):
+            break
+        prefix.append(items[0])
+    return prefix
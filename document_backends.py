@@ -0,0 +1,406 @@
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import MetricsRegistry
+from piece_table import PieceTable
+
+
+class DocumentBackend:
+    """Where recognized text ends up. The controller only talks to this interface."""
+    name = "base"
+    needs_editor = False  # True if text can only be written through a running editor window
+    editable = False  # True if delete_last_sentence/replace_text/undo/redo are supported
+
+    def open(self, path):
+        pass
+
+    def write(self, text, newline=True):
+        raise NotImplementedError
+
+    def erase(self, count):
+        raise NotImplementedError
+
+    def save(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiAutomation:
+    """Clipboard and keystrokes for the focused window (Windows/X11/macOS desktop)."""
+
+    def __init__(self):
+        import pyautogui
+        import pyperclip
+        pyautogui.FAILSAFE = False
+        self.pyautogui = pyautogui
+        self.pyperclip = pyperclip
+
+    def paste(self, text):
+        self.pyperclip.copy(text)
+        self.pyautogui.hotkey('ctrl', 'v')
+
+    def press(self, key, presses=1):
+        self.pyautogui.press(key, presses=presses)
+
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys)
+
+
+class RecordingAutomation:
+    """Headless stand-in for PyAutoGuiAutomation that records calls and rebuilds the typed text."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.text = ""
+
+    def paste(self, text):
+        self._call("paste", text)
+        self.text += text
+
+    def press(self, key, presses=1):
+        self._call("press", key, presses)
+        if key == "enter":
+            self.text += "\n" * presses
+        elif key == "backspace":
+            self.text = self.text[:max(0, len(self.text) - presses)]
+
+    def hotkey(self, *keys):
+        self._call("hotkey", *keys)
+
+    def _call(self, *call):
+        self.calls.append(call)
+        if self.delay:
+            time.sleep(self.delay)
+
+
+class InjectionQueue:
+    """Coalesces queued writes into as few paste round-trips as possible.
+
+    Writes that arrive within `debounce` seconds of each other are joined (keeping their order
+    and line breaks) and pasted at once, but nothing waits longer than `max_delay`. Erases are
+    ordering barriers and flush() blocks until everything queued so far has been typed, so
+    save/close never overtake pending text.
+    """
+
+    def __init__(self, automation, debounce=0.1, max_delay=0.5, logger=None, metrics=None):
+        self.automation = automation
+        self.metrics = metrics or MetricsRegistry()
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.logger = logger or print
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._flushing = 0
+        self._last_submit = 0.0
+        self.batches = 0
+        self.injected = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self._thread = threading.Thread(target=self._run, name="text-injection", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """Number of writes/erases waiting to be injected."""
+        return len(self._items)
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "batches": self.batches,
+            "injected": self.injected,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency,
+            "avg_latency": self._total_latency / self.injected if self.injected else 0.0,
+        }
+
+    def submit(self, text, newline=True):
+        self._put(("write", text + ("\n" if newline else "")))
+
+    def submit_erase(self, count):
+        self._put(("erase", count))
+
+    def flush(self, timeout=5.0):
+        """Wait until everything submitted so far has been injected."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1  # Skip the debounce wait
+            self._cond.notify_all()
+            try:
+                while self._items or self._busy:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.logger("Timed out waiting for text to be typed.")
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(1.0)
+
+    def _put(self, item):
+        with self._cond:
+            now = time.monotonic()
+            self._items.append((item, now))
+            self._last_submit = now
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._items:
+                    return
+                # Debounce: wait for a quiet period, but never hold the oldest item past max_delay
+                while True:
+                    now = time.monotonic()
+                    quiet_until = self._last_submit + self.debounce
+                    give_up = self._items[0][1] + self.max_delay
+                    if now >= quiet_until or now >= give_up or self._closed or self._flushing:
+                        break
+                    self._cond.wait(min(quiet_until, give_up) - now)
+                batch = self._take_batch()
+                self._busy = True
+            try:
+                self._inject(batch)
+            except Exception as e:
+                self.logger(f"Error writing to Notepad: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _take_batch(self):
+        (kind, value), queued = self._items.popleft()
+        if kind == "erase":
+            return kind, value, [queued]
+        parts, times = [value], [queued]
+        while self._items and self._items[0][0][0] == "write":
+            (_, value), queued = self._items.popleft()
+            parts.append(value)
+            times.append(queued)
+        return kind, "".join(parts), times
+
+    def _inject(self, batch):
+        kind, value, times = batch
+        if kind == "erase":
+            self.automation.press('backspace', presses=value)
+        else:
+            body, newline = (value[:-1], True) if value.endswith("\n") else (value, False)
+            if body:
+                self.automation.paste(body)
+            if newline:
+                self.automation.press('enter')
+        done = time.monotonic()
+        self.batches += 1
+        for queued in times:
+            latency = done - queued
+            self.metrics.observe("document.inject", latency)
+            self.injected += 1
+            self._total_latency += latency
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+
+
+class NotepadAutomationBackend(DocumentBackend):
+    """Types into the focused Notepad window via the clipboard and simulated keystrokes.
+
+    Writes go through an InjectionQueue so bursts of short utterances become a single paste.
+    """
+    name = "notepad"
+    needs_editor = True
+
+    def __init__(self, save_delay=1.0, debounce=0.1, max_delay=0.5, automation=None, logger=None,
+                 metrics=None):
+        self.automation = automation or PyAutoGuiAutomation()
+        self.save_delay = save_delay
+        self.queue = InjectionQueue(self.automation, debounce=debounce, max_delay=max_delay, logger=logger,
+                                    metrics=metrics)
+
+    def write(self, text, newline=True):
+        self.queue.submit(text, newline)
+
+    def erase(self, count):
+        self.queue.submit_erase(count)
+
+    def save(self):
+        self.queue.flush()
+        self.automation.hotkey('ctrl', 's')
+        time.sleep(self.save_delay)
+
+    def close(self):
+        self.queue.flush()
+
+    def stats(self):
+        """Injection queue depth and latency figures."""
+        return self.queue.stats()
+
+
+class FileDocumentBackend(DocumentBackend):
+    """Edits the note file directly, through an in-memory PieceTable (see piece_table.py).
+
+    The file is memory-mapped rather than read, so large notes open instantly, and besides
+    dictation this backend supports the voice editing commands (delete the last sentence,
+    replace a word, undo/redo). flush_policy decides when edits reach the file:
+      "save"     - only on save()/close() (and when buffer_size bytes have piled up)
+      "write"    - after every write
+      "interval" - at most flush_interval seconds after the previous flush
+    Only the changed part of the file is written back. save() always flushes and, with
+    fsync=True, waits until the data is on disk.
+    """
+    name = "file"
+    editable = True
+
+    def __init__(self, flush_policy="save", flush_interval=2.0, fsync=True, buffer_size=64 * 1024,
+                 encoding="utf-8", max_undo=1000, logger=None, metrics=None):
+        if flush_policy not in ("save", "write", "interval"):
+            raise ValueError(f"Unknown flush policy: {flush_policy}")
+        self.flush_policy = flush_policy
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.max_undo = max_undo
+        self.logger = logger or print
+        self.metrics = metrics or MetricsRegistry()
+        self.path = None
+        self.table = None
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def open(self, path):
+        self.close()
+        self.path = path
+        if not os.path.exists(path):
+            open(path, "ab").close()
+        self.table = PieceTable(path, max_undo=self.max_undo)
+        self._last_flush = time.monotonic()
+
+    def write(self, text, newline=True):
+        if newline:
+            text += "\n"
+        data = text.encode(self.encoding)
+        if data:
+            self._open_table().append(data)
+            self._edited(len(data))
+
+    def erase(self, count):
+        """Remove the last count characters."""
+        table = self._open_table()
+        tail = table.read(max(0, len(table) - count * 4)).decode(self.encoding, errors="ignore")
+        cut = len(tail[-count:].encode(self.encoding)) if count else 0
+        if cut:
+            table.delete(len(table) - cut, len(table))
+            self._edited(cut)
+
+    def delete_last_sentence(self):
+        """Remove the last sentence (back to the previous . ! ? or line break); returns it, or None."""
+        table = self._open_table()
+        window = 4096
+        while True:
+            start = max(0, len(table) - window)
+            body = table.read(start).rstrip()
+            previous = max(body.rstrip(b".!?").rfind(mark) for mark in (b".", b"!", b"?", b"\n"))
+            if previous >= 0 or start == 0:
+                break
+            window *= 2  # A long sentence: look further back
+        if not body:
+            return None
+        if previous >= 0 and body[previous:previous + 1] != b"\n":
+            end = start + len(body)  # Keep the line break after the sentence
+        else:
+            end = len(table)
+        removed = table.read(start + previous + 1, end)
+        table.delete(start + previous + 1, end)
+        self._edited(len(removed))
+        return removed.decode(self.encoding, errors="replace").strip()
+
+    def replace_text(self, old, new):
+        """Replace the last whole-word occurrence of old (ignoring case); returns False if there is none."""
+        table = self._open_table()
+        needle = old.encode(self.encoding)
+        found = table.rfind(needle)
+        if found < 0:
+            return False
+        if table.read(found, found + 1).isupper():
+            new = new[:1].upper() + new[1:]  # "Paris" stays capitalized when replaced by a spoken "london"
+        data = new.encode(self.encoding)
+        table.replace(found, found + len(needle), data)
+        self._edited(len(data))
+        return True
+
+    def undo(self):
+        """Revert the last write or edit; returns False if there is nothing to undo."""
+        done = self._open_table().undo()
+        if done:
+            self._edited(0)
+        return done
+
+    def redo(self):
+        done = self._open_table().redo()
+        if done:
+            self._edited(0)
+        return done
+
+    def flush(self):
+        if self.table is None:
+            return
+        self.table.save()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def save(self):
+        """Durable flush: pending edits are written and (optionally) fsynced."""
+        table = self._open_table()
+        with self.metrics.span("document.save"):
+            table.save(fsync=self.fsync)
+            self._unflushed = 0
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        if self.table is not None:
+            self.save()
+            self.table.close()
+            self.table = None
+
+    def _open_table(self):
+        if self.table is None:
+            raise RuntimeError("No note file is open")
+        return self.table
+
+    def _edited(self, size):
+        self._unflushed += size
+        if (self.flush_policy == "write" or self._unflushed >= self.buffer_size
+                or (self.flush_policy == "interval"
+                    and time.monotonic() - self._last_flush >= self.flush_interval)):
+            self.flush()
+
+
+DOCUMENT_BACKENDS = {
+    "notepad": NotepadAutomationBackend,
+    "file": FileDocumentBackend,
+}
+
+
+def create_document_backend(name, logger=None, metrics=None, **options):
+    """Build a document backend by its settings name ("notepad" or "file")."""
+    try:
+        cls = DOCUMENT_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown document backend: {name}") from None
+    return cls(logger=logger, metrics=metrics, **options)
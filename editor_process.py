@@ -0,0 +1,368 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+WAIT_TIMEOUT = 0x102  # WaitForInputIdle result when the editor is still busy
+
+
+def wait_until(predicate, timeout, initial=0.005, max_interval=0.2, cancel=None):
+    """Poll predicate with exponential backoff; True as soon as it holds, False after timeout
+    (or as soon as the cancel token is cancelled)."""
+    deadline = time.monotonic() + timeout
+    interval = initial
+    while True:
+        if predicate():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (cancel is not None and cancel.cancelled):
+            return False
+        if cancel is not None:
+            cancel.wait(min(interval, remaining))
+        else:
+            time.sleep(min(interval, remaining))
+        interval = min(interval * 2, max_interval)
+
+
+class EditorProcessTracker:
+    """Starts editor processes and keeps their handles, so it only ever waits on or kills its own.
+
+    command is a list such as ["notepad.exe"] or ["gedit", "{path}"]; the file path replaces
+    "{path}" or is appended when there is no placeholder.
+    """
+
+    def __init__(self, command=("notepad.exe",), ready_timeout=5.0, close_timeout=3.0,
+                 settle_time=0.05, logger=None, cancel=None):
+        self.command = list(command)
+        self.cancel = cancel  # CancelToken; once cancelled, waits give up and close() kills at once
+        self.ready_timeout = ready_timeout
+        self.close_timeout = close_timeout
+        self.settle_time = settle_time
+        self.logger = logger or print
+        self.processes = []
+
+    def build_command(self, path=None):
+        if path is None:
+            return [part for part in self.command if part != "{path}"]
+        if "{path}" in self.command:
+            return [path if part == "{path}" else part for part in self.command]
+        return self.command + [path]
+
+    def spawn(self, path=None, wait=True, track=True, **popen_options):
+        """Start the editor (optionally on path) and wait until it is ready for input.
+
+        track=False starts it without adding it to processes (e.g. an idle editor kept by EditorPool).
+        """
+        process = subprocess.Popen(self.build_command(path), **popen_options)
+        if track:
+            self.processes.append(process)
+        if wait and not self.wait_ready(process):
+            self.logger("Editor did not report ready in time; continuing anyway.")
+        return process
+
+    def wait_ready(self, process, timeout=None):
+        """Block until process can take input (Windows: WaitForInputIdle) or has settled."""
+        timeout = self.ready_timeout if timeout is None else timeout
+        if sys.platform == "win32":
+            try:
+                import ctypes
+                deadline = time.monotonic() + timeout
+                while True:  # In short slices so a cancel is noticed
+                    result = ctypes.windll.user32.WaitForInputIdle(int(process._handle), 50)
+                    if result == 0:
+                        return True
+                    if result != WAIT_TIMEOUT or time.monotonic() >= deadline or self._cancelled():
+                        break
+            except Exception:
+                pass
+        # No input-idle signal here: the editor counts as ready once it has stayed up briefly
+        started = time.monotonic()
+        return wait_until(
+            lambda: process.poll() is not None or time.monotonic() - started >= self.settle_time,
+            timeout, cancel=self.cancel,
+        ) and process.poll() in (None, 0)
+
+    def is_running(self):
+        self._prune()
+        return bool(self.processes)
+
+    def close(self, process, timeout=None):
+        """Terminate one editor we started (and its children), escalating to kill after timeout."""
+        timeout = self.close_timeout if timeout is None else timeout
+        targets = [process] + self._children(process)
+        for target in targets:
+            try:
+                target.terminate()
+            except Exception:
+                pass
+        if not wait_until(lambda: all(_exited(t) for t in targets), timeout, cancel=self.cancel):
+            for target in targets:
+                try:
+                    target.kill()
+                except Exception:
+                    pass
+            wait_until(lambda: all(_exited(t) for t in targets), timeout, cancel=self.cancel)
+        if process in self.processes:
+            self.processes.remove(process)
+
+    def close_all(self):
+        for process in list(self.processes):
+            self.close(process)
+        self._prune()
+
+    def _cancelled(self):
+        return self.cancel is not None and self.cancel.cancelled
+
+    def _prune(self):
+        self.processes = [p for p in self.processes if p.poll() is None or self._children(p)]
+
+    def _children(self, process):
+        # Editors such as the Windows 11 Notepad launcher hand off to a child process
+        try:
+            import psutil
+            return psutil.Process(process.pid).children(recursive=True)
+        except Exception:
+            return []
+
+
+class EditorPool:
+    """Editors started ahead of time and kept idle, so creating or opening a note hands the file to
+    a running editor instead of waiting for a cold start.
+
+    handoff is how an idle editor is given its file:
+      "stdin" - the editor prints a line once it is ready and then opens each path written to its
+                stdin (one per line), answering with a line per file; see stub_editor.py.
+      "keys"  - Windows Notepad started minimized; its window is restored and the file is opened
+                with Ctrl+O, the path and Enter.
+    Idle editors are not in tracker.processes until they take a file, so close_all() leaves them
+    running; close() ends them. A handoff that fails falls back to a cold start.
+    """
+
+    def __init__(self, tracker, size=1, handoff="stdin", automation=None, logger=None):
+        self.tracker = tracker
+        self.size = size
+        self.handoff = handoff
+        self.automation = automation  # Clipboard + keys for "keys" (PyAutoGuiAutomation by default)
+        self.logger = logger or print
+        self.hits = 0  # Files handed to an idle editor
+        self.misses = 0  # Files that needed a cold start
+        self._idle = []
+        self._starting = None  # The editor _fill is waiting on, so close() can end it too
+        self._lock = threading.Lock()
+        self._filling = None
+        self._closed = False
+
+    @property
+    def idle(self):
+        with self._lock:
+            return sum(1 for process in self._idle if process.poll() is None)
+
+    def fill(self):
+        """Start idle editors on a background thread until size of them are ready."""
+        with self._lock:
+            if self._closed or self._filling is not None or self.size <= 0:
+                return
+            self._filling = threading.Thread(target=self._fill, name="editor-pool", daemon=True)
+            self._filling.start()
+
+    def open(self, path):
+        """Show path in an idle editor, or in a newly started one; returns its process."""
+        process = self.take(path)
+        if process is None:
+            self.misses += 1
+            process = self._start_cold(path)
+        else:
+            self.hits += 1
+        self.fill()
+        return process
+
+    def take(self, path):
+        """Hand path to an idle editor; its process, or None if none was ready (or the handoff failed)."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                process = self._idle.pop(0)
+            if process.poll() is not None:
+                continue
+            try:
+                opened = self._hand_off(process, path)
+            except Exception as e:
+                self.logger(f"Could not hand the note to a waiting editor: {e}")
+                opened = False
+            if opened:
+                self.tracker.processes.append(process)
+                return process
+            _kill(process)
+            return None
+
+    def close(self):
+        """End the idle editors (editors that took a file are closed through the tracker)."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle + [self._starting], []
+        for process in filter(None, idle):
+            _kill(process)
+
+    def _fill(self):
+        try:
+            while True:
+                with self._lock:
+                    self._idle = [process for process in self._idle if process.poll() is None]
+                    if self._closed or len(self._idle) >= self.size or self.tracker._cancelled():
+                        return
+                process = self._start()
+                if process is None:
+                    return
+                with self._lock:
+                    if not self._closed:
+                        self._idle.append(process)
+                        continue
+                _kill(process)
+                return
+        except Exception as e:
+            self.logger(f"Could not start a waiting editor: {e}")
+        finally:
+            with self._lock:
+                self._filling = self._starting = None
+
+    def _start(self):
+        """An idle editor that is ready for its file, or None."""
+        if self.handoff == "stdin":
+            process = self._starting = self.tracker.spawn(wait=False, track=False, **_PIPES)
+            if _read_line(process, self.tracker.ready_timeout):
+                return process
+        else:
+            options = {}
+            if sys.platform == "win32":
+                info = subprocess.STARTUPINFO()
+                info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+                info.wShowWindow = _SW_SHOWMINNOACTIVE  # Waits minimized without taking the focus
+                options["startupinfo"] = info
+            process = self._starting = self.tracker.spawn(wait=False, track=False, **options)
+            if self.tracker.wait_ready(process) and process.poll() is None:
+                return process
+            if process.poll() is not None:
+                # A launcher that hands off to another process (Windows 11 Notepad) can't be pooled
+                self.logger("The editor exits right after starting, so it can't be kept waiting; pool turned off.")
+                self.size = 0
+        _kill(process)
+        return None
+
+    def _start_cold(self, path):
+        if self.handoff != "stdin":
+            return self.tracker.spawn(path)
+        process = self.tracker.spawn(wait=False, **_PIPES)
+        if not (_read_line(process, self.tracker.ready_timeout) and self._hand_off(process, path)):
+            self.logger("Editor did not report ready in time; continuing anyway.")
+        return process
+
+    def _hand_off(self, process, path):
+        if self.handoff == "stdin":
+            process.stdin.write(path + "\n")
+            process.stdin.flush()
+            return bool(_read_line(process, self.tracker.ready_timeout))
+        return self._open_by_keys(process, path)
+
+    def _open_by_keys(self, process, path):
+        import ctypes
+        user32 = ctypes.windll.user32
+        windows = _windows_of(process.pid)
+        if not windows:
+            return False
+        window = windows[0]
+        user32.ShowWindow(window, _SW_RESTORE)
+        user32.SetForegroundWindow(window)
+        if not wait_until(lambda: user32.GetForegroundWindow() == window, 1.0, cancel=self.tracker.cancel):
+            return False
+        if self.automation is None:
+            from document_backends import PyAutoGuiAutomation
+            self.automation = PyAutoGuiAutomation()
+        self.automation.hotkey("ctrl", "o")
+        # The Open dialog is another top-level window of the same process
+        if not wait_until(lambda: user32.GetForegroundWindow() in set(_windows_of(process.pid)) - {window},
+                          2.0, cancel=self.tracker.cancel):
+            return False
+        self.automation.paste(path)
+        self.automation.press("enter")
+        name = os.path.splitext(os.path.basename(path))[0]
+        return wait_until(lambda: name in _window_title(window), self.tracker.ready_timeout,
+                          cancel=self.tracker.cancel)
+
+
+_PIPES = {"stdin": subprocess.PIPE, "stdout": subprocess.PIPE, "encoding": "utf-8", "bufsize": 1}
+_SW_RESTORE = 9
+_SW_SHOWMINNOACTIVE = 7
+
+
+def _read_line(process, timeout):
+    """Next line the editor prints, or "" if it exits or says nothing within timeout (it is then killed)."""
+    timer = threading.Timer(timeout, process.kill)  # Ends the read with EOF
+    timer.daemon = True
+    timer.start()
+    try:
+        return process.stdout.readline()
+    except (OSError, ValueError):
+        return ""
+    finally:
+        timer.cancel()
+
+
+def _kill(process):
+    try:
+        process.kill()
+        process.wait(1.0)
+    except Exception:
+        pass
+    for pipe in (process.stdin, process.stdout):
+        if pipe is not None:
+            try:
+                pipe.close()
+            except Exception:
+                pass
+
+
+def _windows_of(pid):
+    """Visible top-level windows of process pid (Windows only)."""
+    import ctypes
+    from ctypes import wintypes
+    user32 = ctypes.windll.user32
+    found = []
+
+    @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    def collect(window, _):
+        owner = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(window, ctypes.byref(owner))
+        if owner.value == pid and user32.IsWindowVisible(window):
+            found.append(window)
+        return True
+
+    user32.EnumWindows(collect, 0)
+    return found
+
+
+def _window_title(window):
+    import ctypes
+    user32 = ctypes.windll.user32
+    buffer = ctypes.create_unicode_buffer(user32.GetWindowTextLengthW(window) + 1)
+    user32.GetWindowTextW(window, buffer, len(buffer))
+    return buffer.value
+
+
+def _exited(process):
+    if isinstance(process, subprocess.Popen):
+        return process.poll() is not None
+    try:
+        return not process.is_running() or process.status() == "zombie"
+    except Exception:
+        return True
+
+
+def default_editor_command():
+    """Notepad on Windows, the desktop's default opener elsewhere."""
+    if os.name == "nt":
+        return ["notepad.exe"]
+    if sys.platform == "darwin":
+        return ["open", "-W", "-e"]
+    return ["xdg-open"]
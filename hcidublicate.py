@@ -1,154 +1,711 @@
-import speech_recognition as sr
-import pyautogui
-import time
 import os
-import subprocess
-import psutil
-import pyperclip
 import threading
-import json
+import time
+from audio_capture import CaptureStage
+from recognizers import RecognitionPipeline, UnknownSpeech, create_backend
+from dictation import IncrementalCommitter
+from command_grammar import CommandGrammar
+from document_backends import create_document_backend
+from editor_process import EditorPool, EditorProcessTracker, default_editor_command
+from actions import ActionExecutor, DialogState
+from cancellation import CancelToken
+from metrics import MetricsRegistry
+from config_service import ConfigService
+from notes_catalog import NotePrefetcher, NotesCatalog
+from search_index import SearchIndex
+
+# Journal entries that change or settle the open note, replayed by recover_unsaved
+DOCUMENT_EVENTS = ("session", "open", "save", "close", "write", "erase", "edit", "shutdown")
+
+# Spoken answers when picking one of several offered notes
+CHOICE_WORDS = {"1": 1, "one": 1, "first": 1, "2": 2, "two": 2, "second": 2, "3": 3, "three": 3, "third": 3,
+                "4": 4, "four": 4, "fourth": 4, "5": 5, "five": 5, "fifth": 5}
 
-pyautogui.FAILSAFE = False
 
 class NotepadController:
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, audio_source=None, backend=None, document=None, config=None, metrics=None,
+                 journal=None):
+        self.metrics = metrics or MetricsRegistry()  # Per-stage latency histograms
         self.notepad_open = False
         self.current_file_path = None
         self.script_directory = os.getcwd()
         self.last_command = None
-        self.recognizer = sr.Recognizer()
-        self.recognizer.energy_threshold = 150  # Adjust for better sensitivity
-        self.recognizer.dynamic_energy_threshold = True
-        self.commands_file = os.path.join(self.script_directory, "commands.json")
+        self.energy_threshold = 150  # Adjust for better sensitivity
+        self.dynamic_energy_threshold = True
+        self.vad = "auto"  # Endpointing: "numpy" voice activity detection, "energy" threshold, or "auto"
+        self.audio_source = audio_source  # None means the default microphone
+        self.backend = backend  # None means Google Speech Recognition
+        self.backend_name = backend.name if backend else "google"
+        self.backend_options = {}
+        self.capture = None
+        self.pipeline = None
+        self._capture_lock = threading.RLock()  # Orders start_capture / stop_capture across threads
+        self.last_utterance = None  # Audio segment behind the most recent final transcript
+        self._document = document  # None means typing into Notepad via clipboard + keystrokes
+        self._notes = None  # NotesCatalog of script_directory, built on first use
+        self._search = None  # Full-text SearchIndex of script_directory, opened on first use
+        self._keywords = None  # KeywordSpotter over the enrolled command samples, loaded on first use
+        self.keyword_spotting = True  # Try enrolled control phrases before full recognition
+        self.open_viewer = True  # Show the note in Notepad even when the backend writes the file directly
+        self.shutdown_token = CancelToken()  # Cancelled once by shutdown(); parent of every listen token
+        self.listen_token = CancelToken(parent=self.shutdown_token)  # Cancelled by stop_listening()
+        self.editors = EditorProcessTracker(default_editor_command(), logger=logger or print,
+                                            cancel=self.shutdown_token)
+        self.editor_pool = None  # EditorPool of idle editors waiting for the next note (see set_editor_pool)
+        self.editor_pool_size = 1
+        self.editor_handoff = "auto"
+        self._prefetcher = NotePrefetcher(lambda name: self.notes.resolve(name) + self.notes.complete(name),
+                                          logger=logger or print)
+        self.streaming = False  # Commit partial transcripts while the user is still talking
+        self.on_partial = None  # Called with each live partial hypothesis (e.g. to update the GUI)
+        self.on_action_done = None  # Called with the action name after each queued action finishes
+        self.on_error = None  # Called with the message when an editor/document action fails
+        self.executor = ActionExecutor(logger=logger or print, on_done=self._action_done, metrics=self.metrics)
+        self.dialog = DialogState()
+        self.dictation = IncrementalCommitter(lambda text, newline: self.submit("write", self.write_text, text, newline),
+                                              lambda count: self.erase_text(count),
+                                              lambda words: self.command_grammar.is_prefix(words))
         self.commands = {
             "create": "create a new notepad",
             "open": "open",
             "save": "save the notepad",
-            "close": "close notepad"
+            "close": "close notepad",
+            "open_named": "open note <name>",
+            "create_named": "create a notepad called <name>",
+            "search": ["find notes about <query>", "search notes for <query>"],
+            "search_phrase": "find notes saying <query>",
+            "delete_sentence": ["delete the last sentence", "delete last sentence"],
+            "replace": "in the note replace <old> with <new>",
+            "undo": "undo that",
+            "redo": "redo that",
         }
-        self.load_commands()
+        self._default_commands = dict(self.commands)
+        self._command_grammar = None
         self.logger = logger or print  # Use print if no logger is provided
+        self.set_editor_pool(self.editor_pool_size, self.editor_handoff)
+        # commands.json is cached by the config service (next to settings.json, not in the notes folder)
+        self.config = config or ConfigService(self.script_directory, logger=self.logger)
+        self.commands_file = self.config.commands.path
+        self.config.commands.subscribe(self._commands_changed)
+        self.load_commands()
+        self.journal = journal  # Journal of what was heard and done (see journal.py); None = off
+        self._session = self._journal("session", pid=os.getpid())
 
     def load_commands(self):
-        if os.path.exists(self.commands_file):
+        self.commands.update(self.config.commands.data)
+        self._command_grammar = None
+
+    def _commands_changed(self, changes):
+        # Pushed by the config service on save or when commands.json is edited outside the app
+        for key, value in changes.items():
+            if value is not None:
+                self.commands[key] = value
+            elif key in self._default_commands:
+                self.commands[key] = self._default_commands[key]  # Removed from the file: back to the built-in phrase
+            else:
+                self.commands.pop(key, None)
+        self._command_grammar = None
+
+    def set_commands(self, commands):
+        """Replace the command phrases in memory (without writing commands.json)."""
+        self.commands = dict(commands)
+        self._command_grammar = None
+
+    def save_commands(self):
+        """Store the command phrases; commands.json is written atomically in the background."""
+        self._command_grammar = None  # Recompile on next use
+        self.config.commands.update(self.commands)
+
+    @property
+    def command_grammar(self):
+        """Command phrases compiled into a CommandGrammar; rebuilt only after load/save_commands."""
+        if self._command_grammar is None:
+            self._command_grammar = CommandGrammar.from_commands(self.commands)
+        return self._command_grammar
+
+    def submit(self, name, fn, *args):
+        """Queue an editor/document action behind the ones already submitted."""
+        future = self.executor.submit(name, fn, *args)
+        future.add_done_callback(lambda f: self._action_failed(name, f))
+        if self.journal is not None and name != "write":  # Writes are journaled with their text
+            future.add_done_callback(lambda f: self._journal_result(name, f))
+        return future
+
+    def _journal(self, kind, **data):
+        """Append to the journal (if any); returns the entry number or None."""
+        if self.journal is None:
+            return None
+        try:
+            return self.journal.append(kind, **data)
+        except (OSError, ValueError) as e:
+            self.logger(f"Error writing the journal: {e}")
+            return None
+
+    def _journal_result(self, name, future):
+        error = future.exception() if not future.cancelled() else None
+        self._journal("done", action=name, **({"error": str(error)} if error else {}))
+
+    def _journal_baseline(self, kind, path=None):
+        # The note's size on disk: replay after a crash starts from here
+        path = path or self.current_file_path
+        self._journal(kind, path=path, size=os.path.getsize(path) if path and os.path.exists(path) else 0,
+                      backend=self.document.name)
+
+    def _action_failed(self, name, future):
+        error = future.exception() if not future.cancelled() else None
+        if error is not None and self.on_error:
+            self.on_error(f"Error running '{name}': {error}")  # The executor has logged it already
+
+    def _error(self, message):
+        """Log a failed editor/document action and report it to on_error."""
+        self.logger(message)
+        if self.on_error:
+            self.on_error(message)
+
+    def _action_done(self, name):
+        if self.on_action_done:
+            self.on_action_done(name)
+
+    def dispatch(self, text):
+        """Queue the command the transcript matches, or write it as dictation. Returns the action name.
+
+        Actions run on the executor thread in order; create/open without a name first move the
+        dialog into "awaiting filename" and the next utterance is taken as the name.
+        """
+        with self.metrics.span("dispatch"):
+            action = self._dispatch(text)
+        self._journal("heard", text=text, action=action)
+        return action
+
+    def export_metrics(self, path):
+        """Write latency histograms to path (.prom/.txt for Prometheus text format, else JSON)."""
+        try:
+            self.metrics.export(path)
+            self.logger(f"Metrics exported to {path}")
+        except Exception as e:
+            self.logger(f"Failed to export metrics: {e}")
+
+    def _dispatch(self, text):
+        if self.dialog.active:
+            return self._answer_dialog(text)
+        match = self.command_grammar.match(text)
+        if match is None:
+            self.submit("write", self.write_text, text)
+            return "write"
+        if match.cost:
+            self.logger(f"Heard '{text}' as '{match.phrase}'")
+        action = match.action
+        if action in ("create", "open"):
+            self.dialog.expect(DialogState.AWAITING_FILENAME, action)
+            self._warm_editor()  # Started while the name is being said
+            self.logger("\nSay the Notepad name...")
+        elif action == "save":
+            self.submit(action, self.save_notepad)
+        elif action == "close":
+            self.submit(action, self.close_notepad)
+        elif action == "create_named":
+            self.submit(action, self.create_notepad_with_name, match.slots["name"])
+        elif action == "open_named":
+            return self._open_spoken(action, match.slots["name"], dictation=text)
+        elif action in ("search", "search_phrase"):
+            self.submit(action, self.search_notes, match.slots["query"], action == "search_phrase")
+        elif action == "snippet":
+            self.submit(action, self.write_text, match.data)
+        elif action == "delete_sentence":
+            self.submit(action, self.delete_last_sentence)
+        elif action == "replace":
+            self.submit(action, self.replace_text, match.slots["old"], match.slots["new"], text)
+        elif action in ("undo", "redo"):
+            self.submit(action, self.undo_edit if action == "undo" else self.redo_edit)
+        else:
+            self.logger(f"No action is bound to command '{action}'; writing it instead.")
+            self.submit("write", self.write_text, text)
+            return "write"
+        return action
+
+    def _answer_dialog(self, text):
+        action, state, context = self.dialog.action, self.dialog.state, self.dialog.context
+        self.dialog.reset()
+        if text in ("cancel", "never mind", "nevermind"):
+            self.logger(f"Cancelled {action}.")
+            return "cancel"
+        if state == DialogState.AWAITING_CHOICE:
+            words = [word for word in text.split() if word not in ("number", "the", "option")]
+            if len(words) == 2 and words[1] == "one":  # "the second one"
+                words = words[:1]
+            choice = CHOICE_WORDS.get(" ".join(words))
+            if choice is not None and choice <= len(context["choices"]):
+                self.submit(action, self._open_path, context["choices"][choice - 1])
+                return action
+        if action == "create":
+            self.submit(action, self.create_notepad_with_name, text)
+        else:
+            self._open_spoken(action, text)
+        return action
+
+    @property
+    def notes(self):
+        """Catalog of the note files in script_directory, for resolving spoken names."""
+        if self._notes is None or self._notes.folder != self.script_directory:
+            self._notes = NotesCatalog(self.script_directory, logger=self.logger)
+        return self._notes
+
+    @property
+    def search_index(self):
+        """Full-text index of the notes in script_directory (kept on disk next to them)."""
+        if self._search is None or self._search.folder != self.script_directory:
+            if self._search is not None:
+                self._search.close()
+            self._search = SearchIndex(self.script_directory, logger=self.logger)
+        return self._search
+
+    @property
+    def keyword_spotter(self):
+        """KeywordSpotter over keyword_samples/ next to settings.json, or None without numpy."""
+        if self._keywords is None:
+            try:
+                from keyword_spotter import KeywordSpotter
+            except ImportError as e:
+                self.logger(f"Keyword spotting is unavailable: {e}")
+                self._keywords = False
+            else:
+                self._keywords = KeywordSpotter(os.path.join(self.config.folder, "keyword_samples"),
+                                                logger=self.logger)
+        return self._keywords or None
+
+    def record_keyword_sample(self, command, timeout=8.0):
+        """Take the next utterance as an enrollment sample for command; returns its path or None.
+
+        The utterance is claimed from the capture stage, so it is neither recognized nor acted on.
+        Capture started just for the sample is stopped again afterwards.
+        """
+        spotter = self.keyword_spotter
+        if spotter is None:
+            return None
+        started = self.capture is None or not self.capture.running
+        self.start_capture()
+        taken, done = [], threading.Event()
+
+        def take(utterance):
+            if done.is_set():
+                return False
+            taken.append(utterance)
+            done.set()
+            return True
+
+        capture = self.capture
+        capture.add_consumer(take)
+        try:
+            done.wait(timeout)
+        finally:
+            capture.remove_consumer(take)
+            if started:
+                self.stop_capture()  # Listening is off: release the microphone and the recognizer
+        return spotter.enroll(command, taken[0]) if taken else None
+
+    def _recognition_backend(self):
+        # Enrolled control phrases are matched locally first; the rest goes to self.backend
+        if not self.keyword_spotting or self.streaming or self.keyword_spotter is None:
+            return self.backend
+        from keyword_spotter import KeywordSpottingRecognizer
+        return KeywordSpottingRecognizer(self.keyword_spotter, self.backend, lambda: self.commands, self.metrics)
+
+    def search_notes(self, query, phrase=False):
+        """Open the note that best matches query, or offer the top matches by number."""
+        hits = self.search_index.search(query, limit=5, phrase=phrase)
+        if not hits:
+            self.logger(f"No notes found about '{query}'.")
+            return
+        if len(hits) == 1 or (hits[0].phrase and not hits[1].phrase) or hits[0].score >= 1.5 * hits[1].score:
+            self.logger(f"Best match for '{query}': {hits[0].name}")
+            self._open_path(hits[0].path)
+            return
+        self.dialog.expect(DialogState.AWAITING_CHOICE, "open", choices=[hit.path for hit in hits])
+        options = ", ".join(f"{i}: {hit.name}" for i, hit in enumerate(hits, 1))
+        self.logger(f"Notes about '{query}': {options}. Say the number, a name, or cancel.")
+
+    def _open_spoken(self, action, name, dictation=None):
+        """Open the note a spoken name refers to, or offer the closest ones by number; returns the
+        action taken. With dictation (the whole utterance of an "open note <name>" command), a name
+        that matches no note well enough means it was probably dictation, and it is written instead.
+        """
+        matches = self.notes.resolve(name)
+        if dictation is not None and (not matches or matches[0].score < 0.9):
+            self.submit("write", self.write_text, dictation)
+            return "write"
+        if not matches:
+            self.logger(f"File '{name}.txt' does not exist! Please say another name.")
+            return action
+        best = matches[0]
+        if best.score >= 0.9 and (len(matches) == 1 or matches[1].score < best.score):
+            if best.how != "name":
+                self.logger(f"Heard '{name}' as '{best.name}'")
+            self.submit(action, self._open_path, best.path)
+            return action
+        self.dialog.expect(DialogState.AWAITING_CHOICE, action, choices=[m.path for m in matches])
+        options = ", ".join(f"{i}: {m.name}" for i, m in enumerate(matches, 1))
+        self.logger(f"Did you mean {options}? Say the number, another name, or cancel.")
+        return action
+
+    @property
+    def document(self):
+        """The DocumentBackend text is written to (created on first use)."""
+        if self._document is None:
+            self._document = create_document_backend("notepad", logger=self.logger, metrics=self.metrics)
+        return self._document
+
+    @property
+    def document_name(self):
+        return self._document.name if self._document is not None else "notepad"
+
+    def set_document_backend(self, name, **options):
+        """Switch how text reaches the note ("notepad" keystrokes or direct "file" writes)."""
+        if self._document is not None and self._document.name == name and not options:
+            return
+        try:
+            document = create_document_backend(name, logger=self.logger, metrics=self.metrics, **options)
+        except Exception as e:
+            self.logger(f"Failed to set up '{name}' document backend: {e}")
+            return
+        if self._document is not None:
             try:
-                with open(self.commands_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.commands.update(data)
+                self._document.close()
             except Exception as e:
-                self.logger(f"Failed to load commands: {e}")
+                self.logger(f"Error closing document: {e}")
+        self._document = document
+        if self.notepad_open and self.current_file_path:
+            document.open(self.current_file_path)
+            self._journal_baseline("open")
 
-    def save_commands(self):
+    def set_energy_threshold(self, value):
+        """Update the voice sensitivity used for endpointing."""
+        self.energy_threshold = value
+        if self.capture is not None:
+            self.capture.set_energy_threshold(value)
+
+    def set_vad(self, name):
+        """Switch endpointing ("auto", "numpy" or "energy"); restarts capture if it is running."""
+        if name == self.vad:
+            return
+        self.vad = name
+        with self._capture_lock:
+            if self.capture is not None:
+                self.stop_capture()
+                self.start_capture()
+
+    def configure_backend(self, name, **options):
+        """Switch recognition backend by settings name; falls back to Google if it can't be loaded."""
+        if name == self.backend_name and options == self.backend_options and self.backend is not None:
+            return
         try:
-            with open(self.commands_file, "w", encoding="utf-8") as f:
-                json.dump(self.commands, f, indent=2)
+            backend = create_backend(name, **options)
         except Exception as e:
-            self.logger(f"Failed to save commands: {e}")
+            self.logger(f"Failed to load '{name}' recognizer, using Google instead: {e}")
+            name, options, backend = "google", {}, None
+        self.set_backend(backend)
+        self.backend_name = name
+        self.backend_options = options
+
+    def set_streaming(self, enabled):
+        """Turn streaming dictation (live partial transcripts) on or off."""
+        if enabled == self.streaming:
+            return
+        self.streaming = enabled
+        with self._capture_lock:
+            if self.pipeline is not None:
+                self.pipeline.stop()
+                self.pipeline = None
+                self.start_capture()
+
+    def set_keyword_spotting(self, enabled):
+        """Turn the local keyword fast path for the control phrases on or off."""
+        if enabled == self.keyword_spotting:
+            return
+        self.keyword_spotting = enabled
+        with self._capture_lock:
+            if self.pipeline is not None:
+                self.pipeline.stop()
+                self.pipeline = None
+                self.start_capture()
+
+    def set_backend(self, backend):
+        """Use the given RecognizerBackend for all further utterances."""
+        self.backend = backend
+        self.backend_name = backend.name if backend else "google"
+        self.backend_options = {}
+        with self._capture_lock:
+            if self.pipeline is not None:
+                self.pipeline.stop()
+                self.pipeline = None
+                if self.capture is not None:
+                    self.start_capture()
+
+    def start_capture(self, token=None):
+        """Start the long-lived capture stage (opens the microphone once per session) and recognition worker.
+
+        With token (a listening session's cancel token) nothing is started once it is cancelled, even
+        by a stop_listening() racing with this call. Returns the running pipeline, or None then.
+        """
+        with self._capture_lock:
+            if token is not None and token.is_set():
+                return None
+            if self.capture is None:
+                self.capture = CaptureStage(
+                    self.audio_source,
+                    energy_threshold=self.energy_threshold,
+                    dynamic_energy_threshold=self.dynamic_energy_threshold,
+                    logger=self.logger,
+                    vad=self.vad,
+                )
+            if self.backend is None:
+                self.backend = create_backend("google")
+            if self.pipeline is None:
+                self.pipeline = RecognitionPipeline(self.capture, self._recognition_backend(), logger=self.logger,
+                                                    streaming=self.streaming, metrics=self.metrics)
+                if self.streaming and not self.pipeline.streaming:
+                    self.logger(f"The {self.backend.name} recognizer can't stream; using whole utterances.")
+            if not self.pipeline.running and not self.pipeline.finished:
+                self.pipeline.start()
+            if not self.capture.running and not self.capture.finished.is_set():
+                self.capture.start()
+            return self.pipeline
+
+    def stop_capture(self, timeout=1.0):
+        """Stop recognition and the capture stage and release the audio device.
+
+        Returns the names of threads still running after timeout (recognition calls that can't
+        be interrupted end on their own and their results are dropped).
+        """
+        with self._capture_lock:
+            deadline = time.monotonic() + timeout
+            running = []
+            if self.pipeline is not None:
+                self.pipeline.cancel()  # First, so the audio flushed by the capture stage isn't recognized
+            if self.capture is not None:
+                if not self.capture.stop(timeout):  # Returns within one audio chunk
+                    running.append("audio-capture")
+                self.capture = None
+            if self.pipeline is not None:
+                busy = self.pipeline.stop(max(0.0, deadline - time.monotonic()))
+                if busy:
+                    self.logger(f"{len(busy)} recognition request(s) still in flight; their results will be dropped.")
+                running += [thread.name for thread in busy]
+                self.pipeline = None
+            return running
+
+    def start_listening(self):
+        """A fresh cancel token for a listening session; pass it to continuous_listen."""
+        self.listen_token.cancel("restart")
+        self.listen_token = CancelToken(parent=self.shutdown_token)
+        self._warm_editor()
+        return self.listen_token
+
+    def stop_listening(self, timeout=0.5):
+        """Cancel the listening session: continuous_listen and a spoken-filename prompt return
+        right away (the time they took is recorded as the "cancel.listen" metric). Capture and
+        recognition stop too, so nothing said afterwards is recognized (or sent to an online
+        recognizer); the next session reopens the microphone."""
+        self.listen_token.cancel("stop")
+        self.stop_capture(timeout)
+        self.dictation.reset()
+
+    def shutdown(self, timeout=1.0):
+        """Stop for good: cancel listening, prompts and editor waits, release the microphone and
+        end the action thread, all within about timeout seconds. Returns the names of any
+        threads still running."""
+        started = time.monotonic()
+        self.shutdown_token.cancel("shutdown")
+        self._prefetcher.close()
+        running = self.stop_capture(timeout)
+        if self.editor_pool is not None:
+            self.editor_pool.close()
+        if not self.executor.stop(max(0.0, started + timeout - time.monotonic())):
+            running.append("action-executor")
+        elif self.journal is not None:
+            self._journal("shutdown")  # A clean exit: nothing is recovered on the next start
+            journal, self.journal = self.journal, None
+            journal.close()
+        self.metrics.observe("cancel.shutdown", time.monotonic() - started)
+        if running:
+            self.logger(f"Still running after shutdown: {', '.join(running)}")
+        return running
+
+    @property
+    def capture_finished(self):
+        """True once a finite audio source (e.g. a WAV file) is exhausted and fully consumed."""
+        return self.pipeline is not None and self.pipeline.finished
+
+    def _next_transcript(self, timeout, commit_partials=False):
+        """Next final transcript; "" on a recognition error or a fully committed utterance."""
+        pipeline = self.pipeline  # Read once: shutdown() may clear it from another thread
+        result = pipeline.get(timeout=timeout) if pipeline is not None else None
+        if result is None:
+            return None
+        commit_partials = commit_partials and not self.dialog.active  # A spoken filename is not dictation
+        if result.partial:
+            self._speculate(result.text)
+            if commit_partials:
+                self.dictation.partial(result.text)
+            if self.on_partial:
+                self.on_partial(result.text)
+            return ""
+        text = result.text
+        self.last_utterance = result.utterance
+        if result.utterance is not None and result.utterance.end_time is not None:
+            self.metrics.observe("listen.end_of_speech_to_text", time.monotonic() - result.utterance.end_time)
+        if isinstance(result.error, UnknownSpeech):
+            self.logger("Could not understand audio, try again.")
+        elif result.error is not None:
+            self.logger(f"Could not request results; {result.error}")
+        if commit_partials and pipeline.streaming:
+            if text and self.on_partial:
+                self.on_partial(text)
+            text = self.dictation.final(text)
+        return text or ""
 
     def speech_to_text(self, timeout=5):
         """Convert speech to text."""
-        with sr.Microphone() as source:
-            try:
-                self.logger("Listening...")
-                self.recognizer.adjust_for_ambient_noise(source, duration=2)  # Increase from 2 to 3 seconds
-                audio = self.recognizer.listen(source, timeout=timeout)
-                return self.recognizer.recognize_google(audio).lower()
-            except (sr.WaitTimeoutError, sr.UnknownValueError, sr.RequestError) as e:
-                self.logger(f"Error recognizing speech: {e}")
-                return None
+        self.start_capture()
+        self.logger("Listening...")
+        text = self._next_transcript(timeout)
+        if text is None:
+            self.logger("Error recognizing speech: listening timed out")
+        return text or None
 
-    def continuous_listen(self, stop_event=None):
-        """Continuously listen for speech input, can be stopped by stop_event."""
-        with sr.Microphone() as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=2)
+    def continuous_listen(self, stop_event=None, commit_partials=True):
+        """Continuously listen for speech input until stopped (None) or something is said.
+
+        stop_event defaults to the current listen token (see stop_listening); a CancelToken wakes
+        the wait as soon as it is cancelled, a plain threading.Event is checked every 0.25 s.
+        In streaming mode stable dictation is written as it is heard (unless commit_partials is
+        False, e.g. while prompting for a filename) and only the not-yet-written part is returned.
+        """
+        token = self.listen_token if stop_event is None else stop_event
+        pipeline = self.start_capture(token)
+        if pipeline is None:
+            return None  # Don't reopen the microphone for a session that was already stopped
+        wake = token.on_cancel(pipeline.interrupt) if isinstance(token, CancelToken) else None
+        self.logger("Listening continuously...")
+        try:
             while True:
-                if stop_event and stop_event.is_set():
-                    break
-                try:
-                    self.logger("Listening continuously...")
-                    audio = self.recognizer.listen(source, timeout=2)
-                    command = self.recognizer.recognize_google(audio).lower()
-                    self.logger(f"You said: {command}")
-                    return command
-                except sr.WaitTimeoutError:
+                if token.is_set():
+                    if wake is not None:
+                        self.metrics.observe("cancel.listen", token.elapsed())
+                    return None
+                text = self._next_transcript(timeout=0.25, commit_partials=commit_partials)
+                if text is None:
+                    if self.capture_finished:
+                        return None
                     continue
-                except sr.UnknownValueError:
-                    self.logger("Could not understand audio, try again.")
-                except sr.RequestError as e:
-                    self.logger(f"Could not request results; {e}")
+                if text:
+                    self.logger(f"You said: {text}")
+                    return text
+        finally:
+            if wake is not None:
+                token.remove(wake)
+
+    def set_editor_command(self, command):
+        """Change the editor launched for notes, e.g. ["notepad.exe"] or ["gedit", "{path}"]."""
+        self.editors.command = list(command)
+        self.set_editor_pool(self.editor_pool_size, self.editor_handoff)
+
+    def set_editor_pool(self, size=1, handoff="auto"):
+        """Keep size editors started and idle, so a created or opened note is shown without a cold start.
+
+        handoff is how a waiting editor gets its file: "keys" (Notepad on Windows, via Ctrl+O),
+        "stdin" (editors that read paths on stdin, such as stub_editor.py), "off", or "auto" =
+        "keys" for Notepad on Windows and off otherwise. The editors are started on first need.
+        """
+        self.editor_pool_size, self.editor_handoff = size, handoff
+        if self.editor_pool is not None:
+            self.editor_pool.close()
+            self.editor_pool = None
+        if handoff == "auto":
+            program = os.path.basename(self.editors.command[0]).lower() if self.editors.command else ""
+            handoff = "keys" if os.name == "nt" and program in ("notepad", "notepad.exe") else "off"
+        if handoff != "off":
+            self.editor_pool = EditorPool(self.editors, size, handoff, logger=self.logger)
+
+    def _warm_editor(self):
+        """Start filling the editor pool if notes are going to be shown in an editor."""
+        needs_editor = self._document is None or self._document.needs_editor  # The default backend types into Notepad
+        if self.editor_pool is not None and (needs_editor or self.open_viewer):
+            self.editor_pool.fill()
+
+    def _spawn_editor(self, file_path):
+        with self.metrics.span("editor.open"):
+            if self.editor_pool is not None and file_path:
+                return self.editor_pool.open(file_path)
+            return self.editors.spawn(file_path)
+
+    def _speculate(self, text):
+        """Get ready for the note a partial transcript is naming: warm the editor pool and, for
+        open, read the notes the name so far may refer to ahead of time."""
+        if self.dialog.active:
+            if self.dialog.state != DialogState.AWAITING_FILENAME:
+                return
+            action, name = self.dialog.action, text
+        else:
+            match = self.command_grammar.match(text)
+            if match is None or match.action not in ("open_named", "create_named"):
+                return
+            action, name = match.action, match.slots["name"]
+        self._warm_editor()
+        if action.startswith("open") and name.strip():
+            self._prefetcher.request(name)
 
     def is_notepad_running(self):
-        """Check if Notepad is running."""
-        for process in psutil.process_iter(attrs=['name']):
-            if process.info['name'].lower() == "notepad.exe":
-                return True
-        return False
+        """Check if a Notepad we started is still running."""
+        return self.editors.is_running()
 
     def close_all_notepads(self):
-        """Close all Notepad instances."""
+        """Close all Notepad instances this controller opened."""
         try:
-            subprocess.call(["taskkill", "/F", "/IM", "notepad.exe"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            time.sleep(2)
-            while self.is_notepad_running():
-                time.sleep(1)
+            self.editors.close_all()
             self.notepad_open = False
         except Exception as e:
-            self.logger(f"Error closing Notepad: {e}")
+            self._error(f"Error closing Notepad: {e}")
 
     def get_valid_filename(self):
-        """Get a valid filename from speech."""
-        while True:
-            self.logger("\nSay the Notepad name...")
-            filename = self.continuous_listen()
-            if filename:
-                return filename
-            self.logger("No name detected! Please say the filename again.")
+        """Get a filename from speech; None if listening is stopped (or the audio ends) first."""
+        self.logger("\nSay the Notepad name...")
+        filename = self.continuous_listen(commit_partials=False)
+        if not filename:
+            self.logger("Stopped waiting for a Notepad name.")
+        return filename
 
     def _open_notepad(self, file_path=None):
-        """Open Notepad with or without a file."""
+        """Open Notepad with or without a file; the ones opened before are closed once it shows."""
         try:
-            self.close_all_notepads()
-            if file_path:
-                subprocess.Popen(["notepad.exe", file_path])
-            else:
-                subprocess.Popen("notepad.exe")
-            time.sleep(2)
+            previous = list(self.editors.processes)
+            self._spawn_editor(file_path)
+            for process in previous:
+                self.editors.close(process)
         except Exception as e:
-            self.logger(f"Error opening Notepad: {e}")
+            self._error(f"Error opening Notepad: {e}")
+
+    def _show_document(self, file_path, restart_editor=False):
+        """Point the document backend at file_path and open it in Notepad if needed."""
+        self.document.open(file_path)
+        self._journal_baseline("open", file_path)
+        if not (self.document.needs_editor or self.open_viewer):
+            return
+        if restart_editor:
+            self._open_notepad(file_path)
+        else:
+            self._spawn_editor(file_path)  # Open Notepad with the file
 
     def create_notepad(self):
         """Create a new Notepad file with the spoken filename and save it automatically."""
         filename = self.get_valid_filename()
-        file_path = os.path.join(self.script_directory, f"{filename}.txt")
-        
-        if os.path.exists(file_path):
-            self.logger("Notepad already exists!")
-            return
-        
-        with open(file_path, "w") as f:
-            f.write("")  # Create an empty file
-        
-        subprocess.Popen(["notepad.exe", file_path])  # Open Notepad with the file
-        
-        self.logger(f"Notepad '{filename}.txt' created and opened successfully!")
-        self.notepad_open = True
-        self.current_file_path = file_path
-        self.last_command = "create"
+        if filename:
+            self.create_notepad_with_name(filename)
 
     def open_notepad(self):
         """Open an existing Notepad file."""
         filename = self.get_valid_filename()
-        file_path = os.path.join(self.script_directory, f"{filename}.txt")
-
-        if not os.path.exists(file_path):
-            self.logger(f"File '{filename}.txt' does not exist! Please say another name.")
-            return
-
-        self._open_notepad(file_path)
-        self.logger(f"Opened Notepad file: {filename}.txt")
-        self.notepad_open = True
-        self.current_file_path = file_path
-        self.last_command = "open"
+        if filename:
+            self.open_notepad_with_name(filename)
 
     def save_notepad(self):
         """Save the current Notepad file."""
@@ -156,12 +713,13 @@ class NotepadController:
             self.logger("No Notepad is open to save!")
             return
         try:
-            pyautogui.hotkey('ctrl', 's')
-            time.sleep(1)
+            self.document.save()
+            self._index_later()
+            self._journal_baseline("save")
             self.logger("Notepad saved successfully.")
             self.last_command = "save"
         except Exception as e:
-            self.logger(f"Error saving Notepad: {e}")
+            self._error(f"Error saving Notepad: {e}")
 
     def close_notepad(self):
         """Close Notepad only if the last command was 'save'."""
@@ -175,43 +733,164 @@ class NotepadController:
             return
 
         try:
-            self.close_all_notepads()
+            self.document.close()
+            if self.document.needs_editor or self.open_viewer:
+                self.close_all_notepads()
+            self.notepad_open = False
+            self._journal("close", path=self.current_file_path)
             self.logger("Notepad closed successfully!")
         except Exception as e:
-            self.logger(f"Error closing Notepad: {e}")
+            self._error(f"Error closing Notepad: {e}")
 
-    def write_text(self, text):
+    def write_text(self, text, newline=True):
         """Write specified text into Notepad."""
         try:
-            pyperclip.copy(text)
-            pyautogui.hotkey('ctrl', 'v')
-            pyautogui.press('enter')
+            self.document.write(text, newline)
+            self._index_later()
+            self._journal("write", text=text, newline=newline)
+        except Exception as e:
+            self._error(f"Error writing to Notepad: {e}")
+
+    def _index_later(self):
+        # The search index picks the edit up before the next search (once the file has changed)
+        if self._search is not None and self.current_file_path:
+            self._search.mark_changed(self.current_file_path)
+
+    def erase_text(self, count):
+        """Delete the last count characters typed into Notepad."""
+        try:
+            self.document.erase(count)
+            self._journal("erase", count=count)
+        except Exception as e:
+            self._error(f"Error editing Notepad: {e}")
+
+    def _editable_document(self):
+        if not self.notepad_open:
+            self.logger("No Notepad is open to edit!")
+            return None
+        if not self.document.editable:
+            self.logger("Voice editing needs the file document backend (\"document_backend\": \"file\").")
+            return None
+        return self.document
+
+    def delete_last_sentence(self):
+        """Delete the last sentence of the open note."""
+        document = self._editable_document()
+        if document is None:
+            return
+        try:
+            removed = document.delete_last_sentence()
+            self._index_later()
+            self._journal("edit", method="delete_last_sentence", args=[])
+            self.logger(f"Deleted: {removed}" if removed else "Nothing to delete.")
         except Exception as e:
-            self.logger(f"Error writing to Notepad: {e}")
+            self._error(f"Error editing Notepad: {e}")
+
+    def replace_text(self, old, new, dictation=None):
+        """Replace the last occurrence of the words old with new in the open note.
+
+        If old is not in the note, dictation (the whole spoken command) is written instead.
+        """
+        document = self._editable_document()
+        if document is None:
+            return
+        try:
+            if document.replace_text(old, new):
+                self._index_later()
+                self._journal("edit", method="replace_text", args=[old, new])
+                self.logger(f"Replaced '{old}' with '{new}'.")
+            elif dictation is not None:
+                self.write_text(dictation)
+            else:
+                self.logger(f"'{old}' is not in the note.")
+        except Exception as e:
+            self._error(f"Error editing Notepad: {e}")
+
+    def undo_edit(self):
+        """Undo the last dictation or edit in the open note."""
+        self._undo_redo("undo")
+
+    def redo_edit(self):
+        self._undo_redo("redo")
+
+    def _undo_redo(self, which):
+        document = self._editable_document()
+        if document is None:
+            return
+        try:
+            if getattr(document, which)():
+                self._index_later()
+                self._journal("edit", method=f"{which}_edit", args=[])
+                self.logger(f"{which.capitalize()} done.")
+            else:
+                self.logger(f"Nothing to {which}.")
+        except Exception as e:
+            self._error(f"Error editing Notepad: {e}")
 
     def main(self):
         self.logger("Welcome to Voice-Controlled Notepad!")
         self.logger("Available commands:")
         for key, phrase in self.commands.items():
-            self.logger(f"  - {phrase}")
+            if isinstance(phrase, str):
+                self.logger(f"  - {phrase}")
         self.logger("  - Speak text to write into Notepad")
 
         while True:
             text = self.continuous_listen()
+            if text is None and self.capture_finished:
+                break
             if text:
-                text = text.strip().lower()
-                cmds = self.commands
-                if text == cmds["create"]:
-                    self.create_notepad()  # always prompts for filename
-                elif text == cmds["open"]:
-                    self.open_notepad()    # always prompts for filename
-                elif cmds["save"] in text:
-                    self.save_notepad()
-                elif cmds["close"] in text:
-                    self.close_notepad()
-                else:
-                    self.write_text(text)
-            time.sleep(1)
+                self.dispatch(text.strip().lower())
+        self.executor.wait_idle()
+
+    def unsaved_work(self):
+        """(note path, its size when last saved, backend name, [journal entries]) for what the
+        previous run wrote to its last open note after the last save, or None. None too if that
+        run shut down cleanly (unsaved text was then discarded on purpose)."""
+        if self.journal is None:
+            return None
+        pending = []
+        for entry in self.journal.entries(kinds=DOCUMENT_EVENTS, reverse=True):
+            if self._session is not None and entry.number >= self._session:
+                continue  # This run
+            if entry.kind in ("write", "erase", "edit"):
+                pending.append(entry)
+            elif entry.kind in ("open", "save") and pending:
+                return entry.data["path"], entry.data["size"], entry.data.get("backend"), pending[::-1]
+            else:
+                return None
+        return None
+
+    def recover_unsaved(self):
+        """Replay dictation and edits the previous run journaled but never saved before it crashed.
+
+        The note is cut back to its size at the last save first, since some of that text may
+        already have been flushed to it. Returns the number of replayed entries.
+        """
+        work = self.unsaved_work()
+        if work is None:
+            return 0
+        path, size, backend, pending = work
+        name = os.path.basename(path)
+        current = os.path.getsize(path) if os.path.exists(path) else -1
+        if current < size or (current != size and backend != "file"):
+            self.logger(f"Not recovering unsaved text of '{name}': the file changed since.")
+            return 0
+        if current != size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+        self._open_path(path)
+        if not self.notepad_open or self.current_file_path != path:
+            return 0
+        for entry in pending:
+            if entry.kind == "write":
+                self.write_text(entry.data["text"], entry.data["newline"])
+            elif entry.kind == "erase":
+                self.erase_text(entry.data["count"])
+            elif entry.data["method"] in ("delete_last_sentence", "replace_text", "undo_edit", "redo_edit"):
+                getattr(self, entry.data["method"])(*entry.data["args"])
+        self.logger(f"Recovered {len(pending)} unsaved entries into '{name}'. Save the notepad to keep them.")
+        return len(pending)
 
     def create_notepad_with_name(self, filename):
         file_path = os.path.join(self.script_directory, f"{filename}.txt")
@@ -219,20 +898,28 @@ class NotepadController:
             self.logger("Notepad already exists!")
             return
         with open(file_path, "w") as f:
-            f.write("")
-        subprocess.Popen(["notepad.exe", file_path])
+            f.write("")  # Create an empty file
+        self.notes.add(file_path)
+        self._show_document(file_path)
         self.logger(f"Notepad '{filename}.txt' created and opened successfully!")
         self.notepad_open = True
         self.current_file_path = file_path
         self.last_command = "create"
 
     def open_notepad_with_name(self, filename):
-        file_path = os.path.join(self.script_directory, f"{filename}.txt")
-        if not os.path.exists(file_path):
+        matches = self.notes.resolve(filename, limit=1)
+        if not matches or matches[0].score < 0.9:
             self.logger(f"File '{filename}.txt' does not exist! Please say another name.")
             return
-        self._open_notepad(file_path)
-        self.logger(f"Opened Notepad file: {filename}.txt")
+        self._open_path(matches[0].path)
+
+    def _open_path(self, file_path):
+        if not os.path.exists(file_path):
+            self.notes.remove(file_path)
+            self.logger(f"File '{os.path.basename(file_path)}' does not exist any more.")
+            return
+        self._show_document(file_path, restart_editor=True)
+        self.logger(f"Opened Notepad file: {os.path.basename(file_path)}")
         self.notepad_open = True
         self.current_file_path = file_path
         self.last_command = "open"
@@ -0,0 +1,238 @@
+"""Append-only journal of what the app heard and did, for crash recovery and history queries.
+
+    python journal.py                          # the last 20 entries (journal in the current folder)
+    python journal.py --since 2026-10-01 --kind heard
+    python journal.py --folder ~/notes-config --tail 100
+
+journal.bin holds length-prefixed records (payload length, CRC-32, unix time, then the JSON
+payload); journal.idx holds one fixed-size (time, offset) entry per record. Appending is two
+unbuffered os.write calls, so a crash of the app loses nothing that was appended. Both files are
+read through mmap: entry n is one index lookup away and time ranges are found by bisection.
+A record or index entry torn by a crash is cut off (or the index rebuilt) when the journal opens.
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+RECORD = struct.Struct("<IId")  # Payload length, CRC-32 of the payload, unix time
+INDEX = struct.Struct("<dQ")  # Unix time, offset of the record in journal.bin
+
+
+class JournalEntry:
+    """One journal record: its number, unix time, kind ("heard", "write", "save", ...) and fields."""
+
+    def __init__(self, number, time, kind, data):
+        self.number = number
+        self.time = time
+        self.kind = kind
+        self.data = data
+
+    def __repr__(self):
+        return f"JournalEntry({self.number}, {self.kind!r}, {self.data!r})"
+
+
+class _Times:
+    """The index's timestamps as a sequence, for bisect."""
+
+    def __init__(self, index_map, count):
+        self.index_map = index_map
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, n):
+        return INDEX.unpack_from(self.index_map, n * INDEX.size)[0]
+
+
+class Journal:
+    """journal.bin + journal.idx in folder. append() is thread-safe; entries are read via mmap."""
+
+    def __init__(self, folder, name="journal", fsync=False, logger=None):
+        self.folder = folder
+        self.path = os.path.join(folder, f"{name}.bin")
+        self.index_path = os.path.join(folder, f"{name}.idx")
+        self.fsync = fsync  # fsync every record (survives power loss, not just an app crash)
+        self.logger = logger or print
+        self._lock = threading.RLock()
+        os.makedirs(folder, exist_ok=True)
+        flags = os.O_RDWR | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+        self._fd = os.open(self.path, flags, 0o644)
+        self._index_fd = os.open(self.index_path, flags, 0o644)
+        self._map = self._index_map = None
+        self._mapped = self._index_mapped = 0
+        self._repair()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, kind, **data):
+        """Add a record; returns its entry number."""
+        payload = json.dumps({"kind": kind, **data}, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            now = max(time.time(), self._last_time)  # Keep the index sorted if the clock steps back
+            os.write(self._fd, RECORD.pack(len(payload), zlib.crc32(payload), now) + payload)
+            os.write(self._index_fd, INDEX.pack(now, self._size))
+            if self.fsync:
+                os.fsync(self._fd)
+            self._size += RECORD.size + len(payload)
+            self._last_time = now
+            self._count += 1
+            return self._count - 1
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += self._count
+        when, payload = self._record(number)
+        data = json.loads(payload)
+        return JournalEntry(number, when, data.pop("kind"), data)
+
+    def seek(self, when):
+        """Number of the first entry at or after unix time when."""
+        with self._lock:
+            self._refresh_maps()
+            if not self._count:
+                return 0
+            return bisect.bisect_left(_Times(self._index_map, self._count), when)
+
+    def entries(self, since=None, until=None, kinds=None, reverse=False):
+        """Entries with since <= time < until (unix times; None = unbounded), optionally of some kinds only."""
+        first = self.seek(since) if since is not None else 0
+        last = self.seek(until) if until is not None else len(self)
+        numbers = range(last - 1, first - 1, -1) if reverse else range(first, last)
+        # Payloads start with the kind, so other kinds are skipped without parsing them
+        prefixes = tuple(b'{"kind":' + json.dumps(kind, ensure_ascii=False).encode("utf-8")
+                         for kind in kinds) if kinds else None
+        for number in numbers:
+            when, payload = self._record(number)
+            if prefixes is None or payload.startswith(prefixes):
+                data = json.loads(payload)
+                yield JournalEntry(number, when, data.pop("kind"), data)
+
+    def tail(self, count):
+        return [self[number] for number in range(max(0, len(self) - count), len(self))]
+
+    def close(self):
+        with self._lock:
+            for view in (self._map, self._index_map):
+                if view is not None:
+                    view.close()
+            self._map = self._index_map = None
+            self._mapped = self._index_mapped = 0
+            os.close(self._fd)
+            os.close(self._index_fd)
+
+    def _record(self, number):
+        """(unix time, payload bytes) of entry number."""
+        with self._lock:
+            if not 0 <= number < self._count:
+                raise IndexError(f"journal entry {number} out of range")
+            self._refresh_maps()
+            when, offset = INDEX.unpack_from(self._index_map, number * INDEX.size)
+            length = RECORD.unpack_from(self._map, offset)[0]
+            return when, self._map[offset + RECORD.size:offset + RECORD.size + length]
+
+    def _refresh_maps(self):
+        # Both files only grow while open, so a map is replaced only when it is too short
+        if self._mapped < self._size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._fd, self._size, access=mmap.ACCESS_READ)
+            self._mapped = self._size
+        index_size = self._count * INDEX.size
+        if self._index_mapped < index_size:
+            if self._index_map is not None:
+                self._index_map.close()
+            self._index_map = mmap.mmap(self._index_fd, index_size, access=mmap.ACCESS_READ)
+            self._index_mapped = index_size
+
+    def _repair(self):
+        """Drop torn records and index entries left by a crash; index records the index is missing."""
+        size = os.fstat(self._fd).st_size
+        count = os.fstat(self._index_fd).st_size // INDEX.size
+        with open(self.path, "rb") as data, open(self.index_path, "rb") as index:
+            # Index entries must point at whole, valid records
+            end = 0
+            while count:
+                index.seek((count - 1) * INDEX.size)
+                when, offset = INDEX.unpack(index.read(INDEX.size))
+                end = _check_record(data, offset, size)
+                if end is not None:
+                    break
+                count -= 1
+            end = end if count else 0
+            missing = []
+            while True:
+                record_end = _check_record(data, end, size)
+                if record_end is None:
+                    break
+                data.seek(end)
+                missing.append(INDEX.pack(RECORD.unpack(data.read(RECORD.size))[2], end))
+                end = record_end
+        if end < size:
+            self.logger(f"Journal: dropped {size - end} bytes of an incomplete record.")
+            os.truncate(self.path, end)
+        os.truncate(self.index_path, count * INDEX.size)
+        if missing:
+            os.write(self._index_fd, b"".join(missing))
+        self._size = end
+        self._count = count + len(missing)
+        self._last_time = 0.0
+        if self._count:
+            self._refresh_maps()
+            self._last_time = INDEX.unpack_from(self._index_map, (self._count - 1) * INDEX.size)[0]
+
+
+def _check_record(f, offset, size):
+    """End offset of the record at offset if it is complete and its CRC matches, else None."""
+    if offset + RECORD.size > size:
+        return None
+    f.seek(offset)
+    length, crc, _ = RECORD.unpack(f.read(RECORD.size))
+    end = offset + RECORD.size + length
+    if end > size or zlib.crc32(f.read(length)) != crc:
+        return None
+    return end
+
+
+def _parse_time(text):
+    return datetime.fromisoformat(text).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show entries of the voice notepad journal.")
+    parser.add_argument("--folder", default=os.getcwd(), help="folder with journal.bin (default: current folder)")
+    parser.add_argument("--since", type=_parse_time, help="ISO date/time, e.g. 2026-10-01 or 2026-10-01T09:30")
+    parser.add_argument("--until", type=_parse_time)
+    parser.add_argument("--kind", action="append", help="only entries of this kind (repeatable)")
+    parser.add_argument("--tail", type=int, default=20, help="show at most this many (the latest)")
+    args = parser.parse_args(argv)
+
+    journal = Journal(args.folder)
+    try:
+        started = time.perf_counter()
+        entries = []
+        for entry in journal.entries(args.since, args.until, kinds=args.kind, reverse=True):
+            entries.append(entry)
+            if len(entries) >= args.tail:
+                break
+        elapsed = time.perf_counter() - started
+        for entry in reversed(entries):
+            stamp = datetime.fromtimestamp(entry.time).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{stamp}  #{entry.number:<8} {entry.kind:<8} {json.dumps(entry.data, ensure_ascii=False)}")
+        print(f"{len(entries)} of {len(journal)} entries shown ({elapsed * 1000:.1f} ms)")
+    finally:
+        journal.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
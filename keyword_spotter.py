@@ -0,0 +1,304 @@
+"""On-device keyword spotting for the fixed control phrases (create / open / save / close).
+
+Each command has a few enrolled recordings (keyword_samples/<command>/*.wav next to
+settings.json). An utterance is compared to them by MFCC features and dynamic time warping; when
+it is clearly closest to one command, that command fires without a round trip to the recognizer.
+
+    python keyword_spotter.py                         # accuracy/latency report on keyword_samples/
+    python keyword_spotter.py --samples dir --negatives dictation_wavs/
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_capture import Utterance
+from metrics import Histogram
+from recognizers import RecognizerBackend
+
+KEYWORD_COMMANDS = ("create", "open", "save", "close")
+_DTYPES = {1: np.uint8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+_FILTERBANKS = {}
+
+
+def _mel_filterbank(sample_rate, n_fft, n_mels):
+    key = (sample_rate, n_fft, n_mels)
+    if key not in _FILTERBANKS:
+        to_mel = lambda hz: 2595 * np.log10(1 + hz / 700)
+        to_hz = lambda mel: 700 * (10 ** (mel / 2595) - 1)
+        edges = to_hz(np.linspace(to_mel(60), to_mel(min(7600, sample_rate / 2)), n_mels + 2))
+        bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+        lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+        rising = (bins - lower) / (center - lower)
+        falling = (upper - bins) / (upper - center)
+        _FILTERBANKS[key] = np.maximum(0, np.minimum(rising, falling)).astype(np.float32)
+    return _FILTERBANKS[key]
+
+
+def mfcc(pcm, sample_rate, sample_width=2, n_mfcc=13, n_mels=26, frame_ms=25, hop_ms=10):
+    """MFCC matrix (frames x n_mfcc) of the speech part of pcm, mean-normalized per coefficient."""
+    samples = np.frombuffer(pcm, dtype=_DTYPES[sample_width], count=len(pcm) // sample_width).astype(np.float32)
+    if sample_width == 1:
+        samples -= 128
+    frame, hop = sample_rate * frame_ms // 1000, sample_rate * hop_ms // 1000
+    if len(samples) < frame:
+        return np.zeros((0, n_mfcc - 1), dtype=np.float32)
+    samples = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])  # Pre-emphasis
+    count = 1 + (len(samples) - frame) // hop
+    index = np.arange(frame)[None, :] + hop * np.arange(count)[:, None]
+    frames = samples[index] * np.hamming(frame).astype(np.float32)
+    n_fft = 1 << (frame - 1).bit_length()
+    power = np.abs(np.fft.rfft(frames, n_fft, axis=1)) ** 2 / n_fft
+    energy = np.log(power.sum(axis=1) + 1e-9)
+    frames_kept = energy > energy.max() - 7.0  # Drop leading/trailing/inter-word silence (about -30 dB)
+    mel = np.log(power[frames_kept] @ _mel_filterbank(sample_rate, n_fft, n_mels).T + 1e-9)
+    k = np.arange(n_mels)
+    dct = np.cos(np.pi / n_mels * (k[None, :] + 0.5) * np.arange(n_mfcc)[:, None])
+    coefficients = (mel @ dct.T)[:, 1:]  # c0 is loudness
+    return (coefficients - coefficients.mean(axis=0)).astype(np.float32)
+
+
+def dtw_distance(a, b):
+    """Length-normalized dynamic time warping distance between two MFCC matrices.
+
+    The recurrence D[i, j] = cost + min(D[i-1, j-1], D[i-1, j], D[i, j-1]) is solved a row at a
+    time with cumulative sums, so only the outer loop is in Python.
+    """
+    if not len(a) or not len(b):
+        return float("inf")
+    cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+    previous = np.full(len(b) + 1, np.inf)
+    previous[0] = 0.0
+    for row in cost:
+        # Best way into each cell from the row above (diagonal or straight down)
+        enter = np.minimum(previous[:-1], previous[1:]) + row
+        # Then allow moving right along this row: D[j] = min over k <= j of enter[k] + sum(row[k+1..j])
+        running = np.cumsum(row)
+        current = running + np.minimum.accumulate(enter - running)
+        previous = np.concatenate(([np.inf], current))
+    return float(previous[-1] / (len(a) + len(b)))
+
+
+class KeywordHit:
+    """A confident keyword match: distance to the best template and to the best other command."""
+
+    def __init__(self, command, distance, runner_up):
+        self.command = command
+        self.distance = distance
+        self.runner_up = runner_up
+
+    def __repr__(self):
+        return f"KeywordHit({self.command!r}, distance={self.distance:.2f}, runner_up={self.runner_up:.2f})"
+
+
+class KeywordSpotter:
+    """Enrolled templates per command, matched by MFCC + DTW.
+
+    spot() returns a KeywordHit only when the best template is closer than threshold and the
+    closest template of any other command is at least margin (relative) further away; anything
+    else (including utterances much longer than any sample, i.e. dictation) returns None.
+    """
+
+    def __init__(self, folder, threshold=9.0, margin=0.15, logger=None):
+        self.folder = folder
+        self.threshold = threshold
+        self.margin = margin
+        self.logger = logger or print
+        self._templates = {}  # command -> [(path, mfcc matrix, seconds)]
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        templates = {}
+        for command in KEYWORD_COMMANDS:
+            folder = os.path.join(self.folder, command)
+            try:
+                names = sorted(name for name in os.listdir(folder) if name.lower().endswith(".wav"))
+            except OSError:
+                continue
+            for name in names:
+                try:
+                    templates.setdefault(command, []).append(self._template(os.path.join(folder, name)))
+                except (OSError, EOFError, wave.Error) as e:
+                    self.logger(f"Skipping keyword sample {name}: {e}")
+        with self._lock:
+            self._templates = templates
+
+    @property
+    def ready(self):
+        """True once at least two commands have samples (one command alone can't be told apart)."""
+        return sum(1 for samples in self._templates.values() if samples) >= 2
+
+    def counts(self):
+        return {command: len(self._templates.get(command, ())) for command in KEYWORD_COMMANDS}
+
+    def enroll(self, command, utterance):
+        """Store utterance as a new sample for command; returns the WAV path."""
+        if command not in KEYWORD_COMMANDS:
+            raise ValueError(f"Not a keyword command: {command}")
+        folder = os.path.join(self.folder, command)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(utterance.sample_width)
+            wav.setframerate(utterance.sample_rate)
+            wav.writeframes(utterance.pcm)
+        template = (path, mfcc(utterance.pcm, utterance.sample_rate, utterance.sample_width), utterance.duration)
+        with self._lock:
+            self._templates.setdefault(command, []).append(template)
+        return path
+
+    def clear(self, command):
+        """Delete every sample enrolled for command."""
+        with self._lock:
+            templates = self._templates.pop(command, [])
+        for path, _, _ in templates:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def spot(self, utterance, exclude=()):
+        """KeywordHit for utterance, or None to fall through (exclude: sample paths to leave out)."""
+        with self._lock:
+            templates = {command: [sample for sample in samples if sample[0] not in exclude]
+                         for command, samples in self._templates.items()}
+        templates = {command: samples for command, samples in templates.items() if samples}
+        longest = max((seconds for samples in templates.values() for _, _, seconds in samples), default=0)
+        if len(templates) < 2 or utterance.duration > 2 * longest:
+            return None  # Dictation is not worth the feature extraction
+        features = mfcc(utterance.pcm, utterance.sample_rate, utterance.sample_width)
+        best = {}
+        for command, samples in templates.items():
+            # Templates over twice as long or short can't be the same phrase; skip their DTW
+            distances = [dtw_distance(features, template) for _, template, _ in samples
+                         if len(template) <= 2 * len(features) and len(features) <= 2 * len(template)]
+            best[command] = min(distances, default=float("inf"))
+        ranked = sorted(best, key=best.get)
+        distance, runner_up = best[ranked[0]], best[ranked[1]]
+        if distance > self.threshold or runner_up - distance < self.margin * distance:
+            return None
+        return KeywordHit(ranked[0], distance, runner_up)
+
+    def _template(self, path):
+        with wave.open(path, "rb") as wav:
+            rate, width = wav.getframerate(), wav.getsampwidth()
+            pcm = wav.readframes(wav.getnframes())
+        return path, mfcc(pcm, rate, width), len(pcm) / (rate * width)
+
+
+class KeywordSpottingRecognizer(RecognizerBackend):
+    """Answers with the command phrase when the spotter is confident, else asks the real backend."""
+
+    def __init__(self, spotter, fallback, phrases, metrics=None):
+        self.spotter = spotter
+        self.fallback = fallback
+        self.phrases = phrases  # command -> phrase the grammar understands (or a callable returning that dict)
+        self.metrics = metrics
+        self.name = f"keywords+{fallback.name}"
+        self.supports_streaming = fallback.supports_streaming  # Streaming sessions go straight to fallback
+        self.hits = 0
+
+    def recognize(self, utterance):
+        started = time.perf_counter()
+        hit = self.spotter.spot(utterance)
+        if self.metrics is not None:
+            self.metrics.observe("keyword.spot", time.perf_counter() - started)
+        phrases = self.phrases() if callable(self.phrases) else self.phrases
+        phrase = phrases.get(hit.command) if hit else None
+        if isinstance(phrase, list):
+            phrase = phrase[0] if phrase else None
+        if phrase:
+            self.hits += 1
+            return phrase.lower()
+        return self.fallback.recognize(utterance)
+
+    def start_stream(self, sample_rate, seq=0):
+        return self.fallback.start_stream(sample_rate, seq)
+
+
+def load_samples(folder):
+    """(label, path) for every WAV under folder/<label>/."""
+    samples = []
+    for label in sorted(os.listdir(folder)):
+        path = os.path.join(folder, label)
+        if os.path.isdir(path):
+            samples += [(label, os.path.join(path, name)) for name in sorted(os.listdir(path))
+                        if name.lower().endswith(".wav")]
+    return samples
+
+
+def _read_utterance(path):
+    with wave.open(path, "rb") as wav:
+        return Utterance(wav.readframes(wav.getnframes()), wav.getframerate(), wav.getsampwidth())
+
+
+def evaluate(samples_folder, negatives=(), threshold=9.0, margin=0.15):
+    """Leave-one-out accuracy of the enrolled samples, plus false alarms on negative recordings.
+
+    Every sample is spotted against all the other samples; negatives (dictation, other words)
+    should all fall through to the recognizer.
+    """
+    samples = [(label, path) for label, path in load_samples(samples_folder) if label in KEYWORD_COMMANDS]
+    spotter = KeywordSpotter(samples_folder, threshold=threshold, margin=margin, logger=lambda message: None)
+    latency = Histogram()
+    result = {"samples": len(samples), "correct": 0, "wrong": 0, "missed": 0, "negatives": 0, "false_alarms": 0}
+    confusions = {}
+    for label, path in samples:
+        started = time.perf_counter()
+        hit = spotter.spot(_read_utterance(path), exclude={path})
+        latency.observe(time.perf_counter() - started)
+        if hit is None:
+            result["missed"] += 1
+        elif hit.command == label:
+            result["correct"] += 1
+        else:
+            result["wrong"] += 1
+            confusions[f"{label} -> {hit.command}"] = confusions.get(f"{label} -> {hit.command}", 0) + 1
+    for path in negatives:
+        started = time.perf_counter()
+        hit = spotter.spot(_read_utterance(path))
+        latency.observe(time.perf_counter() - started)
+        result["negatives"] += 1
+        result["false_alarms"] += hit is not None
+    result["confusions"] = confusions
+    result["latency_ms"] = {p: round(latency.percentile(p) * 1000, 2) for p in (50, 95, 99)}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accuracy and latency of the keyword spotter on recorded samples.")
+    parser.add_argument("--samples", default=os.path.join(os.getcwd(), "keyword_samples"),
+                        help="folder with <command>/*.wav samples (default: ./keyword_samples)")
+    parser.add_argument("--negatives", help="folder of WAVs that must not trigger a command (e.g. dictation)")
+    parser.add_argument("--threshold", type=float, default=9.0)
+    parser.add_argument("--margin", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    negatives = []
+    if args.negatives:
+        negatives = sorted(os.path.join(args.negatives, name) for name in os.listdir(args.negatives)
+                           if name.lower().endswith(".wav"))
+    result = evaluate(args.samples, negatives, args.threshold, args.margin)
+    if not result["samples"]:
+        print(f"No samples in {args.samples}; enroll some from the Controls screen first.")
+        return 1
+    n = result["samples"]
+    print(f"samples:      {n} (leave-one-out)")
+    print(f"correct:      {result['correct']} ({result['correct'] / n:.1%})")
+    print(f"wrong:        {result['wrong']} ({result['wrong'] / n:.1%}) {result['confusions'] or ''}")
+    print(f"fell through: {result['missed']} ({result['missed'] / n:.1%}) -> full recognition")
+    if result["negatives"]:
+        print(f"false alarms: {result['false_alarms']}/{result['negatives']} negative recordings")
+    latency = result["latency_ms"]
+    print(f"spot latency: p50 {latency[50]} ms, p95 {latency[95]} ms, p99 {latency[99]} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Load-test client for daemon.py: many simulated sessions streaming WAV files at once.
+
+    python daemon.py --recognizer fake &
+    python load_test.py --sessions 200 --wav a.wav --wav b.wav
+    python load_test.py --sessions 50 --speed 0          # stream as fast as the server accepts
+
+Each session connects, streams one of the WAV files (round-robin) in 1024-frame chunks at
+--speed times real time, and records when every byte offset was sent. Latency of a result is
+the time from sending the audio where the utterance ended to receiving the result.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+
+from daemon import FRAME_HEADER
+from metrics import Histogram
+
+
+def load_wav(path):
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1:
+            raise ValueError(f"{path}: only mono WAV files can be streamed")
+        return wav.readframes(wav.getnframes()), wav.getframerate(), wav.getsampwidth()
+
+
+async def run_session(n, recording, args, stats):
+    pcm, sample_rate, sample_width = recording
+    try:
+        if args.unix:
+            reader, writer = await asyncio.open_unix_connection(args.unix)
+        else:
+            reader, writer = await asyncio.open_connection(args.host, args.port)
+    except OSError as e:
+        stats["connect_errors"] += 1
+        stats["errors"].append(str(e))
+        return
+    header = {"session": f"load-{n}", "sample_rate": sample_rate, "sample_width": sample_width,
+              "document": "loadtest"}
+    writer.write((json.dumps(header) + "\n").encode("utf-8"))
+    sent_at = []  # (end byte offset, monotonic time it was handed to the socket)
+
+    async def receive():
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            event = json.loads(line)
+            if event["event"] == "result":
+                stats["results"] += 1
+                offset = event.get("end_offset", 0)
+                when = next((t for end, t in sent_at if end >= offset), None)
+                if when is not None:
+                    stats["latency"].observe(time.monotonic() - when)
+            elif event["event"] == "unrecognized":
+                stats["unrecognized"] += 1
+            elif event["event"] == "error":
+                stats["errors"].append(event.get("error"))
+            elif event["event"] == "closed":
+                stats["completed"] += 1
+                return
+
+    receiver = asyncio.create_task(receive())
+    chunk = 1024 * sample_width
+    seconds_per_chunk = 1024 / sample_rate
+    started = time.monotonic()
+    try:
+        for i, offset in enumerate(range(0, len(pcm), chunk)):
+            data = pcm[offset:offset + chunk]
+            writer.write(FRAME_HEADER.pack(b"A", len(data)) + data)
+            await writer.drain()  # Waits here when the server applies backpressure
+            sent_at.append((offset + len(data), time.monotonic()))
+            if args.speed:
+                delay = started + (i + 1) * seconds_per_chunk / args.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        writer.write(FRAME_HEADER.pack(b"E", 0))
+        await writer.drain()
+        stats["audio_seconds"] += len(pcm) / (sample_rate * sample_width)
+        await asyncio.wait_for(receiver, args.timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        stats["errors"].append(f"session {n}: {e!r}")
+        receiver.cancel()
+    finally:
+        writer.close()
+
+
+async def run(args, recordings):
+    stats = {"results": 0, "unrecognized": 0, "completed": 0, "connect_errors": 0, "audio_seconds": 0.0,
+             "errors": [], "latency": Histogram()}
+    started = time.monotonic()
+    tasks = []
+    for n in range(args.sessions):
+        tasks.append(asyncio.create_task(run_session(n + 1, recordings[n % len(recordings)], args, stats)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.sessions)
+    await asyncio.gather(*tasks)
+    stats["wall_seconds"] = time.monotonic() - started
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive many simulated sessions against daemon.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to this Unix socket instead of TCP")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--wav", action="append", help="mono WAV to stream (repeatable; default: synthetic speech)")
+    parser.add_argument("--speed", type=float, default=1.0, help="times real time (0 = as fast as possible)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions are started")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for a session's results")
+    args = parser.parse_args(argv)
+
+    paths = args.wav
+    if not paths:
+        from benchmark import synth_wav
+        paths = [os.path.join(tempfile.mkdtemp(prefix="voice_notepad_load_"), "synthetic.wav")]
+        synth_wav(paths[0], [2, 4, 3, 5, 2])
+    recordings = [load_wav(path) for path in paths]
+
+    stats = asyncio.run(run(args, recordings))
+    latency = stats["latency"]
+    print(f"sessions:     {stats['completed']}/{args.sessions} completed, {stats['connect_errors']} could not connect")
+    print(f"results:      {stats['results']} ({stats['unrecognized']} unrecognized)")
+    print(f"audio:        {stats['audio_seconds']:.1f} s in {stats['wall_seconds']:.1f} s wall "
+          f"({stats['audio_seconds'] / stats['wall_seconds']:.1f}x real time)")
+    print(f"latency:      p50 {latency.percentile(50) * 1000:.0f} ms, p95 {latency.percentile(95) * 1000:.0f} ms, "
+          f"p99 {latency.percentile(99) * 1000:.0f} ms (end of utterance sent -> result)")
+    for error in sorted(set(stats["errors"]))[:10]:
+        print(f"error:        {error}")
+    return 0 if stats["completed"] == args.sessions else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import json
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """Log-bucketed latency histogram; percentiles are accurate to about growth/2 (2.5% by default)."""
+
+    def __init__(self, growth=1.05, floor=1e-6):
+        self.growth = growth
+        self.floor = floor
+        self._log_growth = math.log(growth)
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = int(math.log(max(value, self.floor) / self.floor) / self._log_growth)
+        with self._lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0-100), or 0.0 if nothing was observed."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = p / 100 * self.count
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                if seen >= rank:
+                    # Geometric midpoint of the bucket, clamped to what was actually seen
+                    value = self.floor * self.growth ** (index + 0.5)
+                    return min(max(value, self.min), self.max)
+            return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class MetricsRegistry:
+    """Named latency histograms (seconds) with JSON and Prometheus text export."""
+
+    def __init__(self, prefix="voice_notepad"):
+        self.prefix = prefix
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    @contextmanager
+    def span(self, name):
+        """Time the with-block into histogram `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe(time.perf_counter() - started)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    def snapshot(self):
+        return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+
+    def to_json(self):
+        return json.dumps({"timestamp": time.time(), "metrics": self.snapshot()}, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        for name, summary in self.snapshot().items():
+            metric = f"{self.prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile in ("p50", "p95", "p99"):
+                lines.append(f'{metric}{{quantile="0.{quantile[1:]}"}} {summary[quantile]:.6f}')
+            lines.append(f"{metric}_sum {summary['sum']:.6f}")
+            lines.append(f"{metric}_count {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write a snapshot: Prometheus text format for .prom/.txt files, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def format_table(self):
+        """Human-readable p50/p95/p99 table in milliseconds."""
+        rows = [f"{'stage':<28}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for name, s in self.snapshot().items():
+            rows.append(f"{name:<28}{s['count']:>7}{s['p50'] * 1000:>9.1f}{s['p95'] * 1000:>9.1f}"
+                        f"{s['p99'] * 1000:>9.1f}")
+        return "\n".join(rows)
@@ -0,0 +1,262 @@
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from command_grammar import edit_distance, tokenize
+
+NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "seven": "7", "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12",
+}
+_PHONETIC_RULES = [
+    (re.compile(r"ph"), "f"), (re.compile(r"gh"), "g"), (re.compile(r"ck"), "k"),
+    (re.compile(r"c(?=[eiy])"), "s"), (re.compile(r"dg"), "j"), (re.compile(r"sch"), "sk"),
+    (re.compile(r"[cq]"), "k"), (re.compile(r"x"), "ks"), (re.compile(r"z"), "s"),
+    (re.compile(r"v"), "f"), (re.compile(r"(?<=.)[aeiouwhy]"), ""), (re.compile(r"(.)\1+"), r"\1"),
+]
+
+
+def name_key(text):
+    """Spelling-insensitive key: lowercase words, number words as digits, no separators.
+
+    "Meeting Notes", "meeting_notes.txt" and "meetingnotes" all give "meetingnotes".
+    """
+    text = os.path.splitext(text)[0] if text.lower().endswith(".txt") else text
+    words = tokenize(re.sub(r"([a-z])([A-Z])", r"\1 \2", text).replace("_", " ").replace("-", " "))
+    return "".join(NUMBER_WORDS.get(word, word) for word in words).replace("'", "")
+
+
+def sound_key(key):
+    """Rough phonetic form of a name_key: similar-sounding spellings collapse to one key."""
+    letters = key
+    for pattern, replacement in _PHONETIC_RULES:
+        letters = pattern.sub(replacement, letters)
+    return letters
+
+
+def _trigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NoteMatch:
+    """A catalog file a spoken name resolved to; score is 1.0 for an exact name match."""
+
+    def __init__(self, path, score, how):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.score = score
+        self.how = how
+
+    def __repr__(self):
+        return f"NoteMatch({self.name!r}, score={self.score:.2f}, how={self.how!r})"
+
+
+class NotesCatalog:
+    """In-memory index of the note files in one folder, for resolving spoken file names.
+
+    Built on first use and kept current by cheap rescans: every lookup stats the folder and only
+    re-lists it when the folder's mtime changed (files added, removed or renamed). Names are
+    indexed by name_key, sound_key and character trigrams, so exact and sound-alike lookups are
+    dictionary hits (microseconds) and the fuzzy fallback only compares the few names sharing the
+    most trigrams with the spoken one.
+    """
+
+    def __init__(self, folder, extension=".txt", max_candidates=20, logger=None):
+        self.folder = folder
+        self.extension = extension
+        self.max_candidates = max_candidates
+        self.logger = logger or print
+        self._entries = {}  # path -> (name_key, sound_key)
+        self._by_key = {}
+        self._by_sound = {}
+        self._by_trigram = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def refresh(self, force=False):
+        """Re-list the folder if it changed since the last scan; returns True if it did."""
+        try:
+            mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime == self._stamp and not force:
+                return False
+            paths = set()
+            if mtime is not None:
+                try:
+                    with os.scandir(self.folder) as entries:
+                        paths = {entry.path for entry in entries
+                                 if entry.name.lower().endswith(self.extension) and entry.is_file()}
+                except OSError as e:
+                    self.logger(f"Could not list notes in {self.folder}: {e}")
+            for path in set(self._entries) - paths:
+                self._remove(path)
+            for path in paths - set(self._entries):
+                self._add(path)
+            # Coarse (e.g. FAT) timestamps: a change in the same tick as the scan would be missed
+            recent = mtime is not None and time.time_ns() - mtime < 2_000_000_000
+            self._stamp = None if recent else mtime
+            return True
+
+    def add(self, path):
+        """Index a file the app just created (without waiting for a rescan)."""
+        with self._lock:
+            if path not in self._entries:
+                self._add(path)
+
+    def remove(self, path):
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+
+    def resolve(self, spoken, limit=3, min_score=0.6):
+        """Best existing notes for a spoken name, most likely first (empty if nothing is close)."""
+        key = name_key(spoken)
+        if not key:
+            return []
+        self.refresh()
+        sound = sound_key(key)
+        with self._lock:
+            scores = {}
+            for path in self._by_key.get(key, ()):
+                scores[path] = (1.0, "name")
+            for path in self._by_sound.get(sound, ()):
+                scores.setdefault(path, (0.9, "sound"))
+            if not scores:  # Only misheard names pay for the fuzzy pass
+                for path in self._fuzzy_candidates(key):
+                    if path in scores:
+                        continue
+                    other_key, other_sound = self._entries[path]
+                    score = _similarity(key, other_key, min_score)
+                    if score < min_score:
+                        score = _similarity(sound, other_sound, min_score) * 0.95
+                    if score >= min_score:
+                        scores[path] = (min(score, 0.89), "fuzzy")
+        ranked = sorted(scores.items(), key=lambda item: (-item[1][0], os.path.basename(item[0]).lower()))
+        return [NoteMatch(path, score, how) for path, (score, how) in ranked[:limit]]
+
+    def complete(self, spoken, limit=3):
+        """Notes whose name starts with a partly spoken one ("meeting" -> "Meeting Notes.txt")."""
+        key = name_key(spoken)
+        if not key:
+            return []
+        self.refresh()
+        with self._lock:
+            found = [(len(other_key), os.path.basename(path).lower(), path, other_key)
+                     for path, (other_key, _) in self._entries.items() if other_key.startswith(key)]
+        found.sort()  # Shortest (closest to complete) names first
+        return [NoteMatch(path, len(key) / len(other_key), "prefix") for _, _, path, other_key in found[:limit]]
+
+    def _fuzzy_candidates(self, key):
+        counts = Counter()
+        grams = _trigrams(key)
+        # Trigrams shared by most of the folder ("not", "ote" in "note 1..note 9999") say little
+        common = max(200, len(self._entries) // 5)
+        postings = [self._by_trigram.get(gram, ()) for gram in grams]
+        for paths in [paths for paths in postings if len(paths) <= common] or postings:
+            counts.update(paths)
+        needed = max(1, len(grams) // 3)
+        return [path for path, count in counts.most_common(self.max_candidates) if count >= needed]
+
+    def _add(self, path):
+        key = name_key(os.path.basename(path))
+        sound = sound_key(key)
+        self._entries[path] = (key, sound)
+        self._by_key.setdefault(key, set()).add(path)
+        self._by_sound.setdefault(sound, set()).add(path)
+        for gram in _trigrams(key):
+            self._by_trigram.setdefault(gram, set()).add(path)
+
+    def _remove(self, path):
+        key, sound = self._entries.pop(path)
+        for index, value in ((self._by_key, key), (self._by_sound, sound)):
+            index[value].discard(path)
+            if not index[value]:
+                del index[value]
+        for gram in _trigrams(key):
+            self._by_trigram[gram].discard(path)
+            if not self._by_trigram[gram]:
+                del self._by_trigram[gram]
+
+
+class NotePrefetcher:
+    """Reads the notes a half-spoken name probably refers to, on a background thread, so that
+    opening the one finally named finds it in the OS cache instead of waiting on the disk.
+
+    request() is cheap and can be called with every partial transcript: only the latest name is
+    worked on and names requested meanwhile are dropped. resolve(name) returns NoteMatch-like
+    objects (e.g. NotesCatalog.resolve, which also gets its folder rescan done early).
+    """
+
+    def __init__(self, resolve, read_limit=8 << 20, remember=32, logger=None):
+        self.resolve = resolve
+        self.read_limit = read_limit  # Bytes read per file where the OS has no read-ahead hint
+        self.remember = remember
+        self.logger = logger or print
+        self.prefetched = OrderedDict()  # path -> mtime when read ahead, most recent last
+        self._pending = None
+        self._wake = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def request(self, spoken):
+        with self._wake:
+            if self._closed:
+                return
+            self._pending = spoken
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="note-prefetch", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while self._pending is None and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                spoken, self._pending = self._pending, None
+            try:
+                for match in self.resolve(spoken):
+                    self._read_ahead(match.path)
+            except Exception as e:
+                self.logger(f"Prefetching notes for '{spoken}' failed: {e}")
+
+    def _read_ahead(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        if self.prefetched.get(path) == mtime:
+            self.prefetched.move_to_end(path)
+            return
+        with open(path, "rb") as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)  # The kernel reads it in the background
+            else:
+                remaining = self.read_limit
+                while remaining > 0 and f.read(min(remaining, 1 << 20)):
+                    remaining -= 1 << 20
+        self.prefetched[path] = mtime
+        while len(self.prefetched) > self.remember:
+            self.prefetched.popitem(last=False)
+
+
+def _similarity(a, b, min_score):
+    """1 - edit distance / length, or 0.0 once it is known to be below min_score."""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 0.0
+    limit = int(longest * (1 - min_score))
+    distance = edit_distance(a, b, limit)
+    return 0.0 if distance > limit else 1 - distance / longest
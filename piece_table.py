@@ -0,0 +1,335 @@
+import bisect
+import mmap
+import os
+import stat
+import tempfile
+
+ORIGINAL, ADDED = 0, 1
+_BLOCK = 1 << 20
+
+
+class PieceTable:
+    """Bytes of one note as a piece table: spans of the file as opened plus an append-only buffer.
+
+    The file is memory-mapped, never read whole, so opening a multi-hundred-megabyte note costs
+    nothing and edits only touch the list of pieces. Every edit is one splice of that list and is
+    kept for undo/redo. save() compares the pieces with what the file held after the last save
+    and writes back only from the first changed byte (appends write just the new text).
+    """
+
+    def __init__(self, path, max_undo=1000, evacuate_limit=16 << 20):
+        self.path = path
+        self.max_undo = max_undo
+        self.evacuate_limit = evacuate_limit  # Largest region copied aside to keep undo across a save
+        self._file = open(path, "r+b")
+        self._map = None
+        self._original_length = os.fstat(self._file.fileno()).st_size
+        self._saved, self._saved_starts = [], []  # (start, bytes) of original bytes overwritten on disk
+        self._add = bytearray()
+        self._map_original(self._original_length)
+        self._pieces = [(ORIGINAL, 0, self._original_length)] if self._original_length else []
+        self._disk = list(self._pieces)  # What the file holds since the last save
+        self._length = self._original_length
+        self._starts = None  # Document offset of each piece, rebuilt after edits
+        self._undo = []  # (piece index, pieces removed, pieces inserted)
+        self._redo = []
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def dirty(self):
+        return self._pieces != self._disk
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def read(self, start=0, end=None):
+        """Bytes start..end of the document."""
+        end = self._length if end is None else min(end, self._length)
+        if start >= end:
+            return b""
+        index, offset = self._locate(start)
+        out, remaining = [], end - start
+        while remaining > 0:
+            buffer, piece_start, length = self._pieces[index]
+            take = min(length - offset, remaining)
+            out.append(self._bytes(buffer, piece_start + offset, take))
+            remaining -= take
+            index, offset = index + 1, 0
+        return b"".join(out)
+
+    def insert(self, offset, data):
+        self.replace(offset, offset, data)
+
+    def append(self, data):
+        self.replace(self._length, self._length, data)
+
+    def delete(self, start, end):
+        self.replace(start, end, b"")
+
+    def replace(self, start, end, data):
+        """Replace bytes start..end with data as one undoable edit."""
+        if not 0 <= start <= end <= self._length:
+            raise IndexError(f"range {start}..{end} is outside a document of {self._length} bytes")
+        if start == end and not data:
+            return
+        tail = self._pieces[-1] if self._pieces else None
+        if start == end == self._length and tail and tail[0] == ADDED and tail[1] + tail[2] == len(self._add):
+            # Dictation typing on at the end: grow the last piece instead of adding one per utterance
+            first, removed, inserted = len(self._pieces) - 1, [tail], [(ADDED, tail[1], tail[2] + len(data))]
+            self._add += data
+        else:
+            first, removed, inserted = self._cut(start, end, data)
+        self._splice(first, removed, inserted)
+        self._length += len(data) - (end - start)
+        self._undo.append((first, removed, inserted))
+        del self._undo[:-self.max_undo]
+        self._redo.clear()
+
+    def _cut(self, start, end, data):
+        """(piece index, pieces replaced, replacement pieces) for replacing start..end with data."""
+        first, offset = self._locate(start)
+        last, end_offset = self._locate(end) if end > start else (first, offset)
+        removed = self._pieces[first:last + 1]
+        inserted = []
+        if offset:
+            buffer, piece_start, _ = self._pieces[first]
+            inserted.append((buffer, piece_start, offset))
+        if data:
+            inserted.append((ADDED, len(self._add), len(data)))
+            self._add += data
+        if last < len(self._pieces):
+            buffer, piece_start, length = self._pieces[last]
+            if end_offset < length:
+                inserted.append((buffer, piece_start + end_offset, length - end_offset))
+        return first, removed, inserted
+
+    def undo(self):
+        """Revert the last edit; returns False if there is none."""
+        if not self._undo:
+            return False
+        index, removed, inserted = self._undo.pop()
+        self._splice(index, inserted, removed)
+        self._length += _size(removed) - _size(inserted)
+        self._redo.append((index, removed, inserted))
+        return True
+
+    def redo(self):
+        if not self._redo:
+            return False
+        index, removed, inserted = self._redo.pop()
+        self._splice(index, removed, inserted)
+        self._length += _size(inserted) - _size(removed)
+        self._undo.append((index, removed, inserted))
+        return True
+
+    def rfind(self, needle, end=None, ignore_case=True, whole_word=True):
+        """Offset of the last occurrence of needle (bytes) before end, or -1.
+
+        Scans backwards a block at a time. ignore_case folds ASCII letters only (so byte offsets
+        stay valid for UTF-8); whole_word requires no letter or digit right before and after.
+        """
+        end = self._length if end is None else end
+        if ignore_case:
+            needle = needle.lower()
+        while end >= len(needle) > 0:
+            start = max(0, end - _BLOCK)
+            lead = 1 if start else 0  # One byte either side of the window to check word boundaries
+            block = self.read(start - lead, end + 1)
+            haystack = block.lower() if ignore_case else block
+            limit = lead + end - start
+            while True:
+                found = haystack.rfind(needle, lead, limit)
+                if found < 0:
+                    break
+                if not whole_word or (_boundary(block, found - 1) and _boundary(block, found + len(needle))):
+                    return start - lead + found
+                limit = found + len(needle) - 1
+            if start == 0:
+                break
+            end = start + len(needle) - 1  # Overlap so a match across blocks is not missed
+        return -1
+
+    def save(self, fsync=False):
+        """Write changed bytes back to the file; returns the number of bytes written."""
+        if not self.dirty:
+            if fsync:
+                os.fsync(self._file.fileno())  # Earlier saves may not have been synced
+            return 0
+        first, last = self._changed_range()
+        length_changed = self._length != _size(self._disk)
+        if first < self._original_length:
+            # The write would overwrite bytes the pieces (and undo history) still point at:
+            # copy them into the add buffer first, or rewrite the whole file if that is too much
+            end = self._original_length if length_changed else min(last, self._original_length)
+            if not self._evacuate(first, end):
+                return self._rewrite(fsync)
+            if length_changed and first < self._mapped:
+                self._map_original(first)  # Everything past first is saved and the file may get shorter
+        written = 0
+        self._file.seek(first)
+        for block_start in range(first, last, _BLOCK):
+            block = self.read(block_start, min(last, block_start + _BLOCK))
+            self._file.write(block)
+            written += len(block)
+        if length_changed:
+            self._file.truncate(self._length)
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        self._disk = list(self._pieces)
+        return written
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _bytes(self, buffer, start, length):
+        if buffer == ADDED:
+            return bytes(self._add[start:start + length])
+        end, out = start + length, []
+        for saved_start, data in self._saved[max(0, bisect.bisect_right(self._saved_starts, start) - 1):]:
+            if saved_start >= end:
+                break
+            if saved_start + len(data) <= start:
+                continue
+            if saved_start > start:
+                out.append(self._map[start:saved_start])
+            out.append(data[start - saved_start if start > saved_start else 0:end - saved_start])
+            start = min(end, saved_start + len(data))
+        if start < end:
+            out.append(self._map[start:end])
+        return b"".join(out)
+
+    def _locate(self, offset):
+        """(piece index, offset inside it); offset == len(self) gives (len(pieces), 0)."""
+        if self._starts is None:
+            self._starts, position = [], 0
+            for _, _, length in self._pieces:
+                self._starts.append(position)
+                position += length
+        if offset >= self._length:
+            return len(self._pieces), 0
+        low, high = 0, len(self._starts) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._starts[middle] <= offset:
+                low = middle
+            else:
+                high = middle - 1
+        return low, offset - self._starts[low]
+
+    def _splice(self, index, old, new):
+        self._pieces[index:index + len(old)] = new
+        if self._starts is not None:  # Offsets before the edit stay valid; edits are usually at the end
+            del self._starts[index:]
+            position = self._starts[-1] + self._pieces[index - 1][2] if index else 0
+            for _, _, length in self._pieces[index:]:
+                self._starts.append(position)
+                position += length
+
+    def _changed_range(self):
+        """First and (exclusive) last document byte that differ from the file."""
+        current, disk = self._pieces, self._disk
+        first = i = 0
+        while i < min(len(current), len(disk)) and current[i] == disk[i]:
+            first += current[i][2]
+            i += 1
+        if i < min(len(current), len(disk)) and current[i][:2] == disk[i][:2]:
+            first += min(current[i][2], disk[i][2])  # Same piece, one longer (e.g. typed on)
+        last = self._length
+        if self._length == _size(disk):
+            j = 0
+            while j < min(len(current), len(disk)) - i and current[-1 - j] == disk[-1 - j]:
+                last -= current[-1 - j][2]
+                j += 1
+            if j < min(len(current), len(disk)) - i:
+                (buffer, start, length), (disk_buffer, disk_start, disk_length) = current[-1 - j], disk[-1 - j]
+                if buffer == disk_buffer and start + length == disk_start + disk_length:
+                    last -= min(length, disk_length)  # Same piece, cut short at the front
+        return first, max(first, last)
+
+    def _evacuate(self, start, end):
+        """Keep a copy of the original bytes start..end before the file there is overwritten.
+
+        Pieces keep pointing at the original buffer (so the piece indexes in the undo history stay
+        valid); reads of a saved range are served from the copy instead of the map.
+        """
+        missing, position = [], start
+        for saved_start, data in self._saved:
+            if saved_start + len(data) <= position:
+                continue
+            if saved_start >= end:
+                break
+            if saved_start > position:
+                missing.append((position, saved_start))
+            position = max(position, saved_start + len(data))
+        if position < end:
+            missing.append((position, end))
+        if sum(e - s for s, e in missing) > self.evacuate_limit:
+            return False
+        self._saved = sorted(self._saved + [(s, self._map[s:e]) for s, e in missing])
+        self._saved_starts = [s for s, _ in self._saved]
+        return True
+
+    def _rewrite(self, fsync):
+        """Write the whole document to a temp file and swap it in; undo history starts over."""
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block_start in range(0, self._length, _BLOCK):
+                    f.write(self.read(block_start, block_start + _BLOCK))
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+            # mkstemp creates it readable by the owner only; keep the note's own permissions
+            os.chmod(temp_path, stat.S_IMODE(os.fstat(self._file.fileno()).st_mode))
+            self.close()  # Windows can't replace a file that is open or mapped
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self._file = open(self.path, "r+b")
+        self._original_length = self._length
+        self._map_original(self._length)
+        self._saved, self._saved_starts = [], []
+        self._add = bytearray()
+        self._pieces = [(ORIGINAL, 0, self._length)] if self._length else []
+        self._disk = list(self._pieces)
+        self._undo.clear()
+        self._redo.clear()
+        self._starts = None
+        return self._length
+
+    def _map_original(self, length):
+        """Map the first length bytes of the file; the original buffer is this map plus the saved copies."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._mapped = length
+        if length:
+            self._map = mmap.mmap(self._file.fileno(), length, access=mmap.ACCESS_READ)
+
+
+def _size(pieces):
+    return sum(length for _, _, length in pieces)
+
+
+def _boundary(block, index):
+    """True if block[index] is not a word character (or lies outside the block)."""
+    if index < 0 or index >= len(block):
+        return True
+    byte = block[index]
+    return not (48 <= byte <= 57 or 65 <= byte <= 90 or 97 <= byte <= 122 or byte >= 128 or byte == 39)
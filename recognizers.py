@@ -0,0 +1,384 @@
+import json
+import queue
+import threading
+import time
+
+from metrics import MetricsRegistry
+
+
+class UnknownSpeech(Exception):
+    """The backend heard audio but could not turn it into words."""
+
+
+class RecognitionError(Exception):
+    """The backend itself failed (network down, model missing, ...)."""
+
+
+class RecognizerBackend:
+    """Turns an audio_capture.Utterance into lower-case text."""
+    name = "base"
+    supports_streaming = False
+
+    def recognize(self, utterance):
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate, seq=0):
+        """Return a stream session with accept(chunk) -> partial text and finish() -> final text."""
+        raise NotImplementedError(f"{self.name} recognizer does not support streaming")
+
+
+class GoogleRecognizer(RecognizerBackend):
+    """Google Web Speech API through speech_recognition (needs network)."""
+    name = "google"
+
+    def __init__(self, recognizer=None, language="en-US", operation_timeout=10.0):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = recognizer or sr.Recognizer()
+        if self.recognizer.operation_timeout is None:
+            self.recognizer.operation_timeout = operation_timeout  # A stalled request can't hold a worker forever
+        self.language = language
+
+    def recognize(self, utterance):
+        try:
+            return self.recognizer.recognize_google(utterance.to_audio_data(), language=self.language).lower()
+        except self.sr.UnknownValueError as e:
+            raise UnknownSpeech(str(e)) from e
+        except self.sr.RequestError as e:
+            raise RecognitionError(str(e)) from e
+
+
+class VoskRecognizer(RecognizerBackend):
+    """Local offline recognition with a Vosk/Kaldi model directory."""
+    name = "vosk"
+
+    def __init__(self, model_path):
+        try:
+            import vosk
+        except ImportError as e:
+            raise RecognitionError("Offline recognition needs the 'vosk' package (pip install vosk)") from e
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.model = vosk.Model(model_path)
+
+    def recognize(self, utterance):
+        rec = self.vosk.KaldiRecognizer(self.model, utterance.sample_rate)
+        rec.AcceptWaveform(utterance.pcm)
+        text = json.loads(rec.FinalResult()).get("text", "").strip()
+        if not text:
+            raise UnknownSpeech("no speech recognized")
+        return text.lower()
+
+    supports_streaming = True
+
+    def start_stream(self, sample_rate, seq=0):
+        return _VoskStream(self.vosk.KaldiRecognizer(self.model, sample_rate))
+
+
+class _VoskStream:
+    def __init__(self, rec):
+        self.rec = rec
+        self.done = []
+
+    def accept(self, chunk):
+        if self.rec.AcceptWaveform(chunk):
+            self.done.append(json.loads(self.rec.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self.rec.PartialResult()).get("partial", "")
+        return " ".join(t for t in self.done + [partial] if t).lower()
+
+    def finish(self):
+        self.done.append(json.loads(self.rec.FinalResult()).get("text", ""))
+        text = " ".join(t for t in self.done if t).strip()
+        if not text:
+            raise UnknownSpeech("no speech recognized")
+        return text.lower()
+
+
+class FakeRecognizer(RecognizerBackend):
+    """Deterministic recognizer for tests: answers from a script keyed by utterance sequence number.
+
+    script may be a list (utterance 1 gets script[0]), a dict {seq: text}, or a callable(utterance).
+    A None or empty answer raises UnknownSpeech.
+    """
+    name = "fake"
+
+    supports_streaming = True
+
+    def __init__(self, script=(), latency=0.0, chunks_per_word=4):
+        self.script = script
+        self.latency = latency
+        self.chunks_per_word = chunks_per_word
+        self.calls = 0
+
+    def recognize(self, utterance):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._lookup(utterance.seq, utterance)
+        if not text:
+            raise UnknownSpeech("no scripted transcript")
+        return text.lower()
+
+    def start_stream(self, sample_rate, seq=0):
+        """Reveal the scripted transcript one word every chunks_per_word chunks."""
+        return _FakeStream(self, seq)
+
+    def _lookup(self, seq, utterance=None):
+        if callable(self.script):
+            return self.script(utterance)
+        if isinstance(self.script, dict):
+            return self.script.get(seq)
+        index = seq - 1
+        return self.script[index] if 0 <= index < len(self.script) else None
+
+
+class _FakeStream:
+    def __init__(self, fake, seq):
+        self.fake = fake
+        self.seq = seq
+        self.chunks = 0
+
+    def accept(self, chunk):
+        self.chunks += 1
+        words = (self.fake._lookup(self.seq) or "").lower().split()
+        return " ".join(words[:self.chunks // self.fake.chunks_per_word])
+
+    def finish(self):
+        self.fake.calls += 1
+        text = self.fake._lookup(self.seq)
+        if not text:
+            raise UnknownSpeech("no scripted transcript")
+        return text.lower()
+
+
+BACKENDS = {
+    "google": GoogleRecognizer,
+    "vosk": VoskRecognizer,
+    "fake": FakeRecognizer,
+}
+
+
+def create_backend(name, **options):
+    """Build a backend by its settings name ("google", "vosk" or "fake")."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown recognizer backend: {name}") from None
+    return cls(**options)
+
+
+class Transcript:
+    """Result of recognizing one utterance; error is set instead of text on failure.
+
+    Streaming pipelines also emit partial Transcripts (partial=True, utterance=None) while the
+    user is still speaking.
+    """
+
+    def __init__(self, utterance, text=None, error=None, elapsed=0.0, partial=False):
+        self.utterance = utterance
+        self.text = text
+        self.error = error
+        self.elapsed = elapsed
+        self.partial = partial
+
+
+class RecognitionPipeline:
+    """Recognition workers between the capture stage and the controller.
+
+    Workers pull utterances from the capture queue, so utterance N+1 is captured while N is being
+    transcribed. Results come out in capture order through a bounded queue; when the consumer
+    falls behind, workers block and the capture queue starts dropping the oldest audio.
+
+    With streaming=True (and a backend that supports it) a single worker is fed audio chunks
+    while the user is still speaking and emits partial Transcripts before the final one.
+    """
+
+    def __init__(self, capture, backend, workers=1, max_pending=4, logger=None, streaming=False,
+                 metrics=None):
+        self.capture = capture
+        self.backend = backend
+        self.metrics = metrics or MetricsRegistry()
+        self.streaming = streaming and backend.supports_streaming
+        self.workers = 1 if self.streaming else workers
+        self.logger = logger or print
+        self.results = queue.Queue(maxsize=max_pending if not self.streaming else max_pending * 16)
+        self._events = queue.Queue(maxsize=2000)
+        if self.streaming:
+            capture.queue_utterances = False
+            capture.add_stream_consumer(self._on_stream_event)
+        self._stop = threading.Event()
+        self._threads = []
+        self._in_call = set()  # Workers currently inside a backend call
+        self._take_lock = threading.Lock()
+        self._order = threading.Condition()
+        self._next_ticket = 0
+        self._next_emit = 0
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    @property
+    def finished(self):
+        """True once the capture source is exhausted and every result has been handed out."""
+        return self.capture.finished.is_set() and not self.running and self.results.empty()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        target = self._stream_work if self.streaming else self._work
+        self._threads = [
+            threading.Thread(target=target, name=f"recognizer-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def cancel(self):
+        """Tell the workers to stop and wake the idle ones, without waiting for them."""
+        self._stop.set()
+        for _ in self._threads:
+            _put_nowait(self.capture.utterances, None)
+        _put_nowait(self._events, ("wake", None, None))
+        with self._order:
+            self._order.notify_all()
+
+    def stop(self, timeout=1.0):
+        """Stop the workers; returns those left running.
+
+        Idle workers end at once. A worker inside a backend call that can't be interrupted (e.g.
+        a Google request) is not waited for: it drops its result and ends when the call returns.
+        """
+        deadline = time.monotonic() + timeout
+        self.cancel()
+        busy = []
+        for thread in self._threads:
+            if thread not in self._in_call:
+                thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                busy.append(thread)
+        self._threads = []
+        if self.streaming:
+            self.capture.remove_stream_consumer(self._on_stream_event)
+            self.capture.queue_utterances = True
+        return busy
+
+    def interrupt(self):
+        """Make a get() that is waiting return None right away."""
+        _put_nowait(self.results, None)
+
+    def get(self, timeout=None):
+        """Next Transcript in capture order, or None if nothing arrived within timeout."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def discard_pending(self):
+        self.capture.discard_pending()
+        while True:
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                return
+
+    def _on_stream_event(self, event, seq, data):
+        try:
+            self._events.put_nowait((event, seq, data))
+        except queue.Full:
+            self.logger("Streaming recognizer fell behind; dropping audio.")
+
+    def _stream_work(self):
+        session, started, last_partial = None, 0.0, ""
+        while not self._stop.is_set():
+            try:
+                event, seq, data = self._events.get(timeout=0.1)
+            except queue.Empty:
+                if self.capture.finished.is_set() and self._events.empty():
+                    break
+                continue
+            try:
+                if event == "start":
+                    session = self.backend.start_stream(self.capture.segmenter.sample_rate, seq)
+                    started, last_partial = time.perf_counter(), ""
+                if session is None:
+                    continue
+                if event in ("start", "audio"):
+                    partial = session.accept(data)
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        self._put(Transcript(None, text=partial, partial=True))
+                elif event == "end":
+                    with self.metrics.span("recognition.finalize"):
+                        text = session.finish()
+                    self.metrics.observe("capture.utterance_length", data.duration)
+                    self._put(Transcript(data, text=text, elapsed=time.perf_counter() - started))
+                    session = None
+                else:
+                    session = None
+            except (UnknownSpeech, RecognitionError) as e:
+                self._put(Transcript(data if event == "end" else None, error=e))
+                session = None
+            except Exception as e:
+                self._put(Transcript(None, error=RecognitionError(str(e))))
+                session = None
+
+    def _put(self, result):
+        while not self._stop.is_set():
+            try:
+                self.results.put(result, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _take(self):
+        with self._take_lock:
+            utterance = self.capture.get_utterance(timeout=0.1)
+            if utterance is None:
+                return None, None
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            return utterance, ticket
+
+    def _work(self):
+        while not self._stop.is_set():
+            utterance, ticket = self._take()
+            if utterance is None:
+                if self.capture.finished.is_set() and self.capture.utterances.empty():
+                    break
+                continue
+            if utterance.end_time is not None:
+                self.metrics.observe("recognition.queue_wait", time.monotonic() - utterance.end_time)
+            self.metrics.observe("capture.utterance_length", utterance.duration)
+            started = time.perf_counter()
+            self._in_call.add(threading.current_thread())
+            try:
+                result = Transcript(utterance, text=self.backend.recognize(utterance))
+            except (UnknownSpeech, RecognitionError) as e:
+                result = Transcript(utterance, error=e)
+            except Exception as e:
+                result = Transcript(utterance, error=RecognitionError(str(e)))
+            finally:
+                self._in_call.discard(threading.current_thread())
+            result.elapsed = time.perf_counter() - started
+            self.metrics.observe(f"recognition.{self.backend.name}", result.elapsed)
+            self._emit(ticket, result)
+
+    def _emit(self, ticket, result):
+        with self._order:
+            while self._next_emit != ticket and not self._stop.is_set():
+                self._order.wait(0.1)
+        self._put(result)
+        with self._order:
+            self._next_emit = ticket + 1
+            self._order.notify_all()
+
+
+def _put_nowait(q, item):
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        pass  # Whoever reads q has something to wake up for already
@@ -0,0 +1,247 @@
+import math
+import os
+import sqlite3
+import threading
+from array import array
+
+from command_grammar import tokenize
+
+STOP_WORDS = frozenset(["a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+                        "of", "on", "or", "that", "the", "this", "to", "was", "with"])
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime_ns INTEGER,
+                                 size INTEGER, length INTEGER);
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (term TEXT, doc INTEGER, tf INTEGER, length INTEGER, weight REAL,
+                                     positions BLOB, PRIMARY KEY (term, doc)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_weight ON postings (term, weight DESC);
+CREATE INDEX IF NOT EXISTS postings_by_doc ON postings (doc);
+"""
+
+
+class SearchHit:
+    """A note matching a search; phrase is True when the query words appear together in order."""
+
+    def __init__(self, path, score, phrase=False):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.score = score
+        self.phrase = phrase
+
+    def __repr__(self):
+        return f"SearchHit({self.name!r}, score={self.score:.2f}, phrase={self.phrase})"
+
+
+class SearchIndex:
+    """Persistent inverted index over the notes in one folder, ranked with BM25.
+
+    Postings (term -> note, term frequency, word positions) live in an SQLite file next to the
+    notes, so a restart only re-reads notes whose mtime or size changed (sync()). Each posting
+    also stores its BM25 term weight from when it was indexed; ranked queries read only the
+    max_postings heaviest postings per term, so their cost depends on the query, not on how many
+    notes there are. Phrase queries check word positions.
+    """
+
+    def __init__(self, folder, db_path=None, extension=".txt", max_postings=300,
+                 max_file_bytes=2_000_000, logger=None):
+        self.folder = folder
+        self.db_path = db_path or os.path.join(folder, ".voice_notepad_index.sqlite3")
+        self.extension = extension
+        self.max_postings = max_postings
+        self.max_file_bytes = max_file_bytes
+        self.logger = logger or print
+        self.synced = False
+        self._pending = set()  # Notes edited by the app; re-checked before every search
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # The index can always be rebuilt from the notes
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS terms; "
+                                   "DROP TABLE IF EXISTS postings;")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.executescript(SCHEMA)
+        self._doc_count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+        self._total_length = total
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def sync(self, batch=200):
+        """Bring the index in line with the folder; returns (notes re-indexed, notes dropped)."""
+        with self._lock:
+            known = {path: (mtime, size) for path, mtime, size in
+                     self._db.execute("SELECT path, mtime_ns, size FROM docs")}
+        seen, updated = set(), 0
+        try:
+            with os.scandir(self.folder) as entries:
+                files = [entry for entry in entries if entry.name.lower().endswith(self.extension)]
+        except OSError as e:
+            self.logger(f"Could not index {self.folder}: {e}")
+            files = []
+        for i, entry in enumerate(files):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            seen.add(entry.path)
+            if known.get(entry.path) != (st.st_mtime_ns, st.st_size):
+                with self._lock:
+                    self._index(entry.path, st)
+                    updated += 1
+                    if updated % batch == 0:
+                        self._db.commit()  # Lets searches in between
+        with self._lock:
+            removed = [path for path in known if path not in seen]
+            for path in removed:
+                self._drop(path)
+            self._db.commit()
+            self.synced = True
+        return updated, len(removed)
+
+    def mark_changed(self, path):
+        """Note that the app wrote to path; it is re-indexed once its mtime changes."""
+        with self._lock:
+            self._pending.add(path)
+
+    def update_file(self, path):
+        """Re-index one note if it changed on disk (or drop it if it is gone); True if anything changed."""
+        with self._lock:
+            row = self._db.execute("SELECT mtime_ns, size FROM docs WHERE path = ?", (path,)).fetchone()
+            try:
+                st = os.stat(path)
+            except OSError:
+                if row is None:
+                    return False
+                self._drop(path)
+                self._db.commit()
+                return True
+            if row is not None and tuple(row) == (st.st_mtime_ns, st.st_size):
+                return False
+            self._index(path, st)
+            self._db.commit()
+            return True
+
+    def search(self, query, limit=5, phrase=False):
+        """Best notes for query, ranked by BM25 (notes containing the words as a phrase first).
+
+        With phrase=True only notes containing the exact word sequence are returned.
+        """
+        tokens = tokenize(query)
+        wanted = [(i, term) for i, term in enumerate(tokens) if term not in STOP_WORDS]
+        if not wanted:
+            return []
+        if not self.synced:
+            self.sync()
+        with self._lock:
+            for path in list(self._pending):
+                if self.update_file(path):
+                    self._pending.discard(path)
+            if not self._doc_count:
+                return []
+            terms = sorted({term for _, term in wanted})
+            df = dict(self._db.execute(
+                f"SELECT term, df FROM terms WHERE term IN ({','.join('?' * len(terms))})", terms))
+            if phrase and len(df) < len(terms):
+                return []
+            postings = self._phrase_postings(terms, df) if phrase else self._top_postings(terms)
+            scores, positions = self._score(postings, df)
+            in_phrase = set()
+            if len(wanted) > 1:  # Word positions are only decoded for notes containing every word
+                in_phrase = {doc for doc, found in positions.items()
+                             if len(found) == len(terms) and _has_phrase(wanted, found)}
+            if phrase:
+                scores = {doc: score for doc, score in scores.items() if doc in in_phrase or len(wanted) == 1}
+            ranked = sorted(scores, key=lambda doc: (doc not in in_phrase, -scores[doc]))[:limit]
+            paths = dict(self._db.execute(
+                f"SELECT id, path FROM docs WHERE id IN ({','.join('?' * len(ranked))})", ranked))
+        return [SearchHit(paths[doc], scores[doc], doc in in_phrase) for doc in ranked if doc in paths]
+
+    def _top_postings(self, terms):
+        for term in terms:
+            for doc, tf, length, blob in self._db.execute(
+                    "SELECT doc, tf, length, positions FROM postings WHERE term = ? ORDER BY weight DESC LIMIT ?",
+                    (term, self.max_postings)):
+                yield term, doc, tf, length, blob
+
+    def _phrase_postings(self, terms, df):
+        # Start from the rarest word and only look the others up in the notes that contain it
+        terms = sorted(terms, key=df.get)
+        rows = {terms[0]: self._db.execute(
+            "SELECT doc, tf, length, positions FROM postings WHERE term = ?", (terms[0],)).fetchall()}
+        docs = {row[0] for row in rows[terms[0]]}
+        for term in terms[1:]:
+            found = []
+            ids = sorted(docs)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                found += self._db.execute(
+                    f"SELECT doc, tf, length, positions FROM postings WHERE term = ? "
+                    f"AND doc IN ({','.join('?' * len(chunk))})", [term] + chunk).fetchall()
+            rows[term] = found
+            docs = {row[0] for row in found}
+        for term, term_rows in rows.items():
+            for doc, tf, length, blob in term_rows:
+                if doc in docs:
+                    yield term, doc, tf, length, blob
+
+    def _score(self, postings, df):
+        average = self._total_length / self._doc_count
+        scores, positions = {}, {}
+        for term, doc, tf, length, blob in postings:
+            idf = math.log(1 + (self._doc_count - df[term] + 0.5) / (df[term] + 0.5))
+            scores[doc] = scores.get(doc, 0.0) + idf * _weight(tf, length, average)
+            positions.setdefault(doc, {})[term] = blob
+        return scores, positions
+
+    def _index(self, path, st):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read(self.max_file_bytes)
+        except OSError as e:
+            self.logger(f"Could not index {os.path.basename(path)}: {e}")
+            return
+        self._drop(path)
+        tokens = tokenize(text)
+        cursor = self._db.execute("INSERT INTO docs (path, mtime_ns, size, length) VALUES (?, ?, ?, ?)",
+                                  (path, st.st_mtime_ns, st.st_size, len(tokens)))
+        doc = cursor.lastrowid
+        where = {}
+        for position, term in enumerate(tokens):
+            if term not in STOP_WORDS:
+                where.setdefault(term, array("I")).append(position)
+        average = (self._total_length + len(tokens)) / (self._doc_count + 1)
+        self._db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?)",
+                             [(term, doc, len(found), len(tokens), _weight(len(found), len(tokens), average),
+                               found.tobytes()) for term, found in where.items()])
+        self._db.executemany("INSERT INTO terms VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                             [(term,) for term in where])
+        self._doc_count += 1
+        self._total_length += len(tokens)
+
+    def _drop(self, path):
+        row = self._db.execute("SELECT id, length FROM docs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        doc, length = row
+        terms = [(term,) for (term,) in self._db.execute("SELECT term FROM postings WHERE doc = ?", (doc,))]
+        self._db.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", terms)
+        self._db.executemany("DELETE FROM terms WHERE term = ? AND df <= 0", terms)
+        self._db.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        self._db.execute("DELETE FROM docs WHERE id = ?", (doc,))
+        self._doc_count -= 1
+        self._total_length -= length
+
+
+def _weight(tf, length, average, k1=1.2, b=0.75):
+    """BM25 term-frequency part (without idf)."""
+    return tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / max(average, 1)))
+
+
+def _has_phrase(wanted, found):
+    """True if every query word occurs at the same offsets from the first one as in the query."""
+    first_offset, first_term = wanted[0]
+    rest = [(offset - first_offset, set(array("I", found[term]))) for offset, term in wanted[1:]]
+    return any(all(start + shift in where for shift, where in rest) for start in array("I", found[first_term]))
@@ -0,0 +1,94 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """Cold-start timeline: import time per module and named milestones, relative to launch.
+
+    Milestones used by the app: "first_frame" (window painted), "controller_ready" and
+    "listening" (microphone open and capture running).
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.imports = {}  # module -> seconds spent importing it (including its dependencies)
+        self.marks = {}  # milestone -> seconds since launch
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def imports_of(self, name):
+        """Time the import statement(s) in the with-block as module name."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.imports[name] = self.imports.get(name, 0.0) + time.perf_counter() - started
+
+    def preload(self, *names):
+        """Import modules now (e.g. on a background thread) so the first use doesn't pay for it."""
+        loaded = []
+        for name in names:
+            if name in sys.modules:
+                continue
+            started = time.perf_counter()
+            try:
+                __import__(name)
+            except Exception:
+                continue  # Optional dependency; whoever needs it reports the error
+            with self._lock:
+                self.imports[name] = time.perf_counter() - started
+            loaded.append(name)
+        return loaded
+
+    def mark(self, name):
+        """Record a milestone once; returns seconds since launch."""
+        with self._lock:
+            if name not in self.marks:
+                self.marks[name] = time.perf_counter() - self.started
+            return self.marks[name]
+
+    def process_overhead(self):
+        """Seconds from process creation to the first line of app code (interpreter and bootloader
+        start-up, e.g. the PyInstaller one-file unpack), or None without psutil.
+
+        Exact on Windows; on Linux the process start time is only known to about a second.
+        """
+        try:
+            import psutil
+            created = psutil.Process().create_time()
+        except Exception:
+            return None
+        now_wall, now_perf = time.time(), time.perf_counter()
+        return max(0.0, (now_wall - (now_perf - self.started)) - created)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "frozen": bool(getattr(sys, "frozen", False)),
+                "process_overhead": self.process_overhead(),
+                "imports": dict(sorted(self.imports.items(), key=lambda item: -item[1])),
+                "milestones": dict(sorted(self.marks.items(), key=lambda item: item[1])),
+            }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self):
+        """Human-readable report in milliseconds."""
+        report = self.to_dict()
+        rows = [f"{'startup':<28}{'ms':>9}"]
+        if report["process_overhead"] is not None:
+            rows.append(f"{'process start -> app code':<28}{report['process_overhead'] * 1000:>9.1f}")
+        for name, seconds in report["milestones"].items():
+            rows.append(f"{name:<28}{seconds * 1000:>9.1f}")
+        rows.append("")
+        rows.append(f"{'import':<28}{'ms':>9}")
+        for name, seconds in report["imports"].items():
+            rows.append(f"{name:<28}{seconds * 1000:>9.1f}")
+        return "\n".join(rows)
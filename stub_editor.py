@@ -0,0 +1,50 @@
+"""Stand-in editor for trying the editor pool without Notepad (e.g. on Linux).
+
+    python stub_editor.py [path] [--startup-delay 1.5] [--log opened.txt]
+
+Sleeps --startup-delay seconds to mimic a cold start, prints "ready", then opens the path given
+on the command line and each path written to its stdin (one per line), printing "opened <path>"
+once it has read the file. It exits when stdin is closed. Use it with the "stdin" handoff:
+
+    "editor_command": ["python", "stub_editor.py", "--startup-delay", "1.5"], "editor_handoff": "stdin"
+"""
+import argparse
+import sys
+import time
+
+
+def open_file(path, log=None):
+    try:
+        with open(path, "rb") as f:
+            size = sum(len(block) for block in iter(lambda: f.read(1 << 20), b""))
+    except OSError as e:
+        print(f"failed {path}: {e}", flush=True)
+        return
+    if log:
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(f"{time.time():.3f} {path} {size}\n")
+    print(f"opened {path}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub editor that opens files named on stdin.")
+    parser.add_argument("path", nargs="?", help="file to open right away")
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="seconds to wait before ready")
+    parser.add_argument("--log", help="append a line per opened file to this file")
+    args = parser.parse_args(argv)
+    for stream in (sys.stdin, sys.stdout):
+        if stream is not None:
+            stream.reconfigure(encoding="utf-8")
+
+    time.sleep(args.startup_delay)
+    print("ready", flush=True)
+    if args.path:
+        open_file(args.path, args.log)
+    for line in sys.stdin or ():
+        if line.strip():
+            open_file(line.strip(), args.log)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
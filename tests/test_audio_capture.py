@@ -0,0 +1,70 @@
+import math
+import struct
+import wave
+
+import pytest
+
+from audio_capture import CaptureStage, WavFileSource
+
+WORDS = [1, 3, 2, 4, 2]  # Tone bursts of 0.3 s + 0.25 s per word, a second of silence between them
+
+
+def write_bursts(path, words_per_burst, sample_rate=16000):
+    frames = bytearray(struct.pack("<h", 0) * int(0.6 * sample_rate))
+    for words in words_per_burst:
+        length = int((0.3 + 0.25 * words) * sample_rate)
+        for i in range(length):
+            envelope = min(1.0, i / 400, (length - i) / 400)
+            frames += struct.pack("<h", int(3000 * envelope * math.sin(2 * math.pi * 220 * i / sample_rate)))
+        frames += struct.pack("<h", 0) * sample_rate
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return path
+
+
+def capture(tmp_path, max_pending=16, vad="energy"):
+    wav = write_bursts(str(tmp_path / "speech.wav"), WORDS)
+    stage = CaptureStage(WavFileSource(wav), max_pending=max_pending, vad=vad, logger=lambda message: None)
+    stage.start()
+    assert stage.finished.wait(10)
+    stage.stop()
+    utterances = []
+    while True:
+        utterance = stage.get_utterance(timeout=0)
+        if utterance is None:
+            return stage, utterances
+        utterances.append(utterance)
+
+
+@pytest.mark.parametrize("vad", ["energy", "numpy"])
+def test_each_burst_becomes_one_utterance(tmp_path, vad):
+    if vad == "numpy":
+        pytest.importorskip("numpy")
+    stage, utterances = capture(tmp_path, vad=vad)
+    assert len(utterances) == len(WORDS)
+    assert [u.seq for u in utterances] == sorted(u.seq for u in utterances)
+    for words, utterance in zip(WORDS, utterances):
+        speech = 0.3 + 0.25 * words
+        assert speech <= utterance.duration <= speech + 1.5  # Plus pre-roll and trailing silence
+    assert stage.dropped == 0
+
+
+def test_full_queue_drops_the_oldest_utterances(tmp_path):
+    stage, utterances = capture(tmp_path, max_pending=2)
+    assert stage.dropped == len(WORDS) - 2
+    everything = capture(tmp_path)[1]
+    assert [u.seq for u in utterances] == [u.seq for u in everything[-2:]]
+
+
+def test_claimed_utterances_are_not_queued(tmp_path):
+    wav = write_bursts(str(tmp_path / "speech.wav"), WORDS)
+    stage = CaptureStage(WavFileSource(wav), vad="energy", logger=lambda message: None)
+    seen = []
+    stage.add_consumer(lambda utterance: seen.append(utterance) or len(seen) % 2 == 0)
+    stage.start()
+    assert stage.finished.wait(10)
+    assert len(seen) == len(WORDS)
+    assert stage.utterances.qsize() == len(WORDS) - len(WORDS) // 2
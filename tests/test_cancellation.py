@@ -0,0 +1,87 @@
+import threading
+import time
+
+from audio_capture import BufferSource, WavFileSource
+from benchmark import synth_wav
+from cancellation import CancelToken
+from config_service import ConfigService
+from document_backends import FileDocumentBackend
+from hcidublicate import NotepadController
+from recognizers import FakeRecognizer
+
+
+def test_child_token_is_cancelled_with_its_parent():
+    parent = CancelToken()
+    child = CancelToken(parent=parent)
+    parent.cancel("shutdown")
+    assert child.cancelled and child.reason == "shutdown"
+
+
+def test_replaced_children_do_not_pile_up_on_the_parent():
+    parent = CancelToken()
+    for _ in range(100):
+        CancelToken(parent=parent).cancel("restart")
+    assert parent._callbacks == []
+
+
+def test_child_of_a_cancelled_parent_starts_cancelled():
+    parent = CancelToken()
+    parent.cancel()
+    assert CancelToken(parent=parent).cancelled
+
+
+def test_stop_listening_stops_recognition(tmp_path):
+    wav = str(tmp_path / "speech.wav")
+    synth_wav(wav, [2] * 8)
+    recognizer = FakeRecognizer([f"line {n}" for n in range(1, 9)])
+    controller = NotepadController(logger=lambda message: None, audio_source=WavFileSource(wav, realtime=True),
+                                   backend=recognizer, document=FileDocumentBackend(fsync=False),
+                                   config=ConfigService(str(tmp_path)))
+    try:
+        controller.start_listening()
+        assert controller.continuous_listen() == "line 1"
+        controller.stop_listening()
+        assert controller.pipeline is None and controller.capture is None
+        calls = recognizer.calls
+        time.sleep(2.0)  # More than one further utterance of audio
+        assert recognizer.calls == calls
+        assert controller.continuous_listen() is None  # The stopped session does not reopen the microphone
+    finally:
+        controller.shutdown()
+
+
+class SlowMicrophone(BufferSource):
+    """Endless silence from a device that takes a while to open."""
+
+    def __init__(self):
+        super().__init__(b"\0\0" * 16000 * 60, realtime=True)
+        self.opening = threading.Event()
+        self.is_open = False
+
+    def open(self):
+        self.opening.set()
+        time.sleep(0.3)
+        super().open()
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+
+def test_stop_listening_during_a_capture_start_leaves_the_microphone_closed(tmp_path):
+    microphone = SlowMicrophone()
+    controller = NotepadController(logger=lambda message: None, audio_source=microphone, backend=FakeRecognizer(),
+                                   config=ConfigService(str(tmp_path)))
+    try:
+        token = controller.start_listening()
+        starter = threading.Thread(target=controller.start_capture, args=(token,))
+        starter.start()
+        assert microphone.opening.wait(2)
+        controller.stop_listening()  # While the listen thread is still opening the device
+        starter.join(2)
+        assert controller.capture is None and controller.pipeline is None
+        assert not microphone.is_open
+        assert controller.start_capture(token) is None  # A cancelled session never reopens it
+        assert controller.capture is None
+    finally:
+        controller.shutdown()
@@ -0,0 +1,18 @@
+from command_grammar import CommandGrammar
+
+COMMANDS = {"open": "open", "save": "save the notepad", "open_named": "open note <name>"}
+
+
+def test_a_one_word_command_needs_an_exact_match():
+    grammar = CommandGrammar.from_commands(COMMANDS)
+    assert grammar.match("open").action == "open"
+    assert grammar.match("open please").action == "open"
+    assert grammar.match("opens") is None
+    assert grammar.match("oven") is None
+
+
+def test_longer_commands_tolerate_a_misheard_word():
+    grammar = CommandGrammar.from_commands(COMMANDS)
+    match = grammar.match("save the notpad")
+    assert match.action == "save" and match.cost == 1
+    assert grammar.match("open note shoping list").slots == {"name": "shoping list"}
@@ -0,0 +1,87 @@
+import json
+import os
+import stat
+import time
+
+import pytest
+
+import config_service
+from config_service import ConfigService
+from editor_process import wait_until
+from hcidublicate import NotepadController
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_failed_save_keeps_the_old_file(tmp_path, monkeypatch):
+    service = ConfigService(str(tmp_path), logger=lambda message: None)
+    service.settings.update(energy_threshold=300)
+    service.flush()
+
+    def disk_full(fd):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(config_service.os, "fsync", disk_full)
+    service.settings.update(energy_threshold=500)
+    service.flush()
+    assert read_json(service.settings.path) == {"energy_threshold": 300}
+    assert service.settings.dirty and service.settings.get("energy_threshold") == 500
+    assert os.listdir(tmp_path) == ["settings.json"]  # No temp file left behind
+    monkeypatch.undo()
+    service.flush()
+    assert read_json(service.settings.path) == {"energy_threshold": 500}
+
+
+def test_changes_within_the_save_delay_are_one_write(tmp_path, monkeypatch):
+    writes = []
+    write = config_service.atomic_write_json
+    monkeypatch.setattr(config_service, "atomic_write_json", lambda path, data: writes.append(data) or write(path, data))
+    service = ConfigService(str(tmp_path), save_delay=0.2, logger=lambda message: None)
+    for value in range(100, 600, 100):
+        service.settings.update(energy_threshold=value)
+    service.settings.update(pause_threshold=0.6)
+    assert wait_until(lambda: writes, 2.0)
+    time.sleep(0.3)
+    service.stop()
+    assert writes == [{"energy_threshold": 500, "pause_threshold": 0.6}]
+
+
+def test_outside_edits_to_commands_reach_the_controller(tmp_path):
+    service = ConfigService(str(tmp_path), poll_interval=0.05, logger=lambda message: None)
+    controller = NotepadController(logger=lambda message: None, config=service)
+    try:
+        service.start()
+        with open(service.commands.path, "w", encoding="utf-8") as f:
+            json.dump({"save": "store the note"}, f)
+        assert wait_until(lambda: controller.commands["save"] == "store the note", 2.0)
+        assert controller.command_grammar.match("store the note").action == "save"
+        with open(service.commands.path, "w", encoding="utf-8") as f:
+            json.dump({"shout": "shout it"}, f)
+        assert wait_until(lambda: controller.commands.get("shout") == "shout it", 2.0)
+        assert controller.commands["save"] == "save the notepad"  # Removed override: the built-in phrase again
+        with open(service.commands.path, "w", encoding="utf-8") as f:
+            json.dump({}, f)
+        assert wait_until(lambda: "shout" not in controller.commands, 2.0)
+        assert controller.command_grammar.match("shout it") is None
+    finally:
+        service.stop()
+        controller.executor.stop()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_saving_keeps_the_file_mode(tmp_path):
+    service = ConfigService(str(tmp_path), logger=lambda message: None)
+    service.settings.update(energy_threshold=300)
+    old_umask = os.umask(0o022)
+    try:
+        service.flush()
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(os.stat(service.settings.path).st_mode) == 0o644  # Like open(path, "w")
+    os.chmod(service.settings.path, 0o640)
+    service.settings.update(energy_threshold=500)
+    service.flush()
+    assert stat.S_IMODE(os.stat(service.settings.path).st_mode) == 0o640
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from config_service import ConfigService
+from document_backends import FileDocumentBackend
+from hcidublicate import NotepadController
+
+
+@pytest.fixture
+def controller(tmp_path):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    log = []
+    controller = NotepadController(logger=log.append, document=FileDocumentBackend(fsync=False),
+                                   config=ConfigService(str(tmp_path)))
+    controller.log = log
+    controller.script_directory = str(notes)
+    controller.open_viewer = False  # No editor process
+    controller.create_notepad_with_name("today")
+    yield controller
+    controller.shutdown()
+
+
+def note_text(controller):
+    controller.executor.wait_idle()
+    controller.save_notepad()
+    with open(controller.current_file_path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_open_note_command_opens_a_matching_note(controller):
+    open(os.path.join(controller.script_directory, "meeting notes.txt"), "w").close()
+    assert controller.dispatch("open note meeting notes") == "open_named"
+    controller.executor.wait_idle()
+    assert os.path.basename(controller.current_file_path) == "meeting notes.txt"
+
+
+def test_open_dictation_without_a_matching_note_is_written(controller):
+    assert controller.command_grammar.match("open the window for some fresh air") is None
+    assert controller.dispatch("open note to self buy milk") == "write"
+    assert note_text(controller) == "open note to self buy milk\n"
+
+
+def test_replace_command_edits_the_note(controller):
+    controller.dispatch("we land in paris")
+    assert controller.dispatch("in the note replace paris with london") == "replace"
+    assert note_text(controller) == "we land in london\n"
+
+
+def test_replace_dictation_is_written(controller):
+    assert controller.command_grammar.match("replace the battery with a new one") is None
+    controller.dispatch("in the note replace the battery with a new one")
+    assert note_text(controller) == "in the note replace the battery with a new one\n"
+
+
+def test_failed_actions_are_reported_to_on_error(controller):
+    errors = []
+    controller.on_error = errors.append
+    controller.document.write = None  # Writing now raises TypeError inside write_text
+    controller.dispatch("buy milk")
+    controller.submit("broken", lambda: 1 / 0)
+    controller.executor.wait_idle()
+    assert [message.split(":")[0] for message in errors] == ["Error writing to Notepad", "Error running 'broken'"]
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import struct
+
+import pytest
+
+from daemon import DaemonServer
+from recognizers import FakeRecognizer
+
+
+async def session(notes_root, header):
+    """Send a header line and end the stream; returns the events the server sent back."""
+    server = DaemonServer(FakeRecognizer(), str(notes_root), workers=1)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+        writer.write((header if isinstance(header, str) else json.dumps(header)).encode("utf-8") + b"\n")
+        return await end(reader, writer)
+    finally:
+        listener.close()
+        server.pool.shutdown()
+
+
+async def connect(port, header):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(json.dumps(header).encode("utf-8") + b"\n")
+    await writer.drain()
+    return reader, writer
+
+
+async def end(reader, writer):
+    """Send the end-of-stream frame; returns the events the server sent back."""
+    writer.write(struct.pack(">cI", b"E", 0))
+    await writer.drain()
+    events = [json.loads(line) for line in (await asyncio.wait_for(reader.read(), 10)).splitlines()]
+    writer.close()
+    return events
+
+
+def run(notes_root, header):
+    return asyncio.run(session(notes_root, header))
+
+
+def test_document_is_created_in_the_session_folder(tmp_path):
+    events = run(tmp_path / "notes", {"session": "kiosk", "document": "shopping"})
+    assert [event["event"] for event in events] == ["ready", "closed"]
+    assert os.path.exists(tmp_path / "notes" / "kiosk" / "shopping.txt")
+
+
+@pytest.mark.parametrize("header", [
+    {"session": "kiosk", "document": "../../escaped"},
+    {"session": "..", "document": "escaped"},
+    {"session": "../..", "document": "escaped"},
+])
+def test_names_cannot_leave_the_notes_folder(tmp_path, header):
+    (tmp_path / "notes").mkdir()
+    run(tmp_path / "notes", header)
+    written = [os.path.relpath(os.path.join(folder, name), tmp_path)
+               for folder, _, names in os.walk(tmp_path) for name in names if name.endswith(".txt")]
+    assert all(path.startswith("notes" + os.sep) for path in written), written
+
+
+@pytest.mark.parametrize("header", ['["not", "an", "object"]', '"kiosk"', '{"document": ".."}',
+                                    '{"sample_rate": "fast"}', '{"sample_rate": 0}', '{"sample_width": 3}',
+                                    '{"commands": ["save"]}'])
+def test_bad_headers_get_a_protocol_error(tmp_path, header):
+    events = run(tmp_path, header)
+    assert len(events) == 1 and events[0]["event"] == "error"
+
+
+def test_a_session_name_can_only_be_connected_once(tmp_path):
+    async def scenario():
+        server = DaemonServer(FakeRecognizer(), str(tmp_path), workers=1)
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            first = await connect(port, {"session": "kiosk", "document": "shopping"})
+            assert json.loads(await first[0].readline())["event"] == "ready"
+            duplicate = await end(*await connect(port, {"session": "kiosk", "document": "shopping"}))
+            first_events = await end(*first)
+            again = await end(*await connect(port, {"session": "kiosk", "document": "shopping"}))
+            return duplicate, first_events, again
+        finally:
+            listener.close()
+            server.pool.shutdown()
+
+    duplicate, first_events, again = asyncio.run(scenario())
+    assert len(duplicate) == 1 and "already connected" in duplicate[0]["error"]
+    assert [event["event"] for event in first_events] == ["closed"]
+    assert [event["event"] for event in again] == ["ready", "closed"]  # Free again once the first one ended
@@ -0,0 +1,48 @@
+from command_grammar import CommandGrammar
+from dictation import IncrementalCommitter
+
+COMMANDS = {"save": "save the notepad", "open_named": "open note <name>"}
+
+
+def make_committer():
+    grammar = CommandGrammar.from_commands(COMMANDS)
+    writes = []
+    committer = IncrementalCommitter(lambda text, newline: writes.append((text, newline)),
+                                     lambda count: writes.append(("erase", count)),
+                                     lambda words: grammar.is_prefix(words))
+    return committer, writes
+
+
+def stream(committer, text):
+    words = text.split()
+    for n in range(1, len(words) + 1):
+        for _ in range(committer.stability):
+            committer.partial(" ".join(words[:n]))
+    return committer.final(text)
+
+
+def test_command_at_end_of_committed_dictation_is_written():
+    committer, writes = make_committer()
+    assert stream(committer, "i need to save the notepad") == ""
+    assert "".join(text for text, _ in writes) == "i need to save the notepad"
+    assert writes[-1] == ("save the notepad", True)
+
+
+def test_slot_command_at_end_of_committed_dictation_is_written():
+    committer, writes = make_committer()
+    assert stream(committer, "then open note meeting notes") == ""
+    assert "".join(text for text, _ in writes) == "then open note meeting notes"
+
+
+def test_whole_utterance_is_still_a_command_when_nothing_was_committed():
+    committer, writes = make_committer()
+    assert stream(committer, "save the notepad") == "save the notepad"
+    assert writes == []
+
+
+def test_revised_words_are_erased_and_the_rest_written():
+    committer, writes = make_committer()
+    for _ in range(2):
+        committer.partial("buy some milk")
+    assert committer.final("buy sour milk") == ""
+    assert writes == [("buy some milk ", False), ("erase", len("some milk") + 1), ("sour milk", True)]
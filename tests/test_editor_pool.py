@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from editor_process import EditorPool, EditorProcessTracker, _PIPES, wait_until
+
+STUB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stub_editor.py")
+
+
+@pytest.fixture
+def opened(tmp_path):
+    return tmp_path / "opened.txt"
+
+
+@pytest.fixture
+def tracker(opened):
+    tracker = EditorProcessTracker([sys.executable, STUB, "--startup-delay", "0.3", "--log", str(opened)],
+                                   ready_timeout=5.0, close_timeout=1.0, logger=lambda message: None)
+    yield tracker
+    tracker.close_all()
+
+
+@pytest.fixture
+def note(tmp_path):
+    path = tmp_path / "today.txt"
+    path.write_text("hello", encoding="utf-8")
+    return str(path)
+
+
+def logged_paths(opened):
+    return [line.split(" ")[1] for line in opened.read_text(encoding="utf-8").splitlines()] if opened.exists() else []
+
+
+def make_pool(tracker, size=1):
+    return EditorPool(tracker, size=size, handoff="stdin", logger=lambda message: None)
+
+
+def test_open_hands_the_file_to_an_idle_editor_and_refills(tracker, opened, note):
+    pool = make_pool(tracker)
+    try:
+        pool.fill()
+        assert wait_until(lambda: pool.idle == 1, 5.0)
+        idle = pool._idle[0]
+        process = pool.open(note)
+        assert process is idle and (pool.hits, pool.misses) == (1, 0)
+        assert process in tracker.processes
+        assert logged_paths(opened) == [note]
+        assert wait_until(lambda: pool.idle == 1, 5.0)  # A fresh editor waits for the next note
+        assert pool._idle[0] is not process
+    finally:
+        pool.close()
+
+
+def test_open_without_an_idle_editor_starts_one_cold(tracker, opened, note):
+    pool = make_pool(tracker, size=0)
+    process = pool.open(note)
+    assert (pool.hits, pool.misses) == (0, 1)
+    assert process in tracker.processes
+    assert logged_paths(opened) == [note]
+    assert pool.idle == 0 and pool._filling is None  # size 0 never starts idle editors
+
+
+def test_failed_handoff_falls_back_to_a_cold_start(tracker, opened, note):
+    tracker.ready_timeout = 1.0
+    pool = make_pool(tracker, size=0)
+    # Says nothing when given a file, so the handoff times out and the editor is killed
+    mute = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"], **_PIPES)
+    pool._idle.append(mute)
+    process = pool.open(note)
+    assert mute.poll() is not None
+    assert process is not mute and process in tracker.processes
+    assert (pool.hits, pool.misses) == (0, 1)
+    assert logged_paths(opened) == [note]
+
+
+def test_close_ends_idle_and_starting_editors(tracker, note):
+    pool = make_pool(tracker, size=2)
+    pool.fill()
+    assert wait_until(lambda: pool.idle == 1 and pool._starting is not None
+                      and pool._starting not in pool._idle, 5.0)
+    idle, starting = list(pool._idle), pool._starting
+    pool.close()
+    assert all(process.poll() is not None for process in idle + [starting])
+    assert wait_until(lambda: pool._filling is None, 2.0)
+    assert pool.idle == 0
+    pool.fill()  # A closed pool starts nothing more
+    assert pool._filling is None
+    assert tracker.processes == []
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from cancellation import CancelToken
+from editor_process import EditorProcessTracker, wait_until
+
+# Both editors touch the file they are "opened" on once they are up, then idle
+SLEEPER = [sys.executable, "-c", "import sys, time; open(sys.argv[1], 'w').close(); time.sleep(60)"]
+# Ignores terminate(), so closing it has to escalate to kill()
+STUBBORN = [sys.executable, "-c", "import signal, sys, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+                                  "open(sys.argv[1], 'w').close(); time.sleep(60)"]
+posix_only = pytest.mark.skipif(os.name == "nt", reason="terminate() is already a hard kill on Windows")
+
+
+@pytest.fixture
+def spawn(tmp_path):
+    numbers = iter(range(1000))
+
+    def spawn(tracker):
+        marker = tmp_path / f"editor-{next(numbers)}"
+        process = tracker.spawn(str(marker))
+        assert wait_until(marker.exists, 5.0)
+        return process
+    return spawn
+
+
+def test_build_command_places_the_path():
+    assert EditorProcessTracker(["gedit", "{path}", "--new"]).build_command("a.txt") == ["gedit", "a.txt", "--new"]
+    assert EditorProcessTracker(["notepad.exe"]).build_command("a.txt") == ["notepad.exe", "a.txt"]
+    assert EditorProcessTracker(["gedit", "{path}"]).build_command() == ["gedit"]
+
+
+def test_close_terminates_and_forgets_the_editor(spawn):
+    tracker = EditorProcessTracker(SLEEPER, logger=lambda message: None)
+    process = spawn(tracker)
+    assert tracker.is_running()
+    started = time.monotonic()
+    tracker.close(process)
+    assert process.poll() is not None
+    assert time.monotonic() - started < 1.0
+    assert not tracker.is_running() and tracker.processes == []
+
+
+@posix_only
+def test_close_escalates_to_kill_after_the_timeout(spawn):
+    tracker = EditorProcessTracker(STUBBORN, close_timeout=0.3, logger=lambda message: None)
+    process = spawn(tracker)
+    started = time.monotonic()
+    tracker.close(process)
+    elapsed = time.monotonic() - started
+    assert process.poll() == -9
+    assert 0.3 <= elapsed < 2.0
+
+
+@posix_only
+def test_cancelled_tracker_kills_without_waiting(spawn):
+    token = CancelToken()
+    tracker = EditorProcessTracker(STUBBORN, close_timeout=5.0, logger=lambda message: None, cancel=token)
+    process = spawn(tracker)
+    token.cancel("shutdown")
+    started = time.monotonic()
+    tracker.close(process)
+    assert time.monotonic() - started < 0.5
+    assert process.wait(2.0) == -9
+
+
+def test_close_all_only_closes_its_own_editors(spawn, tmp_path):
+    tracker = EditorProcessTracker(SLEEPER, logger=lambda message: None)
+    ours = [spawn(tracker) for _ in range(2)]
+    other = subprocess.Popen(SLEEPER + [str(tmp_path / "other")])
+    try:
+        tracker.close_all()
+        assert all(process.poll() is not None for process in ours)
+        assert other.poll() is None and tracker.processes == []
+    finally:
+        other.kill()
+        other.wait()
@@ -0,0 +1,52 @@
+import time
+
+from document_backends import InjectionQueue, RecordingAutomation
+
+
+def make_queue(**options):
+    automation = RecordingAutomation()
+    return InjectionQueue(automation, logger=lambda message: None, **options), automation
+
+
+def test_burst_of_writes_is_one_paste():
+    queue, automation = make_queue(debounce=0.2, max_delay=2.0)
+    for word in ("buy", "milk", "and", "eggs"):
+        queue.submit(word + " ", newline=False)
+    queue.submit("today")
+    assert queue.flush()
+    assert automation.calls == [("paste", "buy milk and eggs today"), ("press", "enter", 1)]
+    assert queue.batches == 1 and queue.injected == 5
+    queue.close()
+
+
+def test_erase_is_an_ordering_barrier():
+    queue, automation = make_queue(debounce=0.2, max_delay=2.0)
+    queue.submit("buy some ", newline=False)
+    queue.submit_erase(5)
+    queue.submit("sour milk")
+    assert queue.flush()
+    assert automation.text == "buy sour milk\n"
+    assert [call[0] for call in automation.calls] == ["paste", "press", "paste", "press"]
+    assert automation.calls[1] == ("press", "backspace", 5)
+    queue.close()
+
+
+def test_line_breaks_inside_a_batch_are_kept():
+    queue, automation = make_queue(debounce=0.2, max_delay=2.0)
+    queue.submit("first line")
+    queue.submit("second line")
+    assert queue.flush()
+    assert automation.text == "first line\nsecond line\n"
+    queue.close()
+
+
+def test_steady_writes_are_not_held_past_max_delay():
+    queue, automation = make_queue(debounce=0.1, max_delay=0.3)
+    started = time.monotonic()
+    while time.monotonic() - started < 1.0:  # Never quiet for a whole debounce period
+        queue.submit("word ", newline=False)
+        time.sleep(0.02)
+    assert queue.batches >= 2
+    assert queue.max_latency < 0.3 + 0.2  # Slack for a busy machine
+    queue.close()
+    assert automation.text == "word " * queue.injected
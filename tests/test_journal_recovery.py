@@ -0,0 +1,69 @@
+import pytest
+
+from config_service import ConfigService
+from document_backends import FileDocumentBackend
+from hcidublicate import NotepadController
+from journal import Journal
+
+
+@pytest.fixture
+def start(tmp_path):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    controllers = []
+
+    def start():
+        controller = NotepadController(logger=lambda message: None, document=FileDocumentBackend(fsync=False),
+                                       config=ConfigService(str(tmp_path)), journal=Journal(str(tmp_path)))
+        controller.script_directory = str(notes)
+        controller.open_viewer = False
+        controllers.append(controller)
+        return controller
+
+    yield start
+    for controller in controllers:
+        controller.shutdown()
+
+
+def dictate_without_saving(controller):
+    controller.create_notepad_with_name("trip")
+    controller.dispatch("we land at noon")
+    controller.executor.wait_idle()
+
+
+def crash(controller):
+    controller.executor.stop()
+    controller.journal.close()
+    controller.journal = None  # Nothing more is journaled, as if the process died
+
+
+def test_unsaved_dictation_is_recovered_after_a_crash(start):
+    first = start()
+    dictate_without_saving(first)
+    crash(first)
+
+    second = start()
+    path, size, backend, pending = second.unsaved_work()
+    assert (size, backend, [entry.kind for entry in pending]) == (0, "file", ["write"])
+    assert second.recover_unsaved() == 1
+    second.save_notepad()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "we land at noon\n"
+
+
+def test_nothing_is_recovered_after_a_clean_shutdown(start):
+    first = start()
+    dictate_without_saving(first)
+    first.shutdown()
+
+    second = start()
+    assert second.unsaved_work() is None
+    assert second.recover_unsaved() == 0
+
+
+def test_declined_recovery_is_not_offered_again(start):
+    first = start()
+    dictate_without_saving(first)
+    crash(first)
+    assert start().unsaved_work() is not None  # Not recovered, then this run crashes too
+    assert start().unsaved_work() is None
@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from audio_capture import BufferSource, Utterance  # noqa: E402
+from config_service import ConfigService  # noqa: E402
+from hcidublicate import NotepadController  # noqa: E402
+from keyword_spotter import KeywordSpotter  # noqa: E402
+from recognizers import FakeRecognizer  # noqa: E402
+
+RATE = 16000
+
+
+def sweep(start_hz, end_hz, seconds=0.6, shift=1.0, seed=0):
+    """A pitch glide standing in for a spoken word (shift and a little noise vary the "speaker")."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    hz = shift * (start_hz + (end_hz - start_hz) * t / seconds)
+    samples = 3000 * np.sin(2 * np.pi * np.cumsum(hz) / RATE)
+    samples += np.random.default_rng(seed).normal(0, 30, len(t))
+    return Utterance(samples.astype("<i2").tobytes(), RATE, 2)
+
+
+WORDS = {"create": (300, 1200), "save": (1200, 300), "open": (500, 500)}
+
+
+@pytest.fixture
+def spotter(tmp_path):
+    spotter = KeywordSpotter(str(tmp_path), logger=lambda message: None)
+    for command, (start, end) in WORDS.items():
+        for n, shift in enumerate((0.97, 1.03)):
+            spotter.enroll(command, sweep(start, end, shift=shift, seed=n))
+    return spotter
+
+
+def test_enrolled_keyword_is_spotted(spotter, tmp_path):
+    assert spotter.ready and spotter.counts()["save"] == 2
+    hit = spotter.spot(sweep(1200, 300, seed=7))
+    assert hit is not None and hit.command == "save"
+    assert spotter.spot(sweep(300, 1200, shift=1.01, seed=8)).command == "create"
+    reloaded = KeywordSpotter(str(tmp_path), logger=lambda message: None)  # Samples were saved as WAVs
+    assert reloaded.counts() == spotter.counts()
+    assert reloaded.spot(sweep(1200, 300, seed=7)).command == "save"
+
+
+def test_other_sounds_are_not_keywords(spotter):
+    assert spotter.spot(sweep(2500, 3500, seed=9)) is None  # Nothing like any sample
+    assert spotter.spot(sweep(300, 1200, seconds=2.0)) is None  # Far longer than the samples: dictation
+
+
+def test_recording_a_sample_while_stopped_releases_the_microphone(tmp_path):
+    second = b"\0\0" * RATE
+    microphone = BufferSource(second + sweep(1200, 300).pcm + second * 5, realtime=True)  # One word, then quiet
+    controller = NotepadController(logger=lambda message: None, audio_source=microphone, backend=FakeRecognizer(),
+                                   config=ConfigService(str(tmp_path)))
+    try:
+        path = controller.record_keyword_sample("save", timeout=5)
+        assert path is not None and controller.keyword_spotter.counts()["save"] == 1
+        assert controller.capture is None and controller.pipeline is None
+    finally:
+        controller.shutdown()
@@ -0,0 +1,31 @@
+import pytest
+
+from notes_catalog import NotesCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    for name in ("Meeting Notes.txt", "shopping_list.txt", "Philip.txt", "todo.md"):
+        (tmp_path / name).write_text("", encoding="utf-8")
+    return NotesCatalog(str(tmp_path), logger=lambda message: None)
+
+
+def resolve(catalog, spoken):
+    return [(match.name, match.how) for match in catalog.resolve(spoken)]
+
+
+def test_exact_sound_alike_and_fuzzy_names(catalog):
+    assert resolve(catalog, "meeting notes") == [("Meeting Notes", "name")]
+    assert resolve(catalog, "shopping list") == [("shopping_list", "name")]
+    assert resolve(catalog, "filip") == [("Philip", "sound")]
+    assert resolve(catalog, "shoping lists") == [("shopping_list", "fuzzy")]
+    assert catalog.resolve("todo") == []  # Not a .txt note
+    assert catalog.resolve("weather report") == []
+
+
+def test_new_files_are_found_after_a_rescan(catalog, tmp_path):
+    assert catalog.resolve("trip plan") == []
+    (tmp_path / "trip_plan.txt").write_text("", encoding="utf-8")
+    assert resolve(catalog, "trip plan") == [("trip_plan", "name")]
+    (tmp_path / "trip_plan.txt").unlink()
+    assert catalog.resolve("trip plan") == []
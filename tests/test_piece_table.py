@@ -0,0 +1,35 @@
+import os
+import stat
+
+import pytest
+
+from piece_table import PieceTable
+
+
+@pytest.fixture
+def note(tmp_path):
+    path = tmp_path / "trip.txt"
+    path.write_bytes(b"we land at noon\n")
+    os.chmod(path, 0o644)
+    return str(path)
+
+
+def test_partial_save_writes_only_the_change(note):
+    table = PieceTable(note)
+    table.append(b"then take the train\n")
+    assert table.save() == len(b"then take the train\n")
+    table.close()
+    with open(note, "rb") as f:
+        assert f.read() == b"we land at noon\nthen take the train\n"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_whole_file_rewrite_keeps_the_file_mode(note):
+    table = PieceTable(note, evacuate_limit=0)  # Nothing may be copied aside, so the save rewrites the file
+    table.insert(0, b"monday: ")
+    table.save()
+    assert not table.can_undo  # Went through the rewrite
+    table.close()
+    with open(note, "rb") as f:
+        assert f.read() == b"monday: we land at noon\n"
+    assert stat.S_IMODE(os.stat(note).st_mode) == 0o644
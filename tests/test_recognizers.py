@@ -0,0 +1,62 @@
+import queue
+import threading
+import time
+
+from audio_capture import Utterance
+from recognizers import FakeRecognizer, RecognitionPipeline
+
+
+class QueuedCapture:
+    """The part of CaptureStage the pipeline reads from, preloaded with utterances."""
+
+    def __init__(self, count):
+        self.utterances = queue.Queue()
+        for seq in range(1, count + 1):
+            self.utterances.put(Utterance(b"\0\0" * 1600, 16000, 2, seq=seq))
+        self.finished = threading.Event()
+        self.finished.set()
+
+    def get_utterance(self, timeout=None):
+        try:
+            return self.utterances.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def discard_pending(self):
+        pass
+
+
+def test_results_come_out_in_capture_order():
+    def slower_first(utterance):
+        time.sleep((6 - utterance.seq) * 0.03)  # Later utterances finish first
+        return f"line {utterance.seq}"
+
+    pipeline = RecognitionPipeline(QueuedCapture(5), FakeRecognizer(slower_first), workers=3,
+                                   logger=lambda message: None)
+    pipeline.start()
+    results = [pipeline.get(timeout=2) for _ in range(5)]
+    assert [result.text for result in results] == [f"line {n}" for n in range(1, 6)]
+    assert [result.utterance.seq for result in results] == [1, 2, 3, 4, 5]
+    pipeline.stop()
+
+
+def test_stop_does_not_wait_for_a_worker_inside_a_call():
+    release = threading.Event()
+    entered = threading.Event()
+
+    def stuck(utterance):
+        entered.set()
+        release.wait(5)  # Like a network request that can't be interrupted
+        return "too late"
+
+    pipeline = RecognitionPipeline(QueuedCapture(1), FakeRecognizer(stuck), workers=2, logger=lambda message: None)
+    pipeline.start()
+    assert entered.wait(2)
+    started = time.monotonic()
+    busy = pipeline.stop(timeout=0.5)
+    assert time.monotonic() - started < 1.0
+    assert len(busy) == 1
+    release.set()
+    busy[0].join(2)
+    assert not busy[0].is_alive()
+    assert pipeline.get(timeout=0) is None  # The late result is dropped
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from search_index import SearchIndex
+
+
+@pytest.fixture
+def notes(tmp_path):
+    (tmp_path / "trip.txt").write_text("pack the red bag for the trip\n", encoding="utf-8")
+    (tmp_path / "shop.txt").write_text("red apples and a bag of rice\n", encoding="utf-8")
+    index = SearchIndex(str(tmp_path), logger=lambda message: None)
+    yield tmp_path, index
+    index.close()
+
+
+def names(hits):
+    return [os.path.basename(hit.path) for hit in hits]
+
+
+def test_phrase_matches_rank_first(notes):
+    folder, index = notes
+    assert names(index.search("red bag", phrase=True)) == ["trip.txt"]
+    hits = index.search("red bag")
+    assert names(hits) == ["trip.txt", "shop.txt"]
+    assert [hit.phrase for hit in hits] == [True, False]
+
+
+def test_marked_notes_are_reindexed_before_the_next_search(notes):
+    folder, index = notes
+    assert names(index.search("rice")) == ["shop.txt"]
+    path = str(folder / "shop.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("the red bag is by the door\n")
+    index.mark_changed(path)
+    assert index.search("rice") == []
+    assert sorted(names(index.search("red bag", phrase=True))) == ["shop.txt", "trip.txt"]
@@ -0,0 +1,71 @@
+import math
+import struct
+import wave
+
+import benchmark
+import transcribe
+from recognizers import RecognitionError
+
+RATE = 16000
+
+
+class RecordingBackend:
+    def __init__(self, answer):
+        self.answer = answer
+        self.heard = []
+
+    def recognize(self, utterance):
+        self.heard.append(utterance.pcm)
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer
+
+
+def speech_to_the_end(path, frames=26100):
+    """0.6 s of silence, then a tone up to the last frame (not a whole number of 1024-frame chunks)."""
+    pcm = struct.pack("<h", 0) * int(0.6 * RATE)
+    pcm += b"".join(struct.pack("<h", int(3000 * math.sin(2 * math.pi * 220 * i / RATE)))
+                    for i in range(frames - int(0.6 * RATE)))
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(pcm)
+    return pcm
+
+
+def transcribe_with(monkeypatch, tmp_path, backend):
+    monkeypatch.setattr(transcribe, "_backend", backend)
+    monkeypatch.setattr(transcribe, "_config_dir", str(tmp_path))
+    monkeypatch.setattr(transcribe, "_commands", None)
+    notes = tmp_path / "notes"
+    (notes / transcribe.MARKER_DIR).mkdir(parents=True)
+    pcm = speech_to_the_end(str(tmp_path / "talk.wav"))
+    return pcm, transcribe.transcribe_one(str(tmp_path / "talk.wav"), str(notes), vad="energy")
+
+
+def test_the_short_last_chunk_is_transcribed(monkeypatch, tmp_path):
+    backend = RecordingBackend("no errors in this text")
+    pcm, result = transcribe_with(monkeypatch, tmp_path, backend)
+    assert len(backend.heard) == 1
+    assert backend.heard[0].endswith(pcm[-500 * 2:])
+    assert result["utterances"] == 1
+    assert result["errors"] == []
+    with open(result["note"], encoding="utf-8") as f:
+        assert "no errors in this text" in f.read()
+
+
+def test_recognition_failures_are_reported_as_errors(monkeypatch, tmp_path):
+    _, result = transcribe_with(monkeypatch, tmp_path, RecordingBackend(RecognitionError("model missing")))
+    assert result["unrecognized"] == 1
+    assert len(result["errors"]) == 1 and "model missing" in result["errors"][0]
+
+
+def test_parallel_recordings_switching_to_the_same_note_keep_their_own_copy(tmp_path):
+    corpus = benchmark.generate_corpus(str(tmp_path / "corpus"), recordings=3)
+    notes = tmp_path / "notes"
+    assert transcribe.main([corpus, "--notes", str(notes), "--recognizer", "fake", "--jobs", "3",
+                            "--config", str(tmp_path), "--vad", "energy"]) == 0
+    for n in range(1, 4):
+        with open(notes / f"synthetic_{n}" / "shopping.txt", encoding="utf-8") as f:
+            assert f.read() == "buy milk\nand eggs\nalso bread\n"
@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vad import VadSegmenter  # noqa: E402
+
+RATE = 16000
+CHUNK = 1024
+
+
+def tone(seconds, hz=220, amplitude=3000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return amplitude * np.sin(2 * np.pi * hz * t)
+
+
+def noise(seconds, amplitude, seed=0):
+    return np.random.default_rng(seed).normal(0, amplitude, int(seconds * RATE))
+
+
+def segments(samples):
+    pcm = np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+    segmenter = VadSegmenter(RATE, 2, CHUNK)
+    found = []
+    for start in range(0, len(pcm), CHUNK * 2):
+        utterance = segmenter.feed(pcm[start:start + CHUNK * 2])
+        if utterance is not None:
+            found.append(utterance)
+    return found + [u for u in [segmenter.flush()] if u is not None]
+
+
+def test_silence_between_utterances_splits_them():
+    hiss = lambda seconds, seed: noise(seconds, 60, seed)  # Quiet background the floor tracks
+    audio = np.concatenate([hiss(0.5, 1), tone(0.8) + hiss(0.8, 2), hiss(1.0, 3),
+                            tone(1.2, hz=300) + hiss(1.2, 4), hiss(1.0, 5)])
+    found = segments(audio)
+    assert len(found) == 2
+    for utterance, spoken in zip(found, (0.8, 1.2)):
+        assert spoken <= utterance.duration <= spoken + 0.4  # Trimmed to the speech plus padding
+    assert found[0].seq < found[1].seq
+
+
+def test_broadband_noise_is_not_speech():
+    audio = np.concatenate([noise(0.5, 60), noise(1.5, 400, seed=1), noise(0.5, 60, seed=2)])
+    assert segments(audio) == []
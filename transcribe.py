@@ -0,0 +1,246 @@
+"""Batch transcription: a folder of WAV recordings -> notes, across a pool of processes.
+
+    python transcribe.py meetings/ --recognizer vosk --model-path vosk-model-small-en-us
+    python transcribe.py meetings/ --notes notes/ --jobs 4
+    python transcribe.py corpus/ --recognizer fake       # scripted transcripts from corpus.json
+
+Each recording is dictated into <recording name>/<recording name>.txt in the notes folder through
+NotepadController, so spoken commands work as they do live ("create a notepad called ...",
+"save the notepad", ...). Text is flushed to the note after every utterance. Notes a recording
+creates or opens by voice live in its own <recording name>/ folder, so recordings transcribed in
+parallel never write to the same file.
+
+Resuming: finished recordings are listed in .transcribe_state.json in the notes folder and
+skipped on the next run (unless the WAV changed). A recording that was interrupted left a marker
+in .transcribe/ holding the sizes of its notes before it started; the notes are cut back to those
+sizes (new ones removed) and the recording is transcribed again.
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audio_capture import SEGMENTERS, create_segmenter
+from config_service import ConfigService, atomic_write_json
+from document_backends import FileDocumentBackend
+from hcidublicate import NotepadController
+from recognizers import FakeRecognizer, RecognitionError, UnknownSpeech, create_backend
+
+STATE_FILE = ".transcribe_state.json"
+MARKER_DIR = ".transcribe"
+
+_backend = None  # Per worker process, built once by _init_worker
+_config_dir = None
+_fake_scripts = None
+_commands = None
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows / macOS
+        return os.cpu_count() or 1
+
+
+def load_backend(spec, model_path=None):
+    """A recognizer by settings name ("vosk", "google", "fake") or "package.module:factory"."""
+    if ":" in spec:
+        module, _, attribute = spec.partition(":")
+        factory = getattr(importlib.import_module(module), attribute)
+        return factory(model_path=model_path) if model_path else factory()
+    if spec == "vosk":
+        return create_backend("vosk", model_path=model_path)
+    return create_backend(spec)
+
+
+def _init_worker(spec, model_path, config_dir, fake_scripts, commands):
+    global _backend, _config_dir, _fake_scripts, _commands
+    _config_dir = config_dir
+    _fake_scripts = fake_scripts
+    _commands = commands
+    if spec != "fake":
+        _backend = load_backend(spec, model_path)
+
+
+def transcribe_one(wav_path, notes_dir, chunk_size=1024, energy_threshold=150, vad="auto"):
+    """Transcribe one recording into its folder in notes_dir (runs in a worker process); returns its summary."""
+    started = time.perf_counter()
+    name = os.path.splitext(os.path.basename(wav_path))[0]
+    backend = _backend or FakeRecognizer(_fake_scripts.get(os.path.basename(wav_path), []))
+    log, errors = [], []
+    controller = NotepadController(
+        logger=log.append,
+        document=FileDocumentBackend(flush_policy="write"),
+        config=ConfigService(_config_dir, logger=log.append),
+    )
+    controller.on_error = errors.append
+    folder = os.path.join(notes_dir, name)
+    os.makedirs(folder, exist_ok=True)
+    controller.script_directory = folder
+    controller.open_viewer = False
+    if _commands:
+        controller.set_commands({**controller.commands, **_commands})
+    note = os.path.join(folder, f"{name}.txt")
+    marker = os.path.join(notes_dir, MARKER_DIR, f"{os.path.basename(wav_path)}.json")
+    rollback(marker)
+    atomic_write_json(marker, {"folder": folder, "sizes": {entry.name: entry.stat().st_size for entry in note_files(folder)}})
+
+    utterances = unrecognized = 0
+    try:
+        if os.path.exists(note):
+            controller._open_path(note)
+        else:
+            controller.create_notepad_with_name(name)
+        with wave.open(wav_path, "rb") as wav:
+            if wav.getnchannels() != 1:
+                raise ValueError("only mono WAV files are supported")
+            sample_rate, sample_width = wav.getframerate(), wav.getsampwidth()
+            audio_seconds = wav.getnframes() / sample_rate
+            segmenter = create_segmenter(sample_rate, sample_width, chunk_size, vad=vad, logger=log.append,
+                                         energy_threshold=energy_threshold)
+            while True:
+                chunk = wav.readframes(chunk_size)
+                last = len(chunk) < chunk_size * sample_width
+                found = [segmenter.feed(chunk)] if chunk else []
+                if last:
+                    found.append(segmenter.flush())  # After feeding the short last chunk, so its audio is kept
+                for utterance in found:
+                    if utterance is None:
+                        continue
+                    try:
+                        text = backend.recognize(utterance)
+                    except UnknownSpeech:
+                        unrecognized += 1
+                    except RecognitionError as e:
+                        unrecognized += 1
+                        errors.append(f"Error recognizing utterance {utterance.seq}: {e}")
+                    else:
+                        controller.dispatch(text.strip().lower())
+                        utterances += 1
+                if last:
+                    break
+        controller.executor.wait_idle()
+        if controller.notepad_open:
+            controller.save_notepad()
+    finally:
+        controller.document.close()
+        controller.executor.stop()
+    os.remove(marker)
+    return {"wav": wav_path, "note": note, "audio_seconds": audio_seconds, "utterances": utterances,
+            "unrecognized": unrecognized, "seconds": time.perf_counter() - started, "errors": errors}
+
+
+def note_files(folder):
+    return [entry for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith(".txt")]
+
+
+def rollback(marker):
+    """Undo what an interrupted run of this recording wrote to its notes."""
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return
+    folder, sizes = state.get("folder"), state.get("sizes", {})
+    if folder and os.path.isdir(folder):
+        for entry in note_files(folder):
+            if entry.name not in sizes:
+                os.remove(entry.path)  # The interrupted run created it
+            else:
+                with open(entry.path, "r+b") as f:
+                    f.truncate(sizes[entry.name])
+    os.remove(marker)
+
+
+def load_state(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def fingerprint(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_corpus(folder):
+    """Transcripts ({wav name: [utterance text, ...]}) and command phrases for --recognizer fake,
+    from a benchmark corpus.json in the recordings folder."""
+    try:
+        with open(os.path.join(folder, "corpus.json"), "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+    except (OSError, ValueError):
+        return {}, None
+    scripts = {recording["wav"]: [u["text"] for u in recording["utterances"]] for recording in corpus["recordings"]}
+    return scripts, corpus.get("commands")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe a folder of WAV recordings into notes.")
+    parser.add_argument("recordings", help="folder of mono WAV files")
+    parser.add_argument("--notes", help="notes folder (default: the recordings folder)")
+    parser.add_argument("--recognizer", default="vosk",
+                        help="vosk, google, fake (corpus.json transcripts) or package.module:factory")
+    parser.add_argument("--model-path", help="Vosk model directory (or passed to a custom factory)")
+    parser.add_argument("--jobs", type=int, default=available_cores(), help="worker processes (default: cores)")
+    parser.add_argument("--config", default=os.getcwd(), help="folder with commands.json (default: current folder)")
+    parser.add_argument("--energy-threshold", type=int, default=150)
+    parser.add_argument("--vad", choices=SEGMENTERS, default="auto", help="endpointing (see audio_capture.py)")
+    parser.add_argument("--force", action="store_true", help="transcribe recordings that are already done again")
+    args = parser.parse_args(argv)
+
+    notes_dir = os.path.abspath(args.notes or args.recordings)
+    os.makedirs(os.path.join(notes_dir, MARKER_DIR), exist_ok=True)
+    state_path = os.path.join(notes_dir, STATE_FILE)
+    state = {} if args.force else load_state(state_path)
+    wavs = sorted(entry.path for entry in os.scandir(args.recordings)
+                  if entry.is_file() and entry.name.lower().endswith(".wav"))
+    todo = [path for path in wavs if state.get(os.path.basename(path), {}).get("fingerprint") != fingerprint(path)]
+    print(f"{len(wavs)} recordings, {len(wavs) - len(todo)} already done, {len(todo)} to transcribe "
+          f"with {args.jobs} processes")
+    if not todo:
+        return 0
+
+    scripts, commands = load_corpus(args.recordings) if args.recognizer == "fake" else (None, None)
+    audio_seconds, failed = 0.0, 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), initializer=_init_worker,
+                             initargs=(args.recognizer, args.model_path, os.path.abspath(args.config), scripts, commands)) as pool:
+        futures = {pool.submit(transcribe_one, path, notes_dir, 1024, args.energy_threshold, args.vad): path for path in todo}
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"  FAILED {os.path.basename(path)}: {e}")
+                    continue
+                audio_seconds += result["audio_seconds"]
+                state[os.path.basename(path)] = {
+                    "fingerprint": fingerprint(path), "note": result["note"], "utterances": result["utterances"],
+                    "audio_seconds": round(result["audio_seconds"], 2)}
+                atomic_write_json(state_path, state)  # After every recording, so an interrupt loses at most the ones running
+                print(f"  {os.path.basename(path)} -> {os.path.basename(result['note'])}: "
+                      f"{result['utterances']} utterances ({result['unrecognized']} unrecognized), "
+                      f"{result['audio_seconds'] / max(result['seconds'], 1e-9):.1f}x real time")
+                for error in result["errors"]:
+                    print(f"    {error}")
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print("Interrupted; run again to resume.")
+            return 130
+    wall = time.perf_counter() - started
+    print(f"{len(todo) - failed}/{len(todo)} recordings, {audio_seconds:.1f} audio-s in {wall:.1f} wall-s: "
+          f"{audio_seconds / wall:.1f} audio-seconds per wall-second")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
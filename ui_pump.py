@@ -0,0 +1,108 @@
+import queue
+import threading
+from collections import deque
+
+
+class UiUpdatePump:
+    """Hands widget updates from worker threads to the Tk thread.
+
+    Any thread may post(); the Tk thread drains the queue in batches every interval_ms via
+    after(). post_latest() keeps only the newest update per key, so a fast stream of label
+    changes (e.g. live partial transcripts) costs one widget call per batch.
+    """
+
+    def __init__(self, root, interval_ms=50, max_batch=200):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        self._after_id = None
+
+    def post(self, fn, *args):
+        self._queue.put((fn, args))
+
+    def post_latest(self, key, fn, *args):
+        with self._latest_lock:
+            queued = key in self._latest
+            self._latest[key] = (fn, args)
+        if not queued:
+            self._queue.put((self._run_latest, (key,)))
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _run_latest(self, key):
+        with self._latest_lock:
+            fn, args = self._latest.pop(key)
+        fn(*args)
+
+    def _drain(self):
+        for _ in range(self.max_batch):
+            try:
+                fn, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"UI update failed: {e}")
+        self._after_id = self.root.after(self.interval_ms, self._drain)
+
+
+class LogRingBuffer:
+    """Thread-safe, fixed-capacity log history; evicted lines can spill to a file."""
+
+    def __init__(self, capacity=5000, spill_path=None):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.total = 0  # Lines ever appended; absolute index of the next line
+        self._lines = deque()
+        self._lock = threading.Lock()
+        self._spill = None
+
+    def append(self, line):
+        with self._lock:
+            if len(self._lines) >= self.capacity:
+                evicted = self._lines.popleft()
+                if self.spill_path:
+                    self._spill_line(evicted)
+            self._lines.append(line)
+            self.total += 1
+
+    def __len__(self):
+        return len(self._lines)
+
+    def lines(self, start, end):
+        """Lines [start, end) of what is currently held (0 = oldest retained line)."""
+        with self._lock:
+            start, end = max(0, start), min(end, len(self._lines))
+            return [self._lines[i] for i in range(start, end)]
+
+    def since(self, count):
+        """Lines appended after the first count lines ever logged (oldest may be gone)."""
+        with self._lock:
+            first = self.total - len(self._lines)
+            return [self._lines[i] for i in range(max(0, count - first), len(self._lines))]
+
+    def close(self):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    def _spill_line(self, line):
+        try:
+            if self._spill is None:
+                self._spill = open(self.spill_path, "a", encoding="utf-8")
+            self._spill.write(line + "\n")
+        except OSError as e:
+            self.spill_path = None
+            print(f"Log spill disabled: {e}")
@@ -0,0 +1,105 @@
+"""Voice activity detection in vectorized NumPy, with a continuously tracked noise floor.
+
+Audio is cut into 10 ms frames and every frame gets its RMS energy (same scale as rms()),
+the share of its spectrum in the speech band and its spectral flatness, all computed with whole
+arrays per buffer. A frame is speech when it is well above the noise floor and either sounds
+tonal (low flatness, i.e. voiced) or is very loud; broadband noise (fans, hiss) is not.
+"""
+import numpy as np
+
+from audio_capture import UtteranceSegmenter
+
+_DTYPES = {1: np.uint8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+
+def frame_features(pcm, sample_rate, sample_width, frame_ms=10, band=(100, 4000)):
+    """Per-frame (energy, speech-band ratio, spectral flatness) arrays for a buffer of mono PCM."""
+    samples = np.frombuffer(pcm, dtype=_DTYPES[sample_width], count=len(pcm) // sample_width)
+    if sample_width == 1:
+        samples = samples.astype(np.int16) - 128
+    frame = max(1, sample_rate * frame_ms // 1000)
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float32)
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame).astype(np.float32), axis=1)) ** 2 + 1e-9
+    freqs = np.fft.rfftfreq(frame, 1.0 / sample_rate)
+    in_band = power[:, (freqs >= band[0]) & (freqs <= band[1])]
+    band_ratio = in_band.sum(axis=1) / power.sum(axis=1)
+    flatness = np.exp(np.mean(np.log(in_band), axis=1)) / np.mean(in_band, axis=1)
+    return energy, band_ratio, flatness
+
+
+class VadSegmenter(UtteranceSegmenter):
+    """UtteranceSegmenter that decides speech from frame features instead of one energy threshold.
+
+    The noise floor is re-estimated from the non-speech frames of every chunk (falling quickly,
+    rising slowly), so there is no calibration pause and no need to recalibrate. energy_threshold
+    (the sensitivity setting) stays as the minimum energy that can count as speech. Finished
+    utterances are trimmed to their first and last speech frame plus trim_padding seconds.
+    """
+
+    def __init__(self, sample_rate, sample_width, chunk_size, energy_threshold=150,
+                 dynamic_energy_threshold=True, pause_threshold=0.5, snr=3.0, min_band_ratio=0.5,
+                 max_flatness=0.45, speech_fraction=0.3, trim_padding=0.1, **options):
+        options.pop("calibration_duration", None)  # The noise floor is tracked instead
+        super().__init__(sample_rate, sample_width, chunk_size, energy_threshold=energy_threshold,
+                         dynamic_energy_threshold=dynamic_energy_threshold, pause_threshold=pause_threshold,
+                         calibration_duration=0, **options)
+        self.snr = snr
+        self.min_band_ratio = min_band_ratio
+        self.max_flatness = max_flatness
+        self.speech_fraction = speech_fraction
+        self.trim_padding = trim_padding
+        self.noise_floor = None
+        self._fall = 1 - np.exp(-self.seconds_per_chunk / 0.1)
+        self._rise = 1 - np.exp(-self.seconds_per_chunk / 2.0)
+        self._all_speech = 0.0  # Seconds since the last chunk with any non-speech frame
+
+    @property
+    def speech_threshold(self):
+        floor = self.noise_floor or 0.0
+        return max(self.energy_threshold, floor * self.snr)
+
+    def speech_frames(self, pcm):
+        """Boolean speech mask over the 10 ms frames of pcm (does not update the noise floor)."""
+        energy, band_ratio, flatness = frame_features(pcm, self.sample_rate, self.sample_width)
+        return self._mask(energy, band_ratio, flatness), energy
+
+    def _mask(self, energy, band_ratio, flatness):
+        threshold = self.speech_threshold
+        return ((energy > threshold) & (band_ratio >= self.min_band_ratio)
+                & ((flatness <= self.max_flatness) | (energy > 3 * threshold)))
+
+    def _classify(self, chunk):
+        speech, energy = self.speech_frames(chunk)
+        if not len(energy):
+            return False
+        if self.dynamic_energy_threshold:
+            self._track_floor(energy, speech)
+        return bool(speech.mean() >= self.speech_fraction)
+
+    def _track_floor(self, energy, speech):
+        quiet = energy[~speech]
+        if self.noise_floor is None:
+            self.noise_floor = float(np.percentile(energy, 10))
+        elif len(quiet):
+            self._all_speech = 0.0
+            level = float(np.median(quiet))
+            rate = self._fall if level < self.noise_floor else self._rise
+            self.noise_floor += (level - self.noise_floor) * rate
+        else:
+            # Nothing but "speech" for seconds: the background itself got louder (fan, traffic)
+            self._all_speech += self.seconds_per_chunk
+            if self._all_speech > 5.0:
+                self.noise_floor += (float(energy.min()) - self.noise_floor) * self._rise
+
+    def _trim(self, pcm):
+        speech, _ = self.speech_frames(pcm)
+        found = np.flatnonzero(speech)
+        if not len(found):
+            return pcm
+        frame_bytes = max(1, self.sample_rate // 100) * self.sample_width
+        padding = int(self.trim_padding * self.sample_rate) * self.sample_width
+        start = max(0, found[0] * frame_bytes - padding)
+        end = min(len(pcm), (found[-1] + 1) * frame_bytes + padding)
+        return pcm[start:end]